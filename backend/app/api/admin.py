@@ -0,0 +1,75 @@
+# backend/app/api/admin.py
+"""
+Operator endpoints: request traces, an on-demand profiler and the counters
+for sizing the chat limits and caches. Admins only (see
+auth_service.get_admin_user).
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ..config.settings import settings
+from ..core import profiler, tracing
+from ..services import response_cache, single_flight
+from ..services.auth_service import get_admin_user
+from ..services.langchain_service import get_llm, scheduler
+from ..services.model_pool import ModelPool
+
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+
+
+@router.get("/traces")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = Query(0.0, ge=0),
+):
+    """The newest traces recorded on this worker (TRACING_ENABLED), newest first."""
+    return {"enabled": settings.TRACING_ENABLED, "traces": tracing.recent_traces(limit, min_duration_ms)}
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """One trace with all of its spans, e.g. the `X-Trace-Id` of a slow response."""
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found")
+    return trace
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def run_profile(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    include_idle: bool = False,
+):
+    """
+    Samples this worker's threads for `seconds` and returns collapsed stacks
+    (see core/profiler.py), e.g. for `flamegraph.pl` or speedscope.
+    """
+    try:
+        return await profiler.profile(seconds, interval_ms / 1000, include_idle)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Admission control counters, queue wait times and single-flight joins, for sizing the limits."""
+    return {**scheduler.stats(), "single_flight": single_flight.stats()}
+
+
+@router.get("/models/stats")
+async def get_model_pool_stats():
+    """Health, circuit state and hedging counters of the chat model backends."""
+    model = get_llm()
+    if not isinstance(model, ModelPool):
+        return {"backends": []}
+    return model.stats()
+
+
+@router.get("/cache/stats")
+async def get_response_cache_stats():
+    """Response cache counters, for sizing the cache."""
+    cache_stats = response_cache.stats()
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    cache_stats["hit_rate"] = cache_stats["hits"] / lookups if lookups else 0.0
+    return cache_stats
@@ -3,7 +3,8 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from ..models.user import UserCreate  # UserLogin is no longer needed here
-from ..services.auth_service import create_firebase_user, get_current_user
+from ..services.auth_service import call_firebase_auth, create_firebase_user, get_current_user, mark_tokens_revoked
+from ..core.executor import run_blocking
 from firebase_admin import auth
 
 # --- DELETED SECTION ---
@@ -29,7 +30,7 @@ async def register(user_data: UserCreate):
     This is a backend responsibility because it involves creating a new user record.
     """
     try:
-        user = create_firebase_user(
+        user = await create_firebase_user(
             email=user_data.email,
             password=user_data.password,
             display_name=user_data.display_name
@@ -50,7 +51,8 @@ async def logout(current_user: dict = Depends(get_current_user)):
     This is a secure backend operation.
     """
     try:
-        auth.revoke_refresh_tokens(current_user['uid'])
+        await run_blocking(call_firebase_auth, auth.revoke_refresh_tokens, current_user['uid'])
+        mark_tokens_revoked(current_user['uid'])
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to log out: {e}")
@@ -1,38 +1,138 @@
 # backend/app/api/chat.py
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import logging
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from ..models.message import ChatMessage
-from ..services.langchain_service import chain_with_history
-from ..services.auth_service import get_current_user
-from ..services.firebase_service import db
-import json
+from ..services.langchain_service import chain_with_history, scheduler
+from ..services import single_flight
+from ..services.llm_scheduler import Admission, QueueTimeout
+from ..services.auth_service import get_current_user, verify_token
+from ..config.settings import settings
+from ..services.conversation_loader import ConversationLoader, get_conversation_loader
+from ..core import sse
+from ..core.metrics import CHAT_OUTPUT_TOKENS, CHAT_TOKENS_PER_SECOND, CHAT_TTFT, SSE_ACTIVE_STREAMS, WEBSOCKET_CONNECTIONS
+from ..core.tokens import count_tokens
+from ..core.tracing import span
 
 # --- Add this new import ---
-from ..core.context import set_user_context,get_user_context
+from ..core.context import set_admission_context, set_user_context,get_user_context
 # ---------------------------
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # --- Create a new dependency ---
-def set_context_dependency(current_user: dict = Depends(get_current_user)) -> None:
+async def set_context_dependency(current_user: dict = Depends(get_current_user)) -> None:
     """A dependency that sets the user context and does nothing else."""
+    # Must be async: sync dependencies run in a worker thread with a copied
+    # context, so the value would never reach the endpoint.
     set_user_context(current_user)
 # -----------------------------
 
-async def stream_generator(response_stream):
-    # ... (this function does not change)
+async def _contents(response_stream):
     async for chunk in response_stream:
-        content = chunk.content
-        if content:
-            yield f"data: {json.dumps({'content': content})}\n\n"
+        yield chunk.content
+
+# How often a queued turn re-checks its position when positions are reported.
+_QUEUE_POSITION_INTERVAL_SECONDS = 1.0
+
+async def _generate(admission: Admission, response_stream):
+    """The text of one generation; the model call inside takes the turn's slot (see langchain_service.model_slot)."""
+    # Runs in the single-flight task (see services/single_flight.py), which
+    # alone drives it, so its spans may become the current one.
+    first_token_at, tokens = None, 0
+    try:
+        with span("chat.chain") as current:
+            async for piece in _contents(response_stream):
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    CHAT_TTFT.observe(first_token_at - admission.started_at)
+                    # Output without a model call (a response cache hit) needs no ticket.
+                    admission.settle()
+                tokens += count_tokens(piece)
+                yield piece
+            if current is not None:
+                current.set(tokens=tokens)
+    finally:
+        admission.settle()
+    if first_token_at is not None:
+        CHAT_OUTPUT_TOKENS.inc(tokens)
+        elapsed = time.monotonic() - first_token_at
+        if elapsed > 0:
+            CHAT_TOKENS_PER_SECOND.observe(tokens / elapsed)
+
+async def start_turn(user_id: str, conversation: dict, chat_message: ChatMessage):
+    """
+    Returns `(ticket, pieces)` for a chat turn on a verified conversation.
+    An identical turn already in flight is joined instead of generating again
+    (see services/single_flight.py). Otherwise the generation starts, and
+    this waits until it has either queued for the model with the scheduler
+    (raising 429 when the queue is full) or answered without it. The ticket
+    is None for joined and cached turns. `pieces` must be closed when the
+    caller stops reading.
+    """
+    key = single_flight.turn_key(user_id, conversation, chat_message.message, chat_message.use_cache)
+    pieces = single_flight.join(key)
+    if pieces is not None:
+        return None, pieces
+    admission = Admission(scheduler, user_id)
+    # Copied into the single-flight task along with the user and the loader.
+    set_admission_context(admission)
+    # The config only needs the session_id. The user_id is in the context.
+    config = {"configurable": {"session_id": conversation["id"], "use_response_cache": chat_message.use_cache}}
+    response_stream = chain_with_history.astream({"question": chat_message.message}, config=config)
+    pieces = single_flight.start(key, _generate(admission, response_stream), on_done=admission.close)
+    try:
+        return await admission.decided(), pieces
+    except BaseException:
+        pieces.close()
+        raise
+
+async def scheduled_stream_generator(ticket, pieces, report_position: bool = False):
+    """
+    SSE frames for a turn from `start_turn`: coalesced, with heartbeats and
+    backpressure (see core/sse.py). While it is queued, the client gets
+    `queue` events with its position if asked for (heartbeats otherwise),
+    and an `error` event if it waited too long.
+    """
+    SSE_ACTIVE_STREAMS.inc()
+    try:
+        with span("sse.stream", activate=False, queued=ticket is not None) as current:
+            last_position, last_sent, frames = None, time.monotonic(), 0
+            while report_position and ticket is not None and ticket.waiting:
+                if ticket.position() != last_position:
+                    last_position = ticket.position()
+                    last_sent = time.monotonic()
+                    yield sse.event({"position": last_position}, "queue")
+                elif time.monotonic() - last_sent >= settings.SSE_HEARTBEAT_SECONDS:
+                    last_sent = time.monotonic()
+                    yield sse.HEARTBEAT
+                await ticket.wait(_QUEUE_POSITION_INTERVAL_SECONDS)
+            async for frame in sse.coalesce(pieces):
+                frames += 1
+                yield frame
+            if current is not None:
+                current.set(frames=frames)
+    except QueueTimeout as e:
+        yield sse.event({"detail": str(e)}, "error")
+    finally:
+        SSE_ACTIVE_STREAMS.dec()
+        pieces.close()
 
 @router.post("/message")
 async def stream_chat_message(
     chat_message: ChatMessage,
     # --- Add the new dependency to the endpoint ---
     # This will run BEFORE the main body of the function.
-    context: None = Depends(set_context_dependency)
+    context: None = Depends(set_context_dependency),
+    # Also makes the loader available to the history factory via the request context.
+    loader: ConversationLoader = Depends(get_conversation_loader),
 ):
     # ... (rest of the function, but with one change)
     
@@ -48,17 +148,192 @@ async def stream_chat_message(
         raise HTTPException(status_code=401, detail="Could not identify user from token.")
     user_id = user_info['uid']
 
-    conv_ref = db.collection("conversations").document(conversation_id)
-    conv_doc = conv_ref.get()
-    if not conv_doc.exists or conv_doc.to_dict().get("user_id") != user_id:
-        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+    # The verified snapshot is handed to FirestoreChatMessageHistory, which
+    # therefore does not read the conversation again.
+    conversation = await loader.load_owned(conversation_id, user_id)
 
-    # The config only needs the session_id. The user_id is now in the context.
-    config = {"configurable": {"session_id": conversation_id}}
+    # Raises 429 with Retry-After when the queue is full.
+    ticket, pieces = await start_turn(user_id, conversation, chat_message)
     
-    response_stream = chain_with_history.astream(
-        {"question": chat_message.message},
-        config=config,
+    return StreamingResponse(
+        scheduled_stream_generator(ticket, pieces, chat_message.report_queue_position),
+        media_type="text/event-stream",
     )
-    
-    return StreamingResponse(stream_generator(response_stream), media_type="text/event-stream")
\ No newline at end of file
+
+
+# --- WebSocket channel ---
+#
+# One connection carries the turns of any number of the user's conversations.
+# Client -> server (JSON text frames):
+#   {"type": "auth", "token": "<Firebase ID token>"}   first frame; again to refresh an expiring token
+#   {"type": "message", "id": "<turn id>", "conversation_id": ..., "message": ..., "use_cache": true,
+#    "report_queue_position": false}
+#   {"type": "cancel", "id": "<turn id>"}
+#   {"type": "ping"} / {"type": "pong"}
+# Server -> client:
+#   {"type": "ready", "uid": ...}                        after each successful auth
+#   {"type": "chunk", "id": ..., "conversation_id": ..., "content": ...}
+#   {"type": "queued", "id": ..., "position": n}        with "report_queue_position": true
+#   {"type": "done", "id": ...} / {"type": "cancelled", "id": ...}
+#   {"type": "error", "id": ... or null, "detail": ..., "retry_after": seconds (when the queue is full)}
+#   {"type": "ping"} every WS_PING_INTERVAL_SECONDS, {"type": "pong"} in reply to a ping
+
+class _Channel:
+    """Per-connection state: the authenticated user, running turns and the single writer."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.claims: dict = {}
+        self.turns: dict = {}
+        # Sending is funnelled through one task; a bounded queue makes turns
+        # wait (instead of buffering) when the client reads slowly.
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+
+    async def send(self, frame: dict) -> None:
+        await self.outbox.put(frame)
+
+    async def error(self, turn_id, detail: str) -> None:
+        await self.send({"type": "error", "id": turn_id, "detail": detail})
+
+    async def writer(self) -> None:
+        while True:
+            frame = await self.outbox.get()
+            await self.websocket.send_text(sse.dumps(frame).decode("utf-8"))
+
+    async def pinger(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_PING_INTERVAL_SECONDS)
+            await self.send({"type": "ping"})
+
+    async def authenticate(self, token) -> None:
+        self.claims = await verify_token(token if isinstance(token, str) else "")
+        # Turns started from here on see the new claims.
+        set_user_context(self.claims)
+        await self.send({"type": "ready", "uid": self.claims["uid"]})
+
+    async def run_turn(self, turn_id: str, chat_message: ChatMessage) -> None:
+        conversation_id = chat_message.conversation_id
+        try:
+            # A fresh loader per turn, so ownership is re-checked against current data.
+            loader = await get_conversation_loader()
+            user_id = get_user_context()['uid']
+            conversation = await loader.load_owned(conversation_id, user_id)
+            ticket, pieces = await start_turn(user_id, conversation, chat_message)
+            try:
+                if chat_message.report_queue_position and ticket is not None:
+                    await self.report_queue_position(turn_id, ticket)
+                # Heartbeats are not needed here, the channel pings on its own.
+                async for text in sse.batches(pieces, heartbeat=settings.WS_PING_INTERVAL_SECONDS):
+                    if text is not None:
+                        await self.send({"type": "chunk", "id": turn_id, "conversation_id": conversation_id, "content": text})
+                await self.send({"type": "done", "id": turn_id})
+            finally:
+                pieces.close()
+        except asyncio.CancelledError:
+            await self.send({"type": "cancelled", "id": turn_id})
+            raise
+        except QueueTimeout as e:
+            await self.error(turn_id, str(e))
+        except HTTPException as e:
+            frame = {"type": "error", "id": turn_id, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                frame["retry_after"] = int(e.headers["Retry-After"])
+            await self.send(frame)
+        except Exception:
+            logger.exception("Chat turn %s failed", turn_id)
+            await self.error(turn_id, "The response could not be generated.")
+        finally:
+            self.turns.pop(turn_id, None)
+
+    async def report_queue_position(self, turn_id: str, ticket) -> None:
+        """Sends `queued` frames while the turn waits for a slot."""
+        last_position = None
+        while ticket.waiting:
+            if ticket.position() != last_position:
+                last_position = ticket.position()
+                await self.send({"type": "queued", "id": turn_id, "position": last_position})
+            await ticket.wait(_QUEUE_POSITION_INTERVAL_SECONDS)
+
+    async def handle(self, frame: dict) -> None:
+        kind = frame.get("type")
+        if kind == "auth":
+            await self.authenticate(frame.get("token"))
+        elif kind == "message":
+            turn_id = frame.get("id")
+            if not isinstance(turn_id, str) or not turn_id:
+                await self.error(None, "A message needs a string id.")
+            elif turn_id in self.turns:
+                await self.error(turn_id, "A turn with this id is still running.")
+            elif len(self.turns) >= settings.WS_MAX_CONCURRENT_TURNS:
+                await self.error(turn_id, "Too many concurrent turns on this connection.")
+            elif self.claims["exp"] <= time.time():
+                await self.error(turn_id, "Token expired, send a new auth frame.")
+            else:
+                try:
+                    chat_message = ChatMessage.parse_obj(frame)
+                except ValidationError:
+                    await self.error(turn_id, "Invalid message.")
+                    return
+                # The task copies the current context, i.e. the authenticated user.
+                self.turns[turn_id] = asyncio.get_running_loop().create_task(self.run_turn(turn_id, chat_message))
+        elif kind == "cancel":
+            task = self.turns.get(frame.get("id"))
+            if task is not None:
+                task.cancel()
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind != "pong":
+            await self.error(frame.get("id"), f"Unknown frame type: {kind!r}")
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Persistent chat channel: the client authenticates once, then streams the
+    turns of several conversations over the same connection (protocol above).
+    """
+    await websocket.accept()
+    channel = _Channel(websocket)
+    try:
+        first = await asyncio.wait_for(websocket.receive_json(), settings.WS_AUTH_TIMEOUT_SECONDS)
+        if not isinstance(first, dict) or first.get("type") != "auth":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="The first frame must be auth.")
+        await channel.authenticate(first.get("token"))
+    except (asyncio.TimeoutError, HTTPException, ValueError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except WebSocketDisconnect:
+        return
+
+    loop = asyncio.get_running_loop()
+    writer = loop.create_task(channel.writer())
+    pinger = loop.create_task(channel.pinger())
+    WEBSOCKET_CONNECTIONS.inc()
+    try:
+        while True:
+            receive = loop.create_task(websocket.receive_json())
+            # A failed writer (client gone) ends the connection as well.
+            await asyncio.wait({receive, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if not receive.done():
+                receive.cancel()
+                break
+            try:
+                frame = receive.result()
+            except ValueError:
+                await channel.error(None, "Frames must be JSON objects.")
+                continue
+            if not isinstance(frame, dict):
+                await channel.error(None, "Frames must be JSON objects.")
+                continue
+            try:
+                await channel.handle(frame)
+            except HTTPException as e:
+                # A failed re-auth ends the session.
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        WEBSOCKET_CONNECTIONS.dec()
+        for task in (*channel.turns.values(), writer, pinger):
+            task.cancel()
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from ..models.conversation import ConversationCreate, ConversationUpdate, ConversationInDB
-from ..services.firebase_service import db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from ..models.conversation import (
+    ConversationChange, ConversationChanges, ConversationCreate, ConversationUpdate, ConversationInDB,
+    ConversationPage, ConversationSummary,
+)
+from ..models.message import Message
+from ..repositories import get_repository
+from ..config.settings import settings
+from ..core.cursors import decode_cursor, encode_cursor
+from ..core.metrics import count_datastore_reads, count_datastore_writes
+from ..services.memory_service import FirestoreChatMessageHistory, invalidate_history
+from ..services import deletion_service, retrieval_memory
+from ..services.conversation_loader import ConversationLoader, get_conversation_loader
 from ..services.auth_service import get_current_user
-from typing import List
+from typing import Optional
 import datetime
+import json
 
 router = APIRouter()
 
@@ -25,75 +38,228 @@ async def create_conversation(conv_data: ConversationCreate, current_user: dict
         "message_count": 0
     }
     
-    update_time, conv_ref = db.collection("conversations").add(new_conv)
+    conv_id = await get_repository().create_conversation(new_conv)
+    count_datastore_writes()
     
-    return ConversationInDB(id=conv_ref.id, **new_conv)
+    return ConversationInDB(id=conv_id, **new_conv)
 
 
-@router.get("/", response_model=List[ConversationInDB])
-async def get_conversations(current_user: dict = Depends(get_current_user)):
+@router.get("/", response_model=ConversationPage)
+async def get_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
     """
-    Get a list of all conversations for the authenticated user.
+    Get a page of the authenticated user's conversations, most recently updated first.
+    Pass the returned `next_cursor` back as `cursor` to load the next page.
     """
     user_id = current_user['uid']
-    convs_ref = db.collection("conversations").where("user_id", "==", user_id).order_by("updated_at", direction="DESCENDING").stream()
-    
-    conversations = []
-    for conv in convs_ref:
-        conv_dict = conv.to_dict()
-        conv_dict['id'] = conv.id
-        conversations.append(ConversationInDB.parse_obj(conv_dict))
-        
-    return conversations
+    # Taken before the read, so nothing written during it can be missed.
+    sync_cursor = _sync_cursor_now()
+    after = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position.get("updated_at"), datetime.datetime) or "id" not in position:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (position["updated_at"], position["id"])
+
+    # Ask for one extra row to learn whether another page exists.
+    convs = await get_repository().list_conversations(user_id, limit + 1, after)
+    count_datastore_reads(len(convs))
+    next_cursor = None
+    if len(convs) > limit:
+        convs = convs[:limit]
+        last = convs[-1]
+        next_cursor = encode_cursor({"updated_at": last["updated_at"], "id": last["id"]})
+
+    return ConversationPage(
+        # Conversations being deleted still occupy their place in the ordering.
+        items=[ConversationSummary.parse_obj(conv_dict) for conv_dict in convs if not conv_dict.get("deleted")],
+        next_cursor=next_cursor,
+        sync_cursor=sync_cursor,
+    )
+
+
+def _sync_cursor_now() -> str:
+    """
+    A sync position slightly in the past. `updated_at` is stamped by the
+    writing worker before its commit lands, so a change can become visible a
+    little after its timestamp; re-sending the last few seconds of changes
+    (clients merge idempotently) is cheaper than ever missing one.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return encode_cursor({"updated_at": now - datetime.timedelta(seconds=settings.CONVERSATION_SYNC_SKEW_SECONDS), "id": None})
+
+
+@router.get("/changes", response_model=ConversationChanges)
+async def get_conversation_changes(
+    since: str,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get the conversations created, updated or deleted after `since` (a
+    `sync_cursor` from the list endpoint or from a previous call), oldest
+    change first. Deleted conversations come back with `deleted` set.
+    """
+    user_id = current_user['uid']
+    position = decode_cursor(since)
+    if not isinstance(position.get("updated_at"), datetime.datetime) or "id" not in position:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    updated_at = position["updated_at"]
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+
+    # Deletions older than the tombstone retention may be gone already.
+    horizon = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=settings.CONVERSATION_TOMBSTONE_RETENTION_DAYS)
+    if updated_at < horizon:
+        return ConversationChanges(items=[], sync_cursor=_sync_cursor_now(), reset=True)
+
+    changes = await get_repository().list_conversation_changes(user_id, limit + 1, (updated_at, position["id"]))
+    count_datastore_reads(len(changes))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        last = changes[-1]
+        sync_cursor = encode_cursor({"updated_at": last["updated_at"], "id": last["id"]})
+    else:
+        sync_cursor = _sync_cursor_now()
+
+    return ConversationChanges(
+        items=[
+            ConversationChange(id=conv["id"], updated_at=conv["updated_at"], deleted=True) if conv.get("deleted")
+            else ConversationChange.parse_obj(conv)
+            for conv in changes
+        ],
+        sync_cursor=sync_cursor,
+        has_more=has_more,
+    )
+
+# Stored roles are LangChain message types; the API speaks user/assistant.
+# Older rows may carry the streamed chunk type.
+_API_ROLES = {"human": "user", "ai": "assistant", "AIMessageChunk": "assistant"}
+
+@router.get("/{conversation_id}/messages")
+async def get_messages(
+    conversation_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    loader: ConversationLoader = Depends(get_conversation_loader),
+):
+    """
+    Stream a page of a conversation's messages as NDJSON, newest first.
+
+    Each line is either {"type": "message", ...message fields} or, last,
+    {"type": "end", "next_cursor": ...}. Pass `next_cursor` back as `cursor`
+    to load the next (older) page; it is null once the start is reached.
+    """
+    user_id = current_user['uid']
+
+    # Verify ownership
+    conv = await loader.load_owned(conversation_id, user_id)
+
+    before = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position.get("timestamp"), datetime.datetime) or "id" not in position:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        before = (position["timestamp"], position["id"])
+
+    history = FirestoreChatMessageHistory(conversation_id=conversation_id, user_id=user_id, conversation=conv)
+    docs, next_before = await history.aget_message_page(limit, before)
+    next_cursor = encode_cursor({"timestamp": next_before[0], "id": next_before[1]}) if next_before else None
+
+    async def ndjson_lines():
+        for msg in docs:
+            message = Message(
+                id=msg["id"],
+                conversation_id=conversation_id,
+                role=_API_ROLES.get(msg.get("role"), "user"),
+                content=msg.get("content", ""),
+                timestamp=msg["timestamp"],
+            )
+            yield json.dumps({"type": "message", **jsonable_encoder(message)}) + "\n"
+        yield json.dumps({"type": "end", "next_cursor": next_cursor}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 
 @router.put("/{conversation_id}")
-async def update_conversation(conversation_id: str, conv_data: ConversationUpdate, current_user: dict = Depends(get_current_user)):
+async def update_conversation(
+    conversation_id: str,
+    conv_data: ConversationUpdate,
+    current_user: dict = Depends(get_current_user),
+    loader: ConversationLoader = Depends(get_conversation_loader),
+):
     """
     Update a conversation's title.
     """
     user_id = current_user['uid']
-    conv_ref = db.collection("conversations").document(conversation_id)
     
     # Verify ownership
-    conv_doc = conv_ref.get()
-    if not conv_doc.exists or conv_doc.to_dict().get("user_id") != user_id:
-        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+    await loader.load_owned(conversation_id, user_id)
         
     update_data = conv_data.dict(exclude_unset=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
         
     update_data["updated_at"] = datetime.datetime.utcnow()
-    conv_ref.update(update_data)
+    await get_repository().update_conversation(conversation_id, update_data)
+    count_datastore_writes()
     
     return {"message": "Conversation updated successfully"}
 
 
-@router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_conversation(conversation_id: str, current_user: dict = Depends(get_current_user)):
+@router.delete("/{conversation_id}", status_code=status.HTTP_202_ACCEPTED)
+async def delete_conversation(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+    loader: ConversationLoader = Depends(get_conversation_loader),
+):
     """
     Delete a conversation and all its messages.
+
+    The conversation disappears immediately; its messages are purged by a
+    background job whose progress is available from the deletion endpoint.
     """
     user_id = current_user['uid']
-    conv_ref = db.collection("conversations").document(conversation_id)
     
     # Verify ownership
-    conv_doc = conv_ref.get()
-    if not conv_doc.exists or conv_doc.to_dict().get("user_id") != user_id:
-        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+    await loader.load_owned(conversation_id, user_id)
 
-    # Firestore doesn't have cascading deletes, so we must delete subcollections manually.
-    # This is a batch operation for efficiency.
-    batch = db.batch()
-    
-    # Delete messages
-    messages_ref = db.collection("messages").where("conversation_id", "==", conversation_id).stream()
-    for msg in messages_ref:
-        batch.delete(msg.reference)
-        
-    # Delete the conversation itself
-    batch.delete(conv_ref)
+    await get_repository().tombstone_conversation(conversation_id)
+    count_datastore_writes()
+    invalidate_history(conversation_id)
+    await retrieval_memory.forget_conversation(user_id, conversation_id)
+    job = await deletion_service.start_purge(conversation_id)
+    if job is None:
+        # Another worker is purging it.
+        return {"conversation_id": conversation_id, "status": "running"}
     
-    batch.commit()
-    
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    return job.to_dict()
+
+
+@router.get("/{conversation_id}/deletion")
+async def get_deletion_status(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+    loader: ConversationLoader = Depends(get_conversation_loader),
+):
+    """
+    Get the progress of a conversation's background deletion.
+    """
+    conv = await loader.load(conversation_id)
+    if conv is not None and conv.get("user_id") != current_user['uid']:
+        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+
+    job = deletion_service.get_job(conversation_id)
+    if job is not None:
+        return job.to_dict()
+    if conv is None or conv.get("purged_at"):
+        # Purged (possibly by another worker), or never existed.
+        return {"conversation_id": conversation_id, "status": "done"}
+    if conv.get("deleted"):
+        return {"conversation_id": conversation_id, "status": "running"}
+    raise HTTPException(status_code=404, detail="Conversation is not being deleted")
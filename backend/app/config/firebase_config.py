@@ -1,25 +1,25 @@
+import threading
+
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials
 from .settings import settings
-import os
 
-def initialize_firebase():
+_init_lock = threading.Lock()
+
+def initialize_firebase() -> firebase_admin.App:
     """
-    Initializes the Firebase Admin SDK.
-    It checks if the app is already initialized to prevent errors.
+    Initializes the Firebase Admin SDK on first use and returns the default app.
+    Safe to call from any thread, any number of times. Blocking: it may read
+    credential files, so async code calls it through `run_blocking`.
     """
-    if not firebase_admin._apps:
-        # The GOOGLE_APPLICATION_CREDENTIALS env var should be set.
-        # It points to the service account key file.
-        cred = credentials.ApplicationDefault()
-        
-        firebase_admin.initialize_app(cred, {
-            'projectId': settings.FIREBASE_PROJECT_ID,
-        })
-    
-    print("Firebase App Initialized.")
+    with _init_lock:
+        if not firebase_admin._apps:
+            # The GOOGLE_APPLICATION_CREDENTIALS env var should be set.
+            # It points to the service account key file.
+            cred = credentials.ApplicationDefault()
 
-# You can also export db and auth clients for easy access elsewhere
-# but it's cleaner to get them after initialization.
-# db = firestore.client()
-# auth_client = auth
\ No newline at end of file
+            firebase_admin.initialize_app(cred, {
+                'projectId': settings.FIREBASE_PROJECT_ID,
+            })
+            print("Firebase App Initialized.")
+        return firebase_admin.get_app()
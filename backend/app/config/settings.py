@@ -31,8 +31,120 @@ load_dotenv()
 class Settings:
     # This is for the Gemini LLM
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-pro")
+    # "google", or "fake" for benchmarks and local runs (see services/fake_llm.py)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "google")
+    FAKE_LLM_TTFT_SECONDS: float = float(os.getenv("FAKE_LLM_TTFT_SECONDS", "0.2"))
+    FAKE_LLM_TOKENS_PER_SECOND: float = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+    FAKE_LLM_ANSWER_TOKENS: int = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "64"))
 
     # This is for the Firebase Admin SDK
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID")
 
+    # Size of the thread pool used for SDK calls that have no async variant
+    BLOCKING_IO_WORKERS: int = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
+    # ID-token verification cache (see services/auth_service.py)
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "3600"))
+    AUTH_REVOCATION_CHECK_INTERVAL_SECONDS: float = float(os.getenv("AUTH_REVOCATION_CHECK_INTERVAL_SECONDS", "60"))
+
+    # Number of conversation histories kept in memory per worker
+    HISTORY_CACHE_MAX_CONVERSATIONS: int = int(os.getenv("HISTORY_CACHE_MAX_CONVERSATIONS", "1000"))
+
+    # Prompt history policy (see services/history_policy.py)
+    HISTORY_RECENT_TURNS: int = int(os.getenv("HISTORY_RECENT_TURNS", "6"))
+    HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+    HISTORY_SUMMARY_MIN_MESSAGES: int = int(os.getenv("HISTORY_SUMMARY_MIN_MESSAGES", "6"))
+    HISTORY_SUMMARY_MAX_WORDS: int = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "250"))
+
+    # Background purge of deleted conversations (see services/deletion_service.py)
+    DELETE_BATCH_SIZE: int = int(os.getenv("DELETE_BATCH_SIZE", "400"))
+    DELETE_CONCURRENCY: int = int(os.getenv("DELETE_CONCURRENCY", "4"))
+    # A worker claims a purge for this long and renews the claim while it runs.
+    PURGE_LEASE_SECONDS: float = float(os.getenv("PURGE_LEASE_SECONDS", "300"))
+
+    # Exact-match LLM response cache (see services/response_cache.py)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+    # Server-sent events framing of chat responses (see core/sse.py)
+    SSE_COALESCE_WINDOW_SECONDS: float = float(os.getenv("SSE_COALESCE_WINDOW_SECONDS", "0.05"))
+    SSE_COALESCE_MAX_BYTES: int = int(os.getenv("SSE_COALESCE_MAX_BYTES", "4096"))
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_BUFFER_CHUNKS: int = int(os.getenv("SSE_BUFFER_CHUNKS", "64"))
+
+    # Pool of chat model backends (see services/model_pool.py). Comma-separated
+    # specs such as "google:gemini-1.5-flash,google:gemini-1.5-pro"; empty means
+    # the single model selected by LLM_PROVIDER / LLM_MODEL.
+    MODEL_POOL_BACKENDS: str = os.getenv("MODEL_POOL_BACKENDS", "")
+    MODEL_POOL_HEDGING: bool = os.getenv("MODEL_POOL_HEDGING", "true").lower() == "true"
+    MODEL_POOL_HEDGE_PERCENTILE: float = float(os.getenv("MODEL_POOL_HEDGE_PERCENTILE", "0.95"))
+    MODEL_POOL_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("MODEL_POOL_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+    MODEL_POOL_HEDGE_MAX_DELAY_SECONDS: float = float(os.getenv("MODEL_POOL_HEDGE_MAX_DELAY_SECONDS", "10"))
+    MODEL_POOL_FAILURE_THRESHOLD: int = int(os.getenv("MODEL_POOL_FAILURE_THRESHOLD", "3"))
+    MODEL_POOL_COOLDOWN_SECONDS: float = float(os.getenv("MODEL_POOL_COOLDOWN_SECONDS", "30"))
+
+    # Admission control for chat turns (see services/llm_scheduler.py)
+    LLM_MAX_CONCURRENT: int = int(os.getenv("LLM_MAX_CONCURRENT", "32"))
+    LLM_MAX_CONCURRENT_PER_USER: int = int(os.getenv("LLM_MAX_CONCURRENT_PER_USER", "2"))
+    LLM_QUEUE_MAX_WAITING: int = int(os.getenv("LLM_QUEUE_MAX_WAITING", "128"))
+    LLM_QUEUE_MAX_WAITING_PER_USER: int = int(os.getenv("LLM_QUEUE_MAX_WAITING_PER_USER", "4"))
+    LLM_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "60"))
+
+    # Identical concurrent chat turns share one generation (see services/single_flight.py)
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    # How many pieces the generation may run ahead of its slowest subscriber
+    SINGLE_FLIGHT_MAX_LAG: int = int(os.getenv("SINGLE_FLIGHT_MAX_LAG", "64"))
+
+    # Persistent WebSocket chat channel (see api/chat.py, /ws)
+    WS_AUTH_TIMEOUT_SECONDS: float = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", "10"))
+    WS_PING_INTERVAL_SECONDS: float = float(os.getenv("WS_PING_INTERVAL_SECONDS", "20"))
+    WS_MAX_CONCURRENT_TURNS: int = int(os.getenv("WS_MAX_CONCURRENT_TURNS", "4"))
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+
+    # Conversation delta sync (see api/conversation.py, GET /changes)
+    CONVERSATION_SYNC_SKEW_SECONDS: float = float(os.getenv("CONVERSATION_SYNC_SKEW_SECONDS", "5"))
+    CONVERSATION_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("CONVERSATION_TOMBSTONE_RETENTION_DAYS", "30"))
+
+    # Prometheus metrics at /metrics (see core/metrics.py)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Opt-in request tracing (see core/tracing.py) and the admin-only
+    # profiler (see core/profiler.py, api/admin.py)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "") # JSON lines; empty keeps traces in memory only
+    PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    # Firebase uids allowed to use the admin API, comma-separated. Users with
+    # an `admin: true` custom claim are admins as well.
+    ADMIN_UIDS: str = os.getenv("ADMIN_UIDS", "")
+
+    # Startup warm-up (see core/container.py)
+    WARMUP_TOKEN_CERTS: bool = os.getenv("WARMUP_TOKEN_CERTS", "true").lower() == "true"
+
+    # Storage backend for users, conversations and messages (see repositories/)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore") # firestore | sqlite
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "data/chat.db")
+    # How Firestore stores messages: "flat" (one document per message in the
+    # top-level collection) or "paged" (MESSAGE_PAGE_SIZE messages per document
+    # under the conversation, see repositories/firestore_paged_repository.py).
+    # Migrate with `python -m app.tools.migrate_message_layout`.
+    MESSAGE_LAYOUT: str = os.getenv("MESSAGE_LAYOUT", "flat")
+    MESSAGE_PAGE_SIZE: int = int(os.getenv("MESSAGE_PAGE_SIZE", "50"))
+
+    # Long-term memory: "window" (recent turns + rolling summary) or
+    # "retrieval" (recent turns + similar past messages, see services/retrieval_memory.py)
+    MEMORY_MODE: str = os.getenv("MEMORY_MODE", "window")
+    EMBEDDER: str = os.getenv("EMBEDDER", "hashing") # hashing | google
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+    EMBEDDING_DIM: int = int(os.getenv("EMBEDDING_DIM", "256")) # 768 for models/embedding-001
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", "data/vector_index")
+    VECTOR_INDEX_MAX_OPEN: int = int(os.getenv("VECTOR_INDEX_MAX_OPEN", "256"))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+    RETRIEVAL_RECENT_TURNS: int = int(os.getenv("RETRIEVAL_RECENT_TURNS", "2"))
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,102 @@
+# backend/app/core/container.py
+"""
+Startup of the worker's shared clients, driven by the FastAPI lifespan.
+
+Nothing expensive happens at import any more: the Firebase app, the storage
+client and the chat model are all created on first use. At startup the
+container warms them concurrently in the background, so the worker accepts
+connections immediately while the clients come up. `/ready` reports when
+every critical component is warm; a load balancer should route traffic to
+the worker from then on.
+
+A warm-up that fails is logged and reported. It is not fatal: the component
+is simply created on first use as before (and fails there if it really is
+broken).
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Component:
+    def __init__(self, name: str, warm_up: Callable[[], Awaitable[None]], critical: bool, after: List[str]):
+        self.name = name
+        self.warm_up = warm_up
+        self.critical = critical
+        self.after = after
+        self.status = "pending" # pending | ready | failed
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {"status": self.status, "critical": self.critical, "seconds": self.seconds, "error": self.error}
+
+
+class ServiceContainer:
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(
+        self,
+        name: str,
+        warm_up: Callable[[], Awaitable[None]],
+        critical: bool = True,
+        after: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Adds a warm-up step. Non-critical steps do not hold back readiness.
+        `after` names steps that must have finished (successfully or not) first.
+        """
+        self._components[name] = Component(name, warm_up, critical, after or [])
+
+    @property
+    def ready(self) -> bool:
+        return all(c.status == "ready" for c in self._components.values() if c.critical)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": {name: component.to_dict() for name, component in self._components.items()},
+        }
+
+    async def _run(self, component: Component) -> None:
+        for name in component.after:
+            await self._components[name].done.wait()
+        started = time.monotonic()
+        try:
+            await component.warm_up()
+            component.status = "ready"
+        except Exception as e:
+            logger.exception("Warm-up of %s failed", component.name)
+            component.status = "failed"
+            component.error = str(e)
+        finally:
+            component.seconds = time.monotonic() - started
+            component.done.set()
+
+    def start(self) -> None:
+        """Starts every warm-up concurrently and returns right away."""
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run(component)) for component in self._components.values()]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app):
+        self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+
+
+container = ServiceContainer()
@@ -12,4 +12,30 @@ def set_user_context(user: Dict[str, Any]) -> None:
 
 def get_user_context() -> Optional[Dict[str, Any]]:
     """Gets the user context for the current request."""
-    return _user_context.get()
\ No newline at end of file
+    return _user_context.get()
+
+# The request-scoped conversation loader (see services/conversation_loader.py),
+# so code deeper in the call stack, like the history factory, can reuse the
+# documents the route has already read.
+_loader_context: ContextVar[Optional[Any]] = ContextVar("loader_context", default=None)
+
+def set_loader_context(loader: Any) -> None:
+    """Sets the conversation loader for the current request."""
+    _loader_context.set(loader)
+
+def get_loader_context() -> Optional[Any]:
+    """Gets the conversation loader for the current request."""
+    return _loader_context.get()
+
+# The admission of the chat turn being generated (see
+# services/llm_scheduler.Admission), so the model call at the bottom of the
+# chain can take the turn's scheduler ticket.
+_admission_context: ContextVar[Optional[Any]] = ContextVar("admission_context", default=None)
+
+def set_admission_context(admission: Any) -> None:
+    """Sets the admission of the current chat turn."""
+    _admission_context.set(admission)
+
+def get_admission_context() -> Optional[Any]:
+    """Gets the admission of the current chat turn."""
+    return _admission_context.get()
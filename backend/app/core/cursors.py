@@ -0,0 +1,38 @@
+# backend/app/core/cursors.py
+import base64
+import datetime
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException, status
+
+# Pagination cursors are opaque to clients: URL-safe base64 of a small JSON
+# object. Datetimes are tagged so they round-trip with their timezone.
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _object_hook(obj: Dict[str, Any]) -> Any:
+    if set(obj) == {"$dt"}:
+        return datetime.datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, default=_default, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decodes a cursor produced by `encode_cursor`; raises 400 if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw, object_hook=_object_hook)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return position
@@ -0,0 +1,47 @@
+# backend/app/core/executor.py
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+from ..config.settings import settings
+
+T = TypeVar("T")
+
+# A bounded pool for the SDK calls that only exist in blocking form
+# (e.g. firebase_admin.auth). Keeping it bounded means a slow upstream can
+# only tie up these threads, never the event loop itself.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_IO_WORKERS,
+    thread_name_prefix="blocking-io",
+)
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a blocking callable on the bounded executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+
+# Event loop behind run_sync(), started on first use.
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs a coroutine from synchronous code (scripts, the sync LangChain API)
+    and returns its result.
+
+    Every call runs on the same background event loop, so async clients that
+    bind to the loop they were first used on keep working across calls; they
+    must not be shared with the server's loop (see
+    repositories.get_sync_repository). Never call this from a coroutine: it
+    blocks until the result is ready.
+    """
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="sync-bridge", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
@@ -0,0 +1,298 @@
+# backend/app/core/metrics.py
+"""
+In-process metrics, exposed at /metrics in the Prometheus text format.
+
+Instrumentation sits on the hot path, so it is kept to a few attribute
+updates: every series is a small preallocated object (`_CounterValue`,
+`_HistogramValue`) created once per label combination and then only
+incremented in place. No locks are taken. Updates come from the event loop,
+and the rare increment from a worker thread can at worst be lost under the
+GIL, which is acceptable for monitoring.
+
+Per-request datastore operations are tallied on a `DatastoreOps` object the
+middleware puts in a context var; call sites add to it with
+`count_datastore_reads` / `count_datastore_writes`.
+"""
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Request latency, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Documents touched by one request.
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Tokens per second of a streamed answer.
+RATE_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320, 640)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # The last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    """A metric name with its labelled series. Series are created on first use and kept."""
+
+    def __init__(self, kind: str, name: str, help_text: str, labelnames: Tuple[str, ...], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._factory = factory
+        self._series: Dict[Tuple[str, ...], object] = {}
+        if not labelnames:
+            self._series[()] = factory()
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = self._factory()
+        return series
+
+    # Unlabelled families act as their single series.
+    def inc(self, amount: float = 1.0) -> None:
+        self._series[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._series[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._series[()].set(value)
+
+    def observe(self, value: float) -> None:
+        self._series[()].observe(value)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, series in list(self._series.items()):
+            labels = _format_labels(self.labelnames, values)
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(series.bounds, series.counts):
+                    cumulative += count
+                    yield f'{self.name}_bucket{_format_labels(self.labelnames + ("le",), values + (_format_number(bound),))} {cumulative}'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames + ("le",), values + ("+Inf",))} {series.count}'
+                yield f"{self.name}_sum{labels} {_format_number(series.sum)}"
+                yield f"{self.name}_count{labels} {series.count}"
+            else:
+                yield f"{self.name}{labels} {_format_number(series.value)}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._families: List[_Family] = []
+        # Sampled when /metrics is scraped: (family, fn returning {label values: value}).
+        self._collectors: List[Tuple[_Family, Callable[[], Dict[Tuple[str, ...], float]]]] = []
+
+    def _add(self, family: _Family) -> _Family:
+        self._families.append(family)
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> _Family:
+        return self._add(_Family("counter", name, help_text, tuple(labelnames), _CounterValue))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> _Family:
+        return self._add(_Family("gauge", name, help_text, tuple(labelnames), _CounterValue))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> _Family:
+        bounds = tuple(sorted(buckets))
+        return self._add(_Family("histogram", name, help_text, tuple(labelnames), lambda: _HistogramValue(bounds)))
+
+    def collect(self, family: _Family, fn: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        """Fills `family` from `fn` at scrape time, for values other modules already keep (e.g. cache stats)."""
+        self._collectors.append((family, fn))
+
+    def render(self) -> str:
+        for family, fn in self._collectors:
+            for values, value in fn().items():
+                family.labels(*values).set(value)
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route and status class.", ["method", "route", "status"])
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Time until the response (including a streamed body) was sent.",
+    LATENCY_BUCKETS, ["method", "route"],
+)
+
+# --- Chat ---
+CHAT_TTFT = registry.histogram(
+    "chat_time_to_first_token_seconds", "Time from the start of a chat turn (queueing included) to its first token.",
+    LATENCY_BUCKETS,
+)
+CHAT_TOKENS_PER_SECOND = registry.histogram(
+    "chat_tokens_per_second", "Estimated output tokens per second after the first token.", RATE_BUCKETS,
+)
+CHAT_OUTPUT_TOKENS = registry.counter("chat_output_tokens_total", "Estimated output tokens generated.")
+SSE_ACTIVE_STREAMS = registry.gauge("chat_sse_active_streams", "Chat responses currently streaming over SSE.")
+WEBSOCKET_CONNECTIONS = registry.gauge("chat_websocket_connections", "Open chat WebSocket connections.")
+LLM_SCHEDULER_TURNS = registry.gauge("llm_scheduler_turns", "Chat turns holding (active) or waiting for a model slot.", ["state"])
+
+# --- Datastore ---
+DATASTORE_READS = registry.counter("datastore_reads_total", "Documents read from the datastore.")
+DATASTORE_WRITES = registry.counter("datastore_writes_total", "Documents written to the datastore.")
+DATASTORE_READS_PER_REQUEST = registry.histogram(
+    "datastore_reads_per_request", "Documents read while handling one request.", COUNT_BUCKETS, ["route"],
+)
+DATASTORE_WRITES_PER_REQUEST = registry.histogram(
+    "datastore_writes_per_request", "Documents written while handling one request.", COUNT_BUCKETS, ["route"],
+)
+
+# --- Caches ---
+CACHE_HITS = registry.counter("cache_hits_total", "Lookups answered by an in-process cache since start.", ["cache"])
+CACHE_MISSES = registry.counter("cache_misses_total", "Lookups an in-process cache could not answer since start.", ["cache"])
+CACHE_HIT_RATIO = registry.gauge("cache_hit_ratio", "Hits over lookups of an in-process cache since start.", ["cache"])
+
+
+def register_caches(caches: Dict[str, object]) -> None:
+    """Exports hit/miss counts and the hit ratio of TTLCache-like objects (with `hits` and `misses`)."""
+    def hits() -> Dict[Tuple[str, ...], float]:
+        return {(name,): cache.hits for name, cache in caches.items()}
+
+    def misses() -> Dict[Tuple[str, ...], float]:
+        return {(name,): cache.misses for name, cache in caches.items()}
+
+    def ratios() -> Dict[Tuple[str, ...], float]:
+        return {
+            (name,): cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0
+            for name, cache in caches.items()
+        }
+
+    registry.collect(CACHE_HITS, hits)
+    registry.collect(CACHE_MISSES, misses)
+    registry.collect(CACHE_HIT_RATIO, ratios)
+
+
+# --- Per-request datastore tally ---
+
+class DatastoreOps:
+    __slots__ = ("reads", "writes")
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+
+_datastore_ops: ContextVar[Optional[DatastoreOps]] = ContextVar("datastore_ops", default=None)
+
+
+def count_datastore_reads(documents: int = 1) -> None:
+    """Records document reads. Firestore bills a query that returns nothing as one read."""
+    documents = max(1, documents)
+    DATASTORE_READS.inc(documents)
+    ops = _datastore_ops.get()
+    if ops is not None:
+        ops.reads += documents
+
+
+def count_datastore_writes(documents: int = 1) -> None:
+    DATASTORE_WRITES.inc(documents)
+    ops = _datastore_ops.get()
+    if ops is not None:
+        ops.writes += documents
+
+
+# --- ASGI middleware ---
+
+_STATUS_CLASSES = {1: "1xx", 2: "2xx", 3: "3xx", 4: "4xx", 5: "5xx"}
+
+
+def route_label(scope) -> str:
+    """
+    The matched route's full path template. `include_router` puts the
+    include prefix into `route.path` where it copies the routes; FastAPI
+    versions that keep the router's own route instead record the include
+    (with the combined prefix of nested includes) in the scope.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    included = scope.get("fastapi", {}).get("included_router")
+    include_context = getattr(included, "include_context", None)
+    return getattr(include_context, "prefix", "") + template
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request until its last body byte is sent, so streamed
+    responses count in full. Routes are labelled by their path template
+    (`/api/conversations/{conversation_id}`), never by the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        ops = DatastoreOps()
+        token = _datastore_ops.set(ops)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _datastore_ops.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, _STATUS_CLASSES.get(status // 100, "5xx")).inc()
+            DATASTORE_READS_PER_REQUEST.labels(route).observe(ops.reads)
+            DATASTORE_WRITES_PER_REQUEST.labels(route).observe(ops.writes)
@@ -0,0 +1,131 @@
+# backend/app/core/profiler.py
+"""
+Statistical profiler for a live worker.
+
+Samples the Python stacks of every thread and counts identical stacks. The
+result is in the collapsed ("folded") format that flamegraph.pl, speedscope
+and similar tools read: one `frame;frame;...;leaf count` line per stack,
+root first, with the thread name as the root frame.
+
+Where the platform has it, sampling is driven by a SIGPROF interval timer
+(CPU time): the signal handler runs on the event loop thread between two
+bytecodes, so the loop's own stack is sampled exactly where it is. A plain
+sampling thread would instead mostly see the loop wherever it last released
+the GIL, i.e. in `select`. Elsewhere a sampling thread is the fallback.
+
+Only the coroutine running at the sampled instant appears on the loop
+thread; time a request spends awaiting I/O is not CPU time. Use the request
+traces (core/tracing.py) for where that time goes.
+"""
+import asyncio
+import collections
+import os
+import signal
+import sys
+import threading
+from typing import Counter, Dict, Optional
+
+# Leaf frames of a thread that is waiting for work, left out unless asked for.
+_IDLE_LEAVES = {
+    ("wait", "threading.py"),
+    ("select", "selectors.py"),
+    ("_worker", "thread.py"),
+}
+
+# One profile at a time per worker. Only touched on the event loop.
+_running = False
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running on this worker."""
+
+
+def _frame_label(code) -> str:
+    # The last two path components keep labels short but unambiguous enough.
+    path = os.path.join(*code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class _Sampler:
+    def __init__(self, include_idle: bool):
+        self.include_idle = include_idle
+        self.stacks: Counter[str] = collections.Counter()
+        self._names: Dict[int, str] = {}
+
+    def _name(self, thread_id: int) -> str:
+        name = self._names.get(thread_id)
+        if name is None:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.get(thread_id, f"thread-{thread_id}")
+        return name
+
+    def add(self, thread_id: int, frame) -> None:
+        if not self.include_idle and (frame.f_code.co_name, os.path.basename(frame.f_code.co_filename)) in _IDLE_LEAVES:
+            return
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.append(self._name(thread_id))
+        labels.reverse()
+        self.stacks[";".join(labels)] += 1
+
+    def sample(self, skip: int, current: Optional[tuple] = None) -> None:
+        """Samples every thread but `skip`; `current` is (thread id, frame) already known for one of them."""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            if current is not None and thread_id == current[0]:
+                frame = current[1]
+            self.add(thread_id, frame)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def _profile_with_timer(sampler: _Sampler, seconds: float, interval: float) -> None:
+    loop_thread = threading.get_ident()
+
+    def on_signal(signum, frame):
+        # `frame` is where the loop thread was interrupted; its entry in
+        # sys._current_frames() would be this handler.
+        sampler.sample(skip=-1, current=(loop_thread, frame))
+
+    previous = signal.signal(signal.SIGPROF, on_signal)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+
+
+def _profile_with_thread(sampler: _Sampler, seconds: float, interval: float) -> None:
+    own_id = threading.get_ident()
+    stop = threading.Event()
+    timer = threading.Timer(seconds, stop.set)
+    timer.start()
+    while not stop.wait(interval):
+        sampler.sample(skip=own_id)
+
+
+async def profile(seconds: float, interval: float, include_idle: bool = False) -> str:
+    """
+    Samples every thread every `interval` seconds for `seconds` and returns
+    the collapsed stacks. Raises ProfilerBusy while another profile runs.
+    """
+    global _running
+    if _running:
+        raise ProfilerBusy("A profile is already running on this worker.")
+    _running = True
+    try:
+        sampler = _Sampler(include_idle)
+        # Signal handlers can only be installed from the main thread, which is where uvicorn runs the loop.
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            await _profile_with_timer(sampler, seconds, interval)
+        else:
+            # A thread of its own: the profile would hold a blocking-io worker for its whole duration.
+            await asyncio.to_thread(_profile_with_thread, sampler, seconds, interval)
+        return sampler.collapsed()
+    finally:
+        _running = False
@@ -0,0 +1,132 @@
+# backend/app/core/sse.py
+"""
+Server-sent events framing for streamed model output.
+
+- Text pieces are coalesced into at most one frame per
+  SSE_COALESCE_WINDOW_SECONDS, or earlier once SSE_COALESCE_MAX_BYTES
+  (counted in characters) are buffered. The first piece, and any piece
+  after a quiet spell, goes out immediately. A slow client therefore gets
+  fewer, larger frames instead of a backlog of tiny ones.
+- The source is read by a separate task into a queue of SSE_BUFFER_CHUNKS
+  pieces. When the client stops reading, the queue fills up and the task
+  stops pulling from the model stream (backpressure) instead of buffering
+  without bound.
+- When nothing was sent for SSE_HEARTBEAT_SECONDS, a comment line keeps
+  proxies from closing the idle connection.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+from ..config.settings import settings
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError: # pragma: no cover - orjson is optional
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+HEARTBEAT = b": keep-alive\n\n"
+
+_DONE = object()
+
+
+def event(data, event_name: Optional[str] = None) -> bytes:
+    """Encodes one SSE frame whose data is `data` as JSON."""
+    prefix = b"event: " + event_name.encode("utf-8") + b"\n" if event_name else b""
+    return prefix + b"data: " + dumps(data) + b"\n\n"
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def coalesce(
+    pieces: AsyncIterator[str],
+    window: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    heartbeat: Optional[float] = None,
+    buffer_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Turns a stream of text pieces into `data: {"content": ...}` SSE frames
+    (see the module docstring). Empty pieces are skipped.
+    """
+    async for text in batches(pieces, window, max_bytes, heartbeat, buffer_size):
+        yield HEARTBEAT if text is None else event({"content": text})
+
+
+async def batches(
+    pieces: AsyncIterator[str],
+    window: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    heartbeat: Optional[float] = None,
+    buffer_size: Optional[int] = None,
+) -> AsyncIterator[Optional[str]]:
+    """
+    The transport-independent part of `coalesce`: yields the coalesced text
+    of each frame, and None whenever `heartbeat` seconds passed idle.
+    """
+    window = settings.SSE_COALESCE_WINDOW_SECONDS if window is None else window
+    max_bytes = settings.SSE_COALESCE_MAX_BYTES if max_bytes is None else max_bytes
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_BUFFER_CHUNKS if buffer_size is None else buffer_size)
+
+    async def _pump() -> None:
+        try:
+            async for piece in pieces:
+                if piece:
+                    await queue.put(piece)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(_Failure(e))
+
+    # The task inherits this context, so request-scoped context vars stay visible to the source.
+    pump = asyncio.get_running_loop().create_task(_pump())
+    try:
+        buffered, size, done = [], 0, False
+        # Earliest time the next frame may go out; the first one is not held back.
+        frame_deadline = 0.0
+        while not done:
+            if buffered:
+                timeout = max(0.0, frame_deadline - time.monotonic())
+            else:
+                timeout = heartbeat
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _DONE:
+                done = True
+            elif isinstance(item, _Failure):
+                raise item.error
+            elif item is not None:
+                buffered.append(item)
+                size += len(item)
+                # Drain whatever else is already waiting without another wakeup.
+                while size < max_bytes and not queue.empty():
+                    item = queue.get_nowait()
+                    if item is _DONE:
+                        done = True
+                        break
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    buffered.append(item)
+                    size += len(item)
+            elif not buffered:
+                yield None
+                continue
+
+            if buffered and (done or size >= max_bytes or time.monotonic() >= frame_deadline):
+                yield "".join(buffered)
+                buffered, size = [], 0
+                frame_deadline = time.monotonic() + window
+    finally:
+        pump.cancel()
@@ -0,0 +1,12 @@
+# backend/app/core/tokens.py
+from typing import Any
+
+# Gemini averages roughly four characters per token for English text. The
+# exact count would need a network call (`count_tokens`), which is far too
+# slow to run per message, and budgeting only needs a stable estimate.
+CHARS_PER_TOKEN = 4
+
+def count_tokens(content: Any) -> int:
+    """Estimates the number of tokens in a message's content."""
+    text = content if isinstance(content, str) else str(content)
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
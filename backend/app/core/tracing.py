@@ -0,0 +1,208 @@
+# backend/app/core/tracing.py
+"""
+Opt-in, per-request span tracing (TRACING_ENABLED).
+
+`TracingMiddleware` opens a root span for a sampled request and keeps it in a
+context var; `span()` and `@traced` open child spans under whatever span is
+current, so a slow chat turn breaks down into auth, the ownership check, the
+history load, the model stream and the write-back. Outside a traced request
+both are a single context var lookup.
+
+Finished traces go to an in-memory ring buffer (TRACE_BUFFER_SIZE, read
+through the admin API) and, if TRACE_FILE is set, are appended to it as one
+JSON object per line. Each traced response carries its id in `X-Trace-Id`.
+
+Tasks started during a request copy its context, so spans opened in them
+(e.g. the single-flight generation task) land in the same trace.
+"""
+import asyncio
+import collections
+import contextlib
+import functools
+import inspect
+import json
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from ..config.settings import settings
+from .executor import run_blocking
+from .metrics import route_label
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        trace.spans.append(self)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        self.end = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        origin = self.trace.root.start
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            # Spans still open (e.g. a generation that outlived its request) have no duration yet.
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self.root = Span(self, name, None, {})
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.root.end is None:
+            return None
+        return round((self.root.end - self.root.start) * 1000, 3)
+
+    def summary(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "spans": len(self.spans),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "spans": [span.to_dict() for span in list(self.spans)]}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextlib.contextmanager
+def span(name: str, activate: bool = True, **attributes: Any):
+    """
+    Times the enclosed block as a child of the current span; yields the span,
+    or None outside a traced request. Pass `activate=False` inside async
+    generators: they may be resumed from another context, so their spans must
+    not become the current one.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child) if activate else None
+    try:
+        yield child
+    except BaseException as e:
+        child.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        child.finish()
+        if token is not None:
+            _current_span.reset(token)
+
+
+def traced(name: str):
+    """Decorator form of `span()` for plain and coroutine functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Recording ---
+
+_traces: Deque[Trace] = collections.deque(maxlen=settings.TRACE_BUFFER_SIZE)
+_file_lock = threading.Lock()
+
+
+def recent_traces(limit: int, min_duration_ms: float = 0.0) -> List[dict]:
+    """Summaries of the newest finished traces, newest first."""
+    result = []
+    for trace in reversed(_traces):
+        if (trace.duration_ms or 0.0) >= min_duration_ms:
+            result.append(trace.summary())
+            if len(result) == limit:
+                break
+    return result
+
+
+def get_trace(trace_id: str) -> Optional[dict]:
+    for trace in _traces:
+        if trace.trace_id == trace_id:
+            return trace.to_dict()
+    return None
+
+
+def _append_to_file(line: str) -> None:
+    with _file_lock, open(settings.TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def _record(trace: Trace) -> None:
+    _traces.append(trace)
+    if settings.TRACE_FILE:
+        await run_blocking(_append_to_file, json.dumps(trace.to_dict(), default=str))
+
+
+# --- ASGI middleware ---
+
+class TracingMiddleware:
+    """Traces a TRACE_SAMPLE_RATE share of HTTP requests, each until its last body byte is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.TRACE_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(f'{scope["method"]} {scope["path"]}')
+        token = _current_span.set(trace.root)
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                trace.root.attributes["status"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode("ascii"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            trace.root.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            trace.root.finish()
+            # Named after the route template once routing has matched one.
+            if scope.get("route") is not None:
+                trace.root.name = f'{scope["method"]} {route_label(scope)}'
+            # Recording must not be lost to a cancelled request.
+            await asyncio.shield(_record(trace))
@@ -1,17 +1,44 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .config.firebase_config import initialize_firebase
-initialize_firebase()
-from .api import auth, conversation, chat
+from .config.settings import settings
+from .api import admin, auth, conversation, chat
+from .core.container import container
+from .core.executor import run_blocking
+from .core.tracing import TracingMiddleware
+from .core.metrics import LLM_SCHEDULER_TURNS, MetricsMiddleware, register_caches, registry
+from .repositories import get_repository
+from .services import auth_service, deletion_service, memory_service, response_cache
+from .services.langchain_service import get_llm, scheduler
+
+# Startup warm-ups (see core/container.py). They run concurrently in the
+# background; the worker serves requests while they finish.
+async def _warm_up_storage():
+    repo = await run_blocking(get_repository)
+    await repo.warm_up()
+
+async def _warm_up_llm():
+    await run_blocking(get_llm)
+
+async def _warm_up_token_certs():
+    await run_blocking(auth_service.warm_up_token_certs)
+
+container.register("firebase", lambda: run_blocking(initialize_firebase))
+container.register("storage", _warm_up_storage)
+container.register("llm", _warm_up_llm)
+if settings.WARMUP_TOKEN_CERTS:
+    container.register("token_certs", _warm_up_token_certs, critical=False, after=["firebase"])
+# Finish purges that a previous worker tombstoned but did not complete.
+container.register("pending_purges", deletion_service.resume_pending_purges, critical=False, after=["storage"])
 
 app = FastAPI(
     title="Real-Time Chatbot API",
     description="Backend for the LangChain Chatbot with persistent storage.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=container.lifespan,
 )
 
-# Initialize Firebase Admin SDK on startup
-
 
 # Configure CORS
 origins = [
@@ -27,10 +54,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    register_caches({
+        "response": response_cache._cache,
+        "token": auth_service._token_cache,
+        "history": memory_service._history_cache,
+    })
+    registry.collect(LLM_SCHEDULER_TURNS, lambda: {("active",): scheduler._active, ("waiting",): scheduler._waiting})
+
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Include API routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(conversation.router, prefix="/api/conversations", tags=["Conversations"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+
+@app.get("/ready", tags=["Root"])
+async def read_ready():
+    """Readiness probe: 200 once the critical warm-ups are done, 503 before."""
+    return JSONResponse(container.status(), status_code=200 if container.ready else 503)
+
+@app.get("/metrics", tags=["Root"], include_in_schema=False)
+async def read_metrics():
+    """Prometheus scrape endpoint."""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("Metrics are disabled.\n", status_code=404)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ConversationCreate(BaseModel):
@@ -19,4 +19,38 @@ class ConversationInDB(BaseModel):
     last_message_timestamp: Optional[datetime] = None
 
     class Config:
-        orm_mode = True # For compatibility with ORM-like objects
\ No newline at end of file
+        orm_mode = True # For compatibility with ORM-like objects
+
+class ConversationSummary(BaseModel):
+    """The subset of a conversation the sidebar needs."""
+    id: str
+    title: str
+    updated_at: datetime
+    last_message: Optional[str] = None
+    last_message_timestamp: Optional[datetime] = None
+
+class ConversationPage(BaseModel):
+    items: List[ConversationSummary]
+    # Pass back as `cursor` to get the next page; None on the last page.
+    next_cursor: Optional[str] = None
+    # Pass to GET /changes as `since` to get what changed after this listing.
+    sync_cursor: Optional[str] = None
+
+class ConversationChange(BaseModel):
+    """A created, updated or deleted conversation. Deleted ones only carry their id."""
+    id: str
+    title: Optional[str] = None
+    updated_at: datetime
+    last_message: Optional[str] = None
+    last_message_timestamp: Optional[datetime] = None
+    deleted: bool = False
+
+class ConversationChanges(BaseModel):
+    # Oldest change first.
+    items: List[ConversationChange]
+    # Pass back as `since` next time.
+    sync_cursor: str
+    # More changes are waiting; ask again right away.
+    has_more: bool = False
+    # The cursor is too old to be served incrementally; reload the full list.
+    reset: bool = False
\ No newline at end of file
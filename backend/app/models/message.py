@@ -11,4 +11,8 @@ class Message(BaseModel):
 
 class ChatMessage(BaseModel):
     conversation_id: str
-    message: str
\ No newline at end of file
+    message: str
+    # Set to False to always get a freshly generated answer.
+    use_cache: bool = True
+    # Set to True to get `queue` events with the turn's position while it waits for a slot.
+    report_queue_position: bool = False
\ No newline at end of file
@@ -0,0 +1,67 @@
+# backend/app/repositories/__init__.py
+"""
+Storage backends. Everything that reads or writes users, conversations or
+messages goes through `get_repository()`, which returns the backend chosen
+by settings.STORAGE_BACKEND ("firestore" or "sqlite"); Firestore stores
+messages in the layout chosen by settings.MESSAGE_LAYOUT. Synchronous callers, which are not on the
+server's event loop, use `get_sync_repository()` instead.
+"""
+import threading
+from typing import Optional
+
+from .base import SIDEBAR_FIELDS, Repository, is_owned_by
+from ..config.settings import settings
+
+__all__ = ["SIDEBAR_FIELDS", "Repository", "get_repository", "get_sync_repository", "is_owned_by"]
+
+_repository: Optional[Repository] = None
+_repository_lock = threading.Lock()
+_sync_repository: Optional[Repository] = None
+
+
+def get_repository() -> Repository:
+    """
+    The configured storage backend, created on first use. The startup
+    warm-up creates it in a worker thread, so requests normally find it ready.
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = _create_repository()
+    return _repository
+
+
+def get_sync_repository() -> Repository:
+    """
+    The storage backend for synchronous code, which drives it on the
+    background loop of core.executor.run_sync. Firestore clients belong to
+    the loop they were first used on, so it gets a client of its own; the
+    SQLite backend is not tied to a loop and is shared.
+    """
+    global _sync_repository
+    if settings.STORAGE_BACKEND != "firestore":
+        return get_repository()
+    if _sync_repository is None:
+        with _repository_lock:
+            if _sync_repository is None:
+                _sync_repository = _create_repository(dedicated_client=True)
+    return _sync_repository
+
+
+def _create_repository(dedicated_client: bool = False) -> Repository:
+    if settings.STORAGE_BACKEND == "firestore":
+        # Imported here so the SQLite backend runs without Firestore credentials.
+        from ..services.firebase_service import create_async_db, get_async_db
+        db = create_async_db() if dedicated_client else get_async_db()
+        if settings.MESSAGE_LAYOUT == "paged":
+            from .firestore_paged_repository import PagedFirestoreRepository
+            return PagedFirestoreRepository(db, settings.MESSAGE_PAGE_SIZE)
+        if settings.MESSAGE_LAYOUT == "flat":
+            from .firestore_repository import FirestoreRepository
+            return FirestoreRepository(db)
+        raise ValueError(f"Unknown MESSAGE_LAYOUT: {settings.MESSAGE_LAYOUT!r}")
+    if settings.STORAGE_BACKEND == "sqlite":
+        from .sqlite_repository import SQLiteRepository
+        return SQLiteRepository(settings.SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND!r}")
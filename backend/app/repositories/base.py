@@ -0,0 +1,234 @@
+# backend/app/repositories/base.py
+"""
+Storage interface for users, conversations and messages.
+
+Conversations and messages are plain dicts. Every returned dict carries its
+`id`; timestamps are timezone-aware UTC datetimes. Message order is
+`(timestamp, id)`.
+"""
+import abc
+import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Fields the conversation list needs. Everything else (e.g. the rolling
+# summary) stays on the server.
+SIDEBAR_FIELDS = ["title", "updated_at", "last_message", "last_message_timestamp", "deleted"]
+
+
+def is_owned_by(conv: Optional[Dict[str, Any]], user_id: str) -> bool:
+    """True if the conversation exists, is not being deleted and belongs to `user_id`."""
+    return conv is not None and not conv.get("deleted") and conv.get("user_id") == user_id
+
+
+def cleared_message_fields() -> Dict[str, Any]:
+    """
+    A conversation's message-describing fields once its messages were
+    cleared. `cleared_at` tells workers holding a cached history to reread it.
+    """
+    return {
+        "last_message": None,
+        "last_message_timestamp": None,
+        "message_count": 0,
+        "summary": None,
+        "summary_message_count": 0,
+        "cleared_at": datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+class Repository(abc.ABC):
+    # Upper bound for the number of ids passed to `delete_messages` at once.
+    max_batch_writes: int
+    # How many messages one stored document holds, for counting datastore reads.
+    messages_per_document: int = 1
+
+    def message_documents(self, count: int) -> int:
+        """Documents read to fetch `count` consecutive messages (an estimate when they are paged)."""
+        return -(-count // self.messages_per_document)
+
+    async def warm_up(self) -> None:
+        """Opens the backend's connections ahead of the first request with a cheap read."""
+        await self.get_conversation("warm-up")
+
+    # --- Users ---
+
+    @abc.abstractmethod
+    async def create_user(self, uid: str, data: Dict[str, Any]) -> None:
+        """Stores the profile of a newly registered user."""
+
+    # --- Conversations ---
+
+    @abc.abstractmethod
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the conversation, or None."""
+
+    @abc.abstractmethod
+    async def get_conversations(self, conversation_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Fetches several conversations in one round trip; missing ones map to None."""
+
+    @abc.abstractmethod
+    async def create_conversation(self, data: Dict[str, Any]) -> str:
+        """Creates a conversation and returns its id."""
+
+    @abc.abstractmethod
+    async def list_conversations(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` of a user's conversations, most recently updated
+        first, projected to SIDEBAR_FIELDS. Tombstoned conversations are included
+        (with `deleted` set) so that page boundaries stay stable; callers skip them.
+
+        `after` is the `(updated_at, id)` of the last conversation of the previous
+        page. The id breaks ties between equal timestamps, so pages never
+        overlap or skip entries.
+        """
+
+    @abc.abstractmethod
+    async def list_conversation_changes(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, Optional[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` of a user's conversations updated after `after`,
+        oldest change first, projected to SIDEBAR_FIELDS. Tombstones are
+        included. `after` is an `(updated_at, id)` position; with a None id,
+        everything updated strictly after `updated_at` is returned.
+        """
+
+    @abc.abstractmethod
+    async def update_conversation(self, conversation_id: str, data: Dict[str, Any]) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def update_conversation_if(
+        self, conversation_id: str, data: Dict[str, Any], condition: Callable[[Dict[str, Any]], bool]
+    ) -> bool:
+        """
+        Applies `data` only if `condition` holds for the conversation as
+        currently stored, atomically with the check (so a concurrent writer
+        cannot slip in between). Returns whether it was applied; False for a
+        missing conversation, without calling `condition`.
+        """
+
+    async def tombstone_conversation(self, conversation_id: str) -> None:
+        """Marks a conversation as deleted; its messages are purged in the background."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await self.update_conversation(conversation_id, {
+            "deleted": True, "deleted_at": now, "updated_at": now, "purged_at": None,
+        })
+
+    @abc.abstractmethod
+    async def list_tombstoned_conversation_ids(self) -> List[str]:
+        """Ids of conversations whose purge has not finished yet (e.g. after a restart)."""
+
+    async def mark_conversation_purged(self, conversation_id: str) -> None:
+        """
+        Records that a tombstoned conversation's messages are gone. The
+        tombstone itself stays (without its content) so that clients syncing
+        changes learn about the deletion.
+        """
+        await self.update_conversation(conversation_id, {
+            "purged_at": datetime.datetime.now(datetime.timezone.utc),
+            "title": None,
+            "last_message": None,
+            "summary": None,
+        })
+
+    @abc.abstractmethod
+    async def delete_purged_conversations(self, purged_before: datetime.datetime) -> int:
+        """Deletes the tombstones of conversations purged before `purged_before`; returns how many."""
+
+    # --- Messages ---
+
+    @abc.abstractmethod
+    def stream_messages(
+        self,
+        conversation_id: str,
+        since: Optional[datetime.datetime] = None,
+        before: Optional[Tuple[datetime.datetime, str]] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+        after_seq: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams the messages of a conversation, ordered by timestamp.
+
+        - `since`: only messages at or after this timestamp (history tail fetches).
+        - `before`: the `(timestamp, id)` of the last message of the previous page
+          when paging backwards with `newest_first`.
+        - `after_seq`: only messages numbered higher than this. Layouts that
+          number messages return a `seq` with each one and use this instead of
+          `since`, which depends on the writers' clocks; the others ignore it.
+        """
+
+    async def list_messages(
+        self,
+        conversation_id: str,
+        since: Optional[datetime.datetime] = None,
+        after_seq: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the messages of a conversation in chronological order.
+
+        With `since` (or `after_seq`, see `stream_messages`), only the newer
+        messages are read; callers that already hold the earlier part of the
+        history use this to fetch just the tail.
+        """
+        return [msg async for msg in self.stream_messages(conversation_id, since=since, after_seq=after_seq)]
+
+    async def list_message_page(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: Optional[Tuple[datetime.datetime, str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime.datetime, str]]]:
+        """
+        Returns up to `limit` messages older than `before`, newest first, and
+        the `before` of the next (older) page, or None once the start of the
+        conversation is reached.
+        """
+        # One extra message tells whether an older page exists.
+        docs = [
+            msg async for msg in self.stream_messages(conversation_id, before=before, newest_first=True, limit=limit + 1)
+        ]
+        if len(docs) <= limit:
+            return docs, None
+        last = docs[limit - 1]
+        return docs[:limit], (last["timestamp"], last["id"])
+
+    @abc.abstractmethod
+    async def add_messages(self, conversation_id: str, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Stores a batch of `(role, content)` messages and updates the conversation's
+        preview fields, all in a single atomic write. Returns the stored messages.
+        """
+
+    @abc.abstractmethod
+    def iter_message_id_pages(self, conversation_id: str, page_size: int) -> AsyncIterator[List[str]]:
+        """
+        Yields the ids of the documents holding a conversation's messages,
+        `page_size` at a time, for `delete_messages`. Deleting a page while the
+        next one is read must be safe.
+        """
+
+    @abc.abstractmethod
+    async def delete_messages(self, message_ids: List[str]) -> None:
+        """Deletes up to `max_batch_writes` messages in one batch."""
+
+    async def reset_conversation_preview(self, conversation_id: str) -> None:
+        """Resets the fields that describe a conversation's messages after they were cleared."""
+        await self.update_conversation(conversation_id, cleared_message_fields())
+
+
+def message_timestamps(count: int) -> List[datetime.datetime]:
+    """
+    Timestamps for `count` messages written together. Each message gets its
+    own microsecond so their order survives the shared commit time.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [now + datetime.timedelta(microseconds=offset) for offset in range(count)]
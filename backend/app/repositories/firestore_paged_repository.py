@@ -0,0 +1,232 @@
+# backend/app/repositories/firestore_paged_repository.py
+"""
+Firestore backend with messages stored in pages (MESSAGE_LAYOUT=paged).
+
+The flat layout keeps one document per message in the top-level `messages`
+collection: reading a history costs one read per message and needs a
+composite index on (conversation_id, timestamp). Here a conversation's
+messages live in its `message_pages` subcollection, up to MESSAGE_PAGE_SIZE
+messages per document, so a 500-message history is about ten reads and the
+tail fetch of a cached history is a single one. Only single-field indexes
+are used.
+
+Every message gets a per-conversation sequence number, allocated in a
+transaction on the conversation document together with the page
+bookkeeping (`next_seq`, `last_page`, `last_page_count`, `last_page_bytes`,
+`last_page_timestamp`). Message order is the sequence order, so concurrent
+writers never collide on equal timestamps, and tail fetches by sequence
+(`after_seq`) do not depend on the writers' clocks. Message ids are
+`<conversation id>-<seq>`, zero-padded so they sort like the sequence. Each
+page records its `first_seq`, `last_seq` and newest `last_timestamp` for
+the backwards paging and tail queries.
+
+A page is closed early when it approaches Firestore's 1 MiB document limit.
+"""
+import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+
+from .base import cleared_message_fields, message_timestamps
+from .firestore_repository import CONVERSATIONS, MESSAGES, FirestoreRepository
+from ..core.tokens import count_tokens
+
+PAGES = "message_pages"
+
+# Leaves headroom below Firestore's 1 MiB per document for field names and the page's own fields.
+MAX_PAGE_BYTES = 900_000
+
+
+def message_id(conversation_id: str, seq: int) -> str:
+    return f"{conversation_id}-{seq:010d}"
+
+
+def _seq_of(msg_id: str) -> int:
+    return int(msg_id.rsplit("-", 1)[1])
+
+
+def _page_id(number: int) -> str:
+    return f"{number:08d}"
+
+
+def _message_bytes(message: Dict[str, Any]) -> int:
+    # Content plus a generous allowance for the other fields.
+    return len(message["content"].encode("utf-8")) + 128
+
+
+class PagedFirestoreRepository(FirestoreRepository):
+    def __init__(self, client, page_size: int):
+        super().__init__(client)
+        self.page_size = page_size
+        self.messages_per_document = page_size
+
+    def _pages(self, conversation_id: str):
+        return self._db.collection(CONVERSATIONS).document(conversation_id).collection(PAGES)
+
+    # --- Messages ---
+
+    async def stream_messages(
+        self,
+        conversation_id: str,
+        since: Optional[datetime.datetime] = None,
+        before: Optional[Tuple[datetime.datetime, str]] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+        after_seq: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        direction = firestore.Query.DESCENDING if newest_first else firestore.Query.ASCENDING
+        before_seq = _seq_of(before[1]) if before is not None else None
+        if after_seq is not None:
+            # The sequence is exact; timestamps come from the writers' clocks.
+            since = None
+        # Pages are in sequence and timestamp order alike, so whichever field
+        # carries the range filter can order them.
+        query = self._pages(conversation_id)
+        if before_seq is not None:
+            query = query.where("first_seq", "<", before_seq).order_by("first_seq", direction=direction)
+        elif after_seq is not None:
+            query = query.where("last_seq", ">", after_seq).order_by("last_seq", direction=direction)
+        elif since is not None:
+            query = query.where("last_timestamp", ">=", since).order_by("last_timestamp", direction=direction)
+        else:
+            query = query.order_by("first_seq", direction=direction)
+        if limit is not None:
+            # The first page read may be partly filtered out.
+            query = query.limit(-(-limit // self.page_size) + 1)
+
+        sent = 0
+        async for doc in query.stream():
+            messages = sorted(doc.to_dict().get("messages", []), key=lambda message: message["seq"], reverse=newest_first)
+            for message in messages:
+                if before_seq is not None and message["seq"] >= before_seq:
+                    continue
+                if after_seq is not None and message["seq"] <= after_seq:
+                    continue
+                if since is not None and message["timestamp"] < since:
+                    continue
+                yield {**message, "id": message_id(conversation_id, message["seq"]), "conversation_id": conversation_id}
+                sent += 1
+                if sent == limit:
+                    return
+
+    async def add_messages(self, conversation_id: str, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        if not messages:
+            return []
+        stored = [
+            {"role": role, "content": content, "token_count": count_tokens(content), "timestamp": timestamp}
+            for (role, content), timestamp in zip(messages, message_timestamps(len(messages)))
+        ]
+        last = stored[-1]
+        await self._append(conversation_id, stored, {
+            "last_message": last["content"][:100], # Preview
+            "last_message_timestamp": last["timestamp"],
+            "updated_at": last["timestamp"],
+            "message_count": firestore.Increment(len(stored)),
+        })
+        return [{**message, "id": message_id(conversation_id, message["seq"]), "conversation_id": conversation_id} for message in stored]
+
+    async def import_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Appends messages read from the flat layout, keeping their timestamps
+        and token counts. The conversation's preview fields already describe
+        them; `paged_until` records the newest one so a re-run can resume.
+        """
+        if not messages:
+            return
+        await self._append(
+            conversation_id,
+            [
+                {
+                    "role": message.get("role", "human"),
+                    "content": message.get("content", ""),
+                    "token_count": message.get("token_count") or count_tokens(message.get("content", "")),
+                    "timestamp": message["timestamp"],
+                }
+                for message in messages
+            ],
+            {"paged_until": messages[-1]["timestamp"]},
+        )
+
+    async def _append(self, conversation_id: str, messages: List[Dict[str, Any]], conversation_update: Dict[str, Any]) -> None:
+        """
+        Numbers `messages` (setting their `seq`) and appends them to the last
+        page, opening new pages as needed, in one transaction with
+        `conversation_update`.
+        """
+        conv_ref = self._db.collection(CONVERSATIONS).document(conversation_id)
+        pages = self._pages(conversation_id)
+
+        @firestore.async_transactional
+        async def append(transaction) -> None:
+            snapshot = await conv_ref.get(transaction=transaction)
+            conv = snapshot.to_dict() or {}
+            seq = conv.get("next_seq", 0)
+            page = conv.get("last_page", -1)
+            count = conv.get("last_page_count", 0)
+            size = conv.get("last_page_bytes", 0)
+            # Newest timestamp on the last page; imported messages may be older than it.
+            last_timestamp = conv.get("last_page_timestamp")
+            # page number -> (opened by this write, its new messages)
+            writes: Dict[int, Tuple[bool, List[Dict[str, Any]]]] = {}
+            page_last_timestamps: Dict[int, datetime.datetime] = {}
+            for message in messages:
+                message_bytes = _message_bytes(message)
+                if page < 0 or count >= self.page_size or (count and size + message_bytes > MAX_PAGE_BYTES):
+                    page, count, size, last_timestamp = page + 1, 0, 0, None
+                if last_timestamp is None or message["timestamp"] > last_timestamp:
+                    last_timestamp = message["timestamp"]
+                message["seq"] = seq
+                writes.setdefault(page, (count == 0, []))[1].append(message)
+                page_last_timestamps[page] = last_timestamp
+                seq, count, size = seq + 1, count + 1, size + message_bytes
+
+            for number, (opened, page_messages) in writes.items():
+                data = {
+                    # Appends in order; the elements are distinct by their `seq`.
+                    "messages": firestore.ArrayUnion(page_messages),
+                    "last_seq": page_messages[-1]["seq"],
+                    # Never moves backwards, or tail queries by time would skip the page.
+                    "last_timestamp": page_last_timestamps[number],
+                }
+                if opened:
+                    data["first_seq"] = page_messages[0]["seq"]
+                transaction.set(pages.document(_page_id(number)), data, merge=True)
+            # `update` fails for a missing conversation, like the flat layout's batch.
+            transaction.update(conv_ref, {
+                **conversation_update,
+                "next_seq": seq,
+                "last_page": page,
+                "last_page_count": count,
+                "last_page_bytes": size,
+                "last_page_timestamp": last_timestamp,
+            })
+
+        await append(self._db.transaction())
+
+    async def iter_message_id_pages(self, conversation_id: str, page_size: int) -> AsyncIterator[List[str]]:
+        # Page documents, addressed by path. Purge progress therefore counts pages, not messages.
+        last_id = None
+        while True:
+            query = self._pages(conversation_id).order_by("__name__").select([]).limit(page_size)
+            if last_id is not None:
+                query = query.start_after({"__name__": last_id})
+            docs = [doc async for doc in query.stream()]
+            if not docs:
+                break
+            yield [doc.reference.path for doc in docs]
+            if len(docs) < page_size:
+                break
+            last_id = docs[-1].id
+        # Flat documents left behind by a migration that kept them.
+        async for ids in super().iter_message_id_pages(conversation_id, page_size):
+            yield [f"{MESSAGES}/{msg_id}" for msg_id in ids]
+
+    async def delete_messages(self, message_ids: List[str]) -> None:
+        batch = self._db.batch()
+        for path in message_ids:
+            batch.delete(self._db.document(path))
+        await batch.commit()
+
+    async def reset_conversation_preview(self, conversation_id: str) -> None:
+        # Sequence numbers stay monotonic; the next message opens a fresh page.
+        await self.update_conversation(conversation_id, {**cleared_message_fields(), "last_page_count": self.page_size})
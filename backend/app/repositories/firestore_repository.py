@@ -0,0 +1,218 @@
+# backend/app/repositories/firestore_repository.py
+"""
+Firestore storage backend.
+
+Uses the async Firestore client, so a slow read only suspends the request
+that issued it instead of the whole worker.
+"""
+import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+
+from .base import SIDEBAR_FIELDS, Repository, message_timestamps
+from ..core.tokens import count_tokens
+
+USERS = "users"
+CONVERSATIONS = "conversations"
+MESSAGES = "messages"
+
+# Firestore rejects batches with more than 500 writes.
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+
+def _snapshot_to_dict(doc) -> Dict[str, Any]:
+    data = doc.to_dict()
+    data["id"] = doc.id
+    return data
+
+
+class FirestoreRepository(Repository):
+    max_batch_writes = FIRESTORE_MAX_BATCH_WRITES
+
+    def __init__(self, client):
+        self._db = client
+
+    # --- Users ---
+
+    async def create_user(self, uid: str, data: Dict[str, Any]) -> None:
+        await self._db.collection(USERS).document(uid).set(data)
+
+    # --- Conversations ---
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._db.collection(CONVERSATIONS).document(conversation_id).get()
+        if not doc.exists:
+            return None
+        return _snapshot_to_dict(doc)
+
+    async def get_conversations(self, conversation_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        refs = [self._db.collection(CONVERSATIONS).document(conv_id) for conv_id in conversation_ids]
+        found = {conv_id: None for conv_id in conversation_ids}
+        async for doc in self._db.get_all(refs):
+            if doc.exists:
+                found[doc.id] = _snapshot_to_dict(doc)
+        return found
+
+    async def create_conversation(self, data: Dict[str, Any]) -> str:
+        _, conv_ref = await self._db.collection(CONVERSATIONS).add(data)
+        return conv_ref.id
+
+    async def list_conversations(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        query = (
+            self._db.collection(CONVERSATIONS)
+            .where("user_id", "==", user_id)
+            .order_by("updated_at", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+            .select(SIDEBAR_FIELDS)
+        )
+        if after is not None:
+            updated_at, conv_id = after
+            query = query.start_after({"updated_at": updated_at, "__name__": conv_id})
+        return [_snapshot_to_dict(doc) async for doc in query.limit(limit).stream()]
+
+    async def list_conversation_changes(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, Optional[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        query = self._db.collection(CONVERSATIONS).where("user_id", "==", user_id)
+        if after is not None and after[1] is None:
+            query = query.where("updated_at", ">", after[0])
+        query = (
+            query.order_by("updated_at", direction=firestore.Query.ASCENDING)
+            .order_by("__name__", direction=firestore.Query.ASCENDING)
+            .select(SIDEBAR_FIELDS)
+        )
+        if after is not None and after[1] is not None:
+            updated_at, conv_id = after
+            query = query.start_after({"updated_at": updated_at, "__name__": conv_id})
+        return [_snapshot_to_dict(doc) async for doc in query.limit(limit).stream()]
+
+    async def update_conversation(self, conversation_id: str, data: Dict[str, Any]) -> None:
+        await self._db.collection(CONVERSATIONS).document(conversation_id).update(data)
+
+    async def update_conversation_if(
+        self, conversation_id: str, data: Dict[str, Any], condition: Callable[[Dict[str, Any]], bool]
+    ) -> bool:
+        conv_ref = self._db.collection(CONVERSATIONS).document(conversation_id)
+
+        @firestore.async_transactional
+        async def update(transaction) -> bool:
+            snapshot = await conv_ref.get(transaction=transaction)
+            if not snapshot.exists or not condition(_snapshot_to_dict(snapshot)):
+                return False
+            transaction.update(conv_ref, data)
+            return True
+
+        return await update(self._db.transaction())
+
+    async def list_tombstoned_conversation_ids(self) -> List[str]:
+        query = (
+            self._db.collection(CONVERSATIONS)
+            .where("deleted", "==", True)
+            .where("purged_at", "==", None)
+            .select([])
+        )
+        return [doc.id async for doc in query.stream()]
+
+    async def delete_purged_conversations(self, purged_before: datetime.datetime) -> int:
+        # A range filter only matches timestamps, so unpurged (null) tombstones are skipped.
+        query = self._db.collection(CONVERSATIONS).where("purged_at", "<", purged_before).select([])
+        deleted = 0
+        batch, pending = self._db.batch(), 0
+        async for doc in query.stream():
+            batch.delete(doc.reference)
+            pending += 1
+            if pending == FIRESTORE_MAX_BATCH_WRITES:
+                await batch.commit()
+                deleted += pending
+                batch, pending = self._db.batch(), 0
+        if pending:
+            await batch.commit()
+            deleted += pending
+        return deleted
+
+    # --- Messages ---
+
+    def _messages_query(self, conversation_id: str):
+        return self._db.collection(MESSAGES).where("conversation_id", "==", conversation_id)
+
+    async def stream_messages(
+        self,
+        conversation_id: str,
+        since: Optional[datetime.datetime] = None,
+        before: Optional[Tuple[datetime.datetime, str]] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+        after_seq: Optional[int] = None, # Messages are not numbered in this layout
+    ) -> AsyncIterator[Dict[str, Any]]:
+        direction = firestore.Query.DESCENDING if newest_first else firestore.Query.ASCENDING
+        query = self._messages_query(conversation_id)
+        if since is not None:
+            query = query.where("timestamp", ">=", since)
+        query = query.order_by("timestamp", direction=direction).order_by("__name__", direction=direction)
+        if before is not None:
+            timestamp, msg_id = before
+            query = query.start_after({"timestamp": timestamp, "__name__": msg_id})
+        if limit is not None:
+            query = query.limit(limit)
+        async for doc in query.stream():
+            yield _snapshot_to_dict(doc)
+
+    async def add_messages(self, conversation_id: str, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        if not messages:
+            return []
+        # Timezone-aware, like the timestamps Firestore hands back on reads, so the
+        # returned messages can be compared with previously read ones.
+        batch = self._db.batch()
+        stored = []
+        for (role, content), timestamp in zip(messages, message_timestamps(len(messages))):
+            msg_ref = self._db.collection(MESSAGES).document()
+            message = {
+                "conversation_id": conversation_id,
+                "role": role,
+                "content": content,
+                "token_count": count_tokens(content),
+                "timestamp": timestamp,
+            }
+            batch.set(msg_ref, message)
+            stored.append({**message, "id": msg_ref.id})
+
+        last = stored[-1]
+        batch.update(self._db.collection(CONVERSATIONS).document(conversation_id), {
+            "last_message": last["content"][:100], # Preview
+            "last_message_timestamp": last["timestamp"],
+            "updated_at": last["timestamp"],
+            "message_count": firestore.Increment(len(stored)),
+        })
+        await batch.commit()
+        return stored
+
+    async def iter_message_id_pages(self, conversation_id: str, page_size: int) -> AsyncIterator[List[str]]:
+        # Only keys are read, and each page resumes after the last id of the
+        # previous one.
+        last_id = None
+        while True:
+            query = self._messages_query(conversation_id).order_by("__name__").select([]).limit(page_size)
+            if last_id is not None:
+                query = query.start_after({"__name__": last_id})
+            ids = [doc.id async for doc in query.stream()]
+            if not ids:
+                return
+            yield ids
+            if len(ids) < page_size:
+                return
+            last_id = ids[-1]
+
+    async def delete_messages(self, message_ids: List[str]) -> None:
+        batch = self._db.batch()
+        for msg_id in message_ids:
+            batch.delete(self._db.collection(MESSAGES).document(msg_id))
+        await batch.commit()
@@ -0,0 +1,360 @@
+# backend/app/repositories/sqlite_repository.py
+"""
+SQLite storage backend, for local runs, benchmarks and tenants that do not
+need Firestore.
+
+The database runs in WAL mode so readers never wait for the writer. Each
+executor thread keeps its own connection, and every call runs on the
+blocking-I/O executor so the event loop never touches the file.
+
+Timestamps are stored as integer microseconds since the epoch, which sorts
+correctly and round-trips timezone-aware datetimes exactly. Messages are
+numbered by their rowid, which is returned as their `seq` (see
+Repository.stream_messages).
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .base import SIDEBAR_FIELDS, Repository, message_timestamps
+from ..core.executor import run_blocking
+from ..core.tokens import count_tokens
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uid TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT,
+    created_at INTEGER,
+    updated_at INTEGER,
+    last_message TEXT,
+    last_message_timestamp INTEGER,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    summary_message_count INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    deleted_at INTEGER,
+    purged_at INTEGER,
+    is_pinned INTEGER,
+    cleared_at INTEGER,
+    purge_lease_owner TEXT,
+    purge_lease_until INTEGER
+);
+CREATE INDEX IF NOT EXISTS conversations_by_user ON conversations (user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS conversations_deleted ON conversations (deleted) WHERE deleted = 1;
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, timestamp, id);
+"""
+
+_CONVERSATION_COLUMNS = {
+    "user_id", "title", "created_at", "updated_at", "last_message", "last_message_timestamp",
+    "message_count", "summary", "summary_message_count", "deleted", "deleted_at", "purged_at",
+    "is_pinned", "cleared_at", "purge_lease_owner", "purge_lease_until",
+}
+_TIMESTAMP_COLUMNS = {
+    "created_at", "updated_at", "last_message_timestamp", "deleted_at", "purged_at", "cleared_at",
+    "purge_lease_until", "timestamp",
+}
+_BOOLEAN_COLUMNS = {"deleted", "is_pinned"}
+
+# Columns added after a table was first created: (table, column, definition).
+_ADDED_COLUMNS = [
+    ("conversations", "purged_at", "INTEGER"),
+    ("conversations", "is_pinned", "INTEGER"),
+    ("conversations", "cleared_at", "INTEGER"),
+    ("conversations", "purge_lease_owner", "TEXT"),
+    ("conversations", "purge_lease_until", "INTEGER"),
+]
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _to_micros(value: Optional[datetime.datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        # Naive datetimes in this code base are UTC (datetime.utcnow()).
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value: Optional[int]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+def _to_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = set(data) - _CONVERSATION_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown conversation fields: {sorted(unknown)}")
+    return {key: _to_micros(value) if key in _TIMESTAMP_COLUMNS else value for key, value in data.items()}
+
+
+def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    data = {}
+    for key in row.keys():
+        value = row[key]
+        if key in _TIMESTAMP_COLUMNS:
+            value = _from_micros(value)
+        elif key in _BOOLEAN_COLUMNS:
+            value = bool(value)
+        data[key] = value
+    return data
+
+
+class SQLiteRepository(Repository):
+    # One transaction; SQLite has no per-batch limit worth respecting.
+    max_batch_writes = 10000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement writes open their own transaction in _write().
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            for table, column, definition in _ADDED_COLUMNS:
+                existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            self._local.conn = conn
+        return conn
+
+    async def _read(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        return await run_blocking(lambda: func(self._connection()))
+
+    async def _write(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        def _transaction() -> T:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front instead of failing to upgrade later.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        return await run_blocking(_transaction)
+
+    # --- Users ---
+
+    async def create_user(self, uid: str, data: Dict[str, Any]) -> None:
+        await self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO users (uid, data) VALUES (?, ?)", (uid, json.dumps(data, default=str))
+        ))
+
+    # --- Conversations ---
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_conversations([conversation_id]))[conversation_id]
+
+    async def get_conversations(self, conversation_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        placeholders = ",".join("?" * len(conversation_ids))
+        rows = await self._read(lambda conn: conn.execute(
+            f"SELECT * FROM conversations WHERE id IN ({placeholders})", conversation_ids
+        ).fetchall())
+        found = {conv_id: None for conv_id in conversation_ids}
+        for row in rows:
+            found[row["id"]] = _from_row(row)
+        return found
+
+    async def create_conversation(self, data: Dict[str, Any]) -> str:
+        conv_id = uuid.uuid4().hex
+        row = {"id": conv_id, **_to_row(data)}
+        columns = ", ".join(row)
+        await self._write(lambda conn: conn.execute(
+            f"INSERT INTO conversations ({columns}) VALUES ({', '.join('?' * len(row))})", list(row.values())
+        ))
+        return conv_id
+
+    async def list_conversations(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        sql = f"SELECT id, {', '.join(SIDEBAR_FIELDS)} FROM conversations WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if after is not None:
+            updated_at, conv_id = after
+            sql += " AND (updated_at < ? OR (updated_at = ? AND id < ?))"
+            params += [_to_micros(updated_at), _to_micros(updated_at), conv_id]
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        rows = await self._read(lambda conn: conn.execute(sql, params).fetchall())
+        return [_from_row(row) for row in rows]
+
+    async def list_conversation_changes(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime.datetime, Optional[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        sql = f"SELECT id, {', '.join(SIDEBAR_FIELDS)} FROM conversations WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if after is not None:
+            updated_at, conv_id = after
+            if conv_id is None:
+                sql += " AND updated_at > ?"
+                params.append(_to_micros(updated_at))
+            else:
+                sql += " AND (updated_at > ? OR (updated_at = ? AND id > ?))"
+                params += [_to_micros(updated_at), _to_micros(updated_at), conv_id]
+        sql += " ORDER BY updated_at ASC, id ASC LIMIT ?"
+        params.append(limit)
+        rows = await self._read(lambda conn: conn.execute(sql, params).fetchall())
+        return [_from_row(row) for row in rows]
+
+    async def update_conversation(self, conversation_id: str, data: Dict[str, Any]) -> None:
+        row = _to_row(data)
+        assignments = ", ".join(f"{column} = ?" for column in row)
+        await self._write(lambda conn: conn.execute(
+            f"UPDATE conversations SET {assignments} WHERE id = ?", [*row.values(), conversation_id]
+        ))
+
+    async def update_conversation_if(
+        self, conversation_id: str, data: Dict[str, Any], condition: Callable[[Dict[str, Any]], bool]
+    ) -> bool:
+        row = _to_row(data)
+        assignments = ", ".join(f"{column} = ?" for column in row)
+
+        def _update(conn: sqlite3.Connection) -> bool:
+            current = conn.execute("SELECT * FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if current is None or not condition(_from_row(current)):
+                return False
+            conn.execute(f"UPDATE conversations SET {assignments} WHERE id = ?", [*row.values(), conversation_id])
+            return True
+
+        # The write transaction holds the lock from the read to the update.
+        return await self._write(_update)
+
+    async def list_tombstoned_conversation_ids(self) -> List[str]:
+        rows = await self._read(lambda conn: conn.execute(
+            "SELECT id FROM conversations WHERE deleted = 1 AND purged_at IS NULL"
+        ).fetchall())
+        return [row["id"] for row in rows]
+
+    async def delete_purged_conversations(self, purged_before: datetime.datetime) -> int:
+        cursor = await self._write(lambda conn: conn.execute(
+            "DELETE FROM conversations WHERE purged_at < ?", (_to_micros(purged_before),)
+        ))
+        return cursor.rowcount
+
+    # --- Messages ---
+
+    async def stream_messages(
+        self,
+        conversation_id: str,
+        since: Optional[datetime.datetime] = None,
+        before: Optional[Tuple[datetime.datetime, str]] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+        after_seq: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        sql = "SELECT rowid AS seq, * FROM messages WHERE conversation_id = ?"
+        params: List[Any] = [conversation_id]
+        if after_seq is not None:
+            # Rowids only grow while the conversation's own rows exist, unlike the writers' clocks.
+            sql += " AND rowid > ?"
+            params.append(after_seq)
+        elif since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_to_micros(since))
+        if before is not None:
+            timestamp, msg_id = before
+            # "After" in the requested direction.
+            op = "<" if newest_first else ">"
+            sql += f" AND (timestamp {op} ? OR (timestamp = ? AND id {op} ?))"
+            params += [_to_micros(timestamp), _to_micros(timestamp), msg_id]
+        direction = "DESC" if newest_first else "ASC"
+        sql += f" ORDER BY timestamp {direction}, id {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = await self._read(lambda conn: conn.execute(sql, params).fetchall())
+        for row in rows:
+            yield _from_row(row)
+
+    async def add_messages(self, conversation_id: str, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        if not messages:
+            return []
+        stored = [
+            {
+                "id": uuid.uuid4().hex,
+                "conversation_id": conversation_id,
+                "role": role,
+                "content": content,
+                "token_count": count_tokens(content),
+                "timestamp": timestamp,
+            }
+            for (role, content), timestamp in zip(messages, message_timestamps(len(messages)))
+        ]
+        last = stored[-1]
+
+        def _insert(conn: sqlite3.Connection) -> None:
+            updated = conn.execute(
+                "UPDATE conversations SET last_message = ?, last_message_timestamp = ?, updated_at = ?, "
+                "message_count = message_count + ? WHERE id = ?",
+                (last["content"][:100], _to_micros(last["timestamp"]), _to_micros(last["timestamp"]), len(stored), conversation_id),
+            )
+            # Like Firestore's batch update, fail (and roll back) for a missing conversation.
+            if updated.rowcount == 0:
+                raise ValueError(f"Conversation with ID {conversation_id} not found.")
+            for msg in stored:
+                msg["seq"] = conn.execute(
+                    "INSERT INTO messages (id, conversation_id, role, content, token_count, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                    (msg["id"], conversation_id, msg["role"], msg["content"], msg["token_count"], _to_micros(msg["timestamp"])),
+                ).lastrowid
+
+        await self._write(_insert)
+        return stored
+
+    async def iter_message_id_pages(self, conversation_id: str, page_size: int) -> AsyncIterator[List[str]]:
+        last_id = ""
+        while True:
+            rows = await self._read(lambda conn: conn.execute(
+                "SELECT id FROM messages WHERE conversation_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (conversation_id, last_id, page_size),
+            ).fetchall())
+            ids = [row["id"] for row in rows]
+            if not ids:
+                return
+            yield ids
+            if len(ids) < page_size:
+                return
+            last_id = ids[-1]
+
+    async def delete_messages(self, message_ids: List[str]) -> None:
+        await self._write(lambda conn: conn.executemany(
+            "DELETE FROM messages WHERE id = ?", [(msg_id,) for msg_id in message_ids]
+        ))
@@ -3,16 +3,58 @@
 from firebase_admin import auth
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from .firebase_service import db
+from typing import Dict, Optional
+from ..config.settings import settings
+from ..config.firebase_config import initialize_firebase
+from ..core.cache import TTLCache
+from ..core.executor import run_blocking
+from ..core.tracing import span
+from ..repositories import get_repository
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 # Use HTTPBearer, which simply looks for a "Bearer <token>" in the Authorization header.
 # This is the correct scheme for our use case.
 bearer_scheme = HTTPBearer()
 
-def create_firebase_user(email, password, display_name):
-    """Creates a user in Firebase Auth and a corresponding document in Firestore."""
+# --- Token verification cache ---
+# Verified claims keyed by the SHA-256 of the raw token, so tokens are never
+# kept in memory in plain form. Entries never outlive the token's own `exp`.
+_token_cache: TTLCache[dict] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+# uid -> `tokens_valid_after_timestamp` (ms). Tokens issued before this
+# instant have been revoked. Refreshed in the background, see below. An entry
+# only has to outlive the tokens it invalidates, and ID tokens are valid for
+# at most an hour.
+_ID_TOKEN_LIFETIME_SECONDS = 3600
+_valid_after_ms: TTLCache[float] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=_ID_TOKEN_LIFETIME_SECONDS,
+)
+
+_revocation_task: Optional[asyncio.Task] = None
+
+# firebase_admin.auth.get_users accepts at most 100 identifiers per call.
+_GET_USERS_BATCH = 100
+
+def call_firebase_auth(fn, *args, **kwargs):
+    """Blocking: calls a firebase_admin.auth function, initializing the SDK on first use."""
+    initialize_firebase()
+    return fn(*args, **kwargs)
+
+async def create_firebase_user(email, password, display_name):
+    """Creates a user in Firebase Auth and a corresponding profile in the repository."""
     try:
-        user = auth.create_user(
+        user = await run_blocking(
+            call_firebase_auth,
+            auth.create_user,
             email=email,
             password=password,
             display_name=display_name
@@ -25,7 +67,7 @@ def create_firebase_user(email, password, display_name):
             "last_login": user.user_metadata.last_sign_in_timestamp,
             "is_active": True
         }
-        db.collection("users").document(user.uid).set(user_data)
+        await get_repository().create_user(user.uid, user_data)
         
         return user
     except auth.EmailAlreadyExistsError:
@@ -39,40 +81,122 @@ def create_firebase_user(email, password, display_name):
             detail=f"Failed to create user: {str(e)}"
         )
 
-def get_current_user(creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+def warm_up_token_certs() -> None:
+    """
+    Blocking: fetches Google's ID token signing certs into the SDK's HTTP
+    cache, so the first token verification does not wait for them.
+    """
+    from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+
+    # Private API: the verifier's cache-control aware request is the only way
+    # to fill the cache the SDK itself reads from.
+    auth._get_client(initialize_firebase())._token_verifier.request(ID_TOKEN_CERT_URI, method="GET")
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _is_revoked(claims: dict) -> bool:
+    valid_after_ms = _valid_after_ms.get(claims["uid"])
+    return valid_after_ms is not None and claims.get("iat", 0) * 1000 < valid_after_ms
+
+
+def mark_tokens_revoked(uid: str) -> None:
+    """Records a revocation made by this worker (e.g. logout) without waiting for the next refresh."""
+    _valid_after_ms.set(uid, time.time() * 1000)
+
+
+def _fetch_valid_after(uids: list) -> Dict[str, float]:
+    """Blocking: looks up the current revocation watermark for a batch of users."""
+    result = call_firebase_auth(auth.get_users, [auth.UidIdentifier(uid) for uid in uids])
+    valid_after = {}
+    for user in result.users:
+        # A disabled account invalidates every token it ever had.
+        valid_after[user.uid] = float("inf") if user.disabled else (user.tokens_valid_after_timestamp or 0)
+    for missing in result.not_found:
+        valid_after[missing.uid] = float("inf")
+    return valid_after
+
+
+async def _refresh_revocations() -> None:
+    """Periodically re-checks revocation state for every user with a cached token."""
+    while True:
+        await asyncio.sleep(settings.AUTH_REVOCATION_CHECK_INTERVAL_SECONDS)
+        uids = sorted({claims["uid"] for claims in _token_cache.values()})
+        for start in range(0, len(uids), _GET_USERS_BATCH):
+            try:
+                batch = await run_blocking(_fetch_valid_after, uids[start:start + _GET_USERS_BATCH])
+            except Exception:
+                logger.exception("Token revocation refresh failed")
+                continue
+            for uid, valid_after_ms in batch.items():
+                _valid_after_ms.set(uid, valid_after_ms)
+
+
+def _ensure_revocation_refresher() -> None:
+    global _revocation_task
+    if _revocation_task is None or _revocation_task.done():
+        _revocation_task = asyncio.get_running_loop().create_task(_refresh_revocations())
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def verify_token(token: str) -> dict:
+    """
+    Verifies a Firebase ID token and returns its decoded claims.
+
+    The signature is checked locally; the SDK fetches Google's signing certs
+    through a Cache-Control aware session, so they are only downloaded again
+    when Google rotates them. Verified claims are then cached until the token
+    expires (or AUTH_CACHE_TTL_SECONDS, whichever comes first). Revocation is
+    not checked inline: a background task refreshes it every
+    AUTH_REVOCATION_CHECK_INTERVAL_SECONDS, which bounds how long a revoked
+    token can still be accepted.
+    """
+    if not token:
+        raise _unauthorized("Invalid authentication credentials")
+
+    key = _token_key(token)
+    claims = _token_cache.get(key)
+    if claims is None:
+        try:
+            claims = await run_blocking(call_firebase_auth, auth.verify_id_token, token)
+        except auth.InvalidIdTokenError:
+            raise _unauthorized("Invalid authentication token")
+        except Exception:
+            raise _unauthorized("Could not validate credentials")
+        ttl = min(settings.AUTH_CACHE_TTL_SECONDS, claims["exp"] - time.time())
+        if ttl > 0:
+            _token_cache.set(key, claims, ttl=ttl)
+
+    if _is_revoked(claims):
+        _token_cache.pop(key)
+        raise _unauthorized("Token has been revoked. Please log in again.")
+
+    _ensure_revocation_refresher()
+    return claims
+
+
+async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
     """
     Dependency to get the current user from a Firebase ID token.
     Verifies the token and returns the decoded user claims.
     """
     # The token is extracted from the 'credentials' part of the bearer scheme
-    token = creds.credentials
-    
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        
-    try:
-        # Verify the token with Firebase Admin SDK
-        decoded_token = auth.verify_id_token(token, check_revoked=True)
-        return decoded_token
-    except auth.InvalidIdTokenError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except auth.RevokedIdTokenError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has been revoked. Please log in again.",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+    with span("auth.verify_token"):
+        return await verify_token(creds.credentials)
+
+
+_admin_uids = {uid.strip() for uid in settings.ADMIN_UIDS.split(",") if uid.strip()}
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency for the admin API: an `admin` custom claim or a uid listed in ADMIN_UIDS."""
+    if current_user.get("admin") is not True and current_user.get("uid") not in _admin_uids:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required.")
+    return current_user
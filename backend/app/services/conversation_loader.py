@@ -0,0 +1,84 @@
+# backend/app/services/conversation_loader.py
+"""
+Request-scoped loader (identity map) for conversation documents.
+
+Within one request every conversation document is fetched at most once.
+Lookups issued in the same event-loop tick are coalesced into a single
+`get_all` round trip, and the history factory picks up the snapshot the
+route already verified instead of reading it again.
+"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..repositories import get_repository, is_owned_by
+from ..core.context import get_loader_context, set_loader_context
+from ..core.metrics import count_datastore_reads
+
+
+class ConversationLoader:
+    def __init__(self):
+        self._docs: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Queued for the next dispatch.
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Dispatched, waiting for the datastore.
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def peek(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Returns an already loaded conversation without doing any I/O."""
+        return self._docs.get(conversation_id)
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the conversation document (or None if it does not exist)."""
+        if conversation_id in self._docs:
+            return self._docs[conversation_id]
+        future = self._pending.get(conversation_id) or self._in_flight.get(conversation_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # First lookup of this tick: dispatch once everyone had a chance to queue theirs.
+                loop.call_soon(lambda: loop.create_task(self._dispatch()))
+            future = self._pending[conversation_id] = loop.create_future()
+        # Shared by every caller: one of them being cancelled must not cancel it for the rest.
+        return await asyncio.shield(future)
+
+    async def load_owned(self, conversation_id: str, user_id: str) -> Dict[str, Any]:
+        """Returns the conversation if the user may access it, otherwise raises 404."""
+        conv = await self.load(conversation_id)
+        if not is_owned_by(conv, user_id):
+            raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+        return conv
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._in_flight.update(pending)
+        try:
+            docs = await get_repository().get_conversations(list(pending))
+            count_datastore_reads(len(pending))
+        except Exception as e:
+            for conv_id, future in pending.items():
+                del self._in_flight[conv_id]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for conv_id, future in pending.items():
+            self._docs[conv_id] = docs[conv_id]
+            del self._in_flight[conv_id]
+            if not future.done():
+                future.set_result(docs[conv_id])
+
+
+async def get_conversation_loader() -> ConversationLoader:
+    """
+    Dependency that gives each request its own loader. FastAPI caches
+    dependencies per request, so every user of it shares the same instance.
+    """
+    loader = ConversationLoader()
+    # Async so the context var is set in the request's own context, not a worker thread's copy.
+    set_loader_context(loader)
+    return loader
+
+
+def current_conversation_loader() -> Optional[ConversationLoader]:
+    return get_loader_context()
@@ -0,0 +1,180 @@
+# backend/app/services/deletion_service.py
+"""
+Bulk deletion of conversation messages.
+
+Firestore has no cascading deletes and a single batch holds at most 500
+operations, so messages are read a page of ids at a time and deleted in
+batches of DELETE_BATCH_SIZE (capped by the backend's `max_batch_writes`), with up to DELETE_CONCURRENCY batches in flight.
+
+Deleting a conversation only tombstones it inside the request; the purge
+runs as a background job on the worker and its progress can be polled.
+Purged tombstones are kept for CONVERSATION_TOMBSTONE_RETENTION_DAYS so
+that clients syncing conversation changes learn about the deletion.
+
+Every worker resumes unfinished purges at startup, so a purge is first
+claimed with a lease stored on the conversation (taken in a transaction,
+see Repository.update_conversation_if) and renewed while it runs; another
+worker only takes it over once the lease has expired.
+"""
+import asyncio
+import datetime
+import logging
+import uuid
+from typing import Optional, Set
+
+from ..repositories import Repository, get_repository
+from ..config.settings import settings
+from ..core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class DeleteJob:
+    """Progress of one conversation purge on this worker."""
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.status = "running" # running | done | failed
+        self.deleted_messages = 0
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_at: Optional[datetime.datetime] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "conversation_id": self.conversation_id,
+            "status": self.status,
+            "deleted_messages": self.deleted_messages,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# Recent jobs, for progress polling. Far more than can run at once.
+_jobs: TTLCache[DeleteJob] = TTLCache(maxsize=1000)
+_tasks: Set[asyncio.Task] = set()
+
+# Names this worker as the holder of purge leases.
+_WORKER_ID = uuid.uuid4().hex
+
+
+async def bulk_delete_messages(
+    conversation_id: str, job: Optional[DeleteJob] = None, repo: Optional[Repository] = None
+) -> int:
+    """
+    Deletes every message of a conversation and returns how many were deleted.
+    `repo` defaults to `get_repository()`; sync callers pass theirs.
+    """
+    repo = repo or get_repository()
+    batch_size = min(settings.DELETE_BATCH_SIZE, repo.max_batch_writes)
+    slots = asyncio.Semaphore(settings.DELETE_CONCURRENCY)
+    in_flight: Set[asyncio.Task] = set()
+    deleted = 0
+
+    async def _delete(ids) -> None:
+        nonlocal deleted
+        try:
+            await repo.delete_messages(ids)
+            deleted += len(ids)
+            if job is not None:
+                job.deleted_messages = deleted
+        finally:
+            slots.release()
+
+    try:
+        async for ids in repo.iter_message_id_pages(conversation_id, batch_size):
+            # Wait for a free slot before reading further, so memory stays bounded.
+            await slots.acquire()
+            # Stop at the first failed batch instead of reading on.
+            for task in [task for task in in_flight if task.done()]:
+                in_flight.discard(task)
+                task.result()
+            in_flight.add(asyncio.create_task(_delete(ids)))
+        await asyncio.gather(*in_flight)
+    except BaseException:
+        for task in in_flight:
+            task.cancel()
+        raise
+    return deleted
+
+
+async def claim_purge(conversation_id: str, repo: Optional[Repository] = None) -> bool:
+    """
+    Takes (or renews) the purge lease of a tombstoned conversation. Fails if
+    the conversation is not waiting for a purge, or if another worker holds
+    a lease that has not expired.
+    """
+    repo = repo or get_repository()
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    def claimable(conv: dict) -> bool:
+        if not conv.get("deleted") or conv.get("purged_at") is not None:
+            return False
+        lease_until = conv.get("purge_lease_until")
+        return conv.get("purge_lease_owner") == _WORKER_ID or lease_until is None or lease_until <= now
+
+    return await repo.update_conversation_if(conversation_id, {
+        "purge_lease_owner": _WORKER_ID,
+        "purge_lease_until": now + datetime.timedelta(seconds=settings.PURGE_LEASE_SECONDS),
+    }, claimable)
+
+
+async def _renew_lease(conversation_id: str) -> None:
+    while True:
+        await asyncio.sleep(settings.PURGE_LEASE_SECONDS / 3)
+        if not await claim_purge(conversation_id):
+            # Deleting twice is harmless, so the purge simply goes on.
+            logger.warning("Lost the purge lease of conversation %s", conversation_id)
+            return
+
+
+async def _purge_conversation(job: DeleteJob) -> None:
+    renewal = asyncio.create_task(_renew_lease(job.conversation_id))
+    try:
+        await bulk_delete_messages(job.conversation_id, job)
+        await get_repository().mark_conversation_purged(job.conversation_id)
+        job.status = "done"
+    except Exception as e:
+        logger.exception("Failed to purge conversation %s", job.conversation_id)
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        renewal.cancel()
+        job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+async def start_purge(conversation_id: str) -> Optional[DeleteJob]:
+    """
+    Starts (or returns the already running) background purge of a
+    tombstoned conversation. Returns None if another worker is purging it.
+    """
+    job = _jobs.get(conversation_id)
+    if job is not None and job.status == "running":
+        return job
+    if not await claim_purge(conversation_id):
+        return None
+    job = DeleteJob(conversation_id)
+    _jobs.set(conversation_id, job)
+    task = asyncio.get_running_loop().create_task(_purge_conversation(job))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+def get_job(conversation_id: str) -> Optional[DeleteJob]:
+    return _jobs.get(conversation_id)
+
+
+async def resume_pending_purges() -> None:
+    """
+    Restarts purges of conversations that were tombstoned but never finished
+    (unless another worker holds their lease), and drops tombstones that are
+    past their retention.
+    """
+    repo = get_repository()
+    for conversation_id in await repo.list_tombstoned_conversation_ids():
+        await start_purge(conversation_id)
+    retention = datetime.timedelta(days=settings.CONVERSATION_TOMBSTONE_RETENTION_DAYS)
+    expired = await repo.delete_purged_conversations(datetime.datetime.now(datetime.timezone.utc) - retention)
+    if expired:
+        logger.info("Dropped %d expired conversation tombstones", expired)
@@ -0,0 +1,65 @@
+# backend/app/services/fake_llm.py
+"""
+Deterministic stand-in for the chat model (LLM_PROVIDER=fake), for
+benchmarks and local runs without a Gemini key.
+
+It waits FAKE_LLM_TTFT_SECONDS before the first token and then streams
+FAKE_LLM_ANSWER_TOKENS tokens at FAKE_LLM_TOKENS_PER_SECOND. The answer only
+depends on the last message, so repeated runs produce identical output.
+
+For exercising the model pool (see model_pool.py), `ttft_jitter` adds a
+random extra delay of up to that many seconds before the first token, and
+`failure_rate` makes that share of calls fail before producing anything.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    time_to_first_token: float = 0.2
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 64
+    ttft_jitter: float = 0.0
+    failure_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        seed = hashlib.sha256(str(messages[-1].content).encode("utf-8")).hexdigest()[:8]
+        return [f"{seed}-{index} " for index in range(self.answer_tokens)]
+
+    def _first_token_delay(self) -> float:
+        """Delay before the first token; raises for an injected failure."""
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Injected fake model failure")
+        return self.time_to_first_token + random.uniform(0, self.ttft_jitter)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._first_token_delay() + max(0, self.answer_tokens - 1) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens(messages))))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._first_token_delay())
+        for index, token in enumerate(self._tokens(messages)):
+            if index:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._first_token_delay())
+        for index, token in enumerate(self._tokens(messages)):
+            if index:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -1,4 +1,34 @@
-from firebase_admin import firestore
+# backend/app/services/firebase_service.py
+"""
+The Firestore client, created on first use instead of at import, so a worker
+does not pay for credential loading until something actually needs them
+(the startup warm-up usually gets there first, see core/container.py).
+"""
+import functools
 
-# This provides a singleton Firestore client instance
-db = firestore.client()
\ No newline at end of file
+from firebase_admin import firestore_async
+from google.cloud import firestore
+
+from ..config.firebase_config import initialize_firebase
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_db():
+    """
+    The async Firestore client. Everything that runs inside an `async def`
+    route goes through it (see repositories/firestore_repository.py) so
+    Firestore I/O never blocks the event loop. Blocking: the first call
+    loads credentials.
+    """
+    return firestore_async.client(initialize_firebase())
+
+
+def create_async_db():
+    """
+    A new async Firestore client of its own. grpc.aio binds a client to the
+    event loop it is first used on, so code driven from another loop (see
+    repositories.get_sync_repository) cannot share `get_async_db()`.
+    Blocking: loads credentials.
+    """
+    app = initialize_firebase()
+    return firestore.AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
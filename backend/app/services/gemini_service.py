@@ -1,8 +1,11 @@
-import google.generativeai as genai
+import functools
+
 from ..config.settings import settings
 
 class GeminiService:
     def __init__(self, api_key: str):
+        # Imported here so that importing this module costs nothing.
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-1.5-pro-latest')
 
@@ -35,4 +38,7 @@ class GeminiService:
             return "I'm sorry, I encountered an error and can't respond right now."
 
 
-gemini_service = GeminiService(api_key=settings.GEMINI_API_KEY)
\ No newline at end of file
+@functools.lru_cache(maxsize=None)
+def get_gemini_service() -> GeminiService:
+    """The shared GeminiService, created on first use."""
+    return GeminiService(api_key=settings.GOOGLE_API_KEY)
\ No newline at end of file
@@ -0,0 +1,170 @@
+# backend/app/services/history_policy.py
+"""
+Decides which part of a conversation's history goes into the prompt.
+
+- The last HISTORY_RECENT_TURNS turns are sent verbatim.
+- Everything older is represented by a rolling summary that is stored on the
+  conversation document and extended in the background, a few messages at a
+  time, once enough of them have fallen out of the recent window. Older
+  messages the summary does not cover yet are still sent verbatim.
+- With MEMORY_MODE=retrieval, the summary is replaced by the past messages
+  most similar to the question (see retrieval_memory.py), which fill
+  whatever budget the RETRIEVAL_RECENT_TURNS recent turns leave over.
+- History never pushes the prompt past HISTORY_TOKEN_BUDGET tokens; the
+  oldest verbatim messages are dropped first.
+
+Token counts are computed once when a message is written (see
+Repository.add_messages), so trimming never re-tokenizes.
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from langchain_core.prompts import ChatPromptTemplate
+
+from fastapi import HTTPException
+
+from .llm_scheduler import Admission, scheduler
+from ..config.settings import settings
+from ..core.context import set_admission_context
+from ..core.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier part of this conversation:\n"
+RECALL_PREFIX = "Possibly relevant messages from earlier conversations with this user:\n"
+
+_summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You maintain a running summary of a conversation between a user and an assistant. "
+                   "Keep every fact, name, preference and open question that later answers may depend on. "
+                   "Be concise and write at most {max_words} words."),
+        ("human", "Current summary:\n{summary}\n\nMessages to fold into it:\n{transcript}\n\nWrite the updated summary."),
+    ]
+)
+
+# Conversations whose summary is being rebuilt right now, and the tasks doing
+# it (kept referenced so they are not garbage collected mid-flight).
+_refreshing: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def select_history(
+    messages: Sequence[BaseMessage],
+    token_counts: Sequence[int],
+    summary: Optional[str],
+    reserved_tokens: int,
+    recent_turns: Optional[int] = None,
+    recalled: Sequence[Dict[str, Any]] = (),
+    first_verbatim: Optional[int] = None,
+) -> List[BaseMessage]:
+    """
+    Returns the history to put into the prompt.
+
+    `reserved_tokens` is what the rest of the prompt (system prompt and the
+    new question) already uses out of the budget. `recalled` are retrieved
+    past messages, best first.
+
+    `first_verbatim` is the oldest message that may be sent verbatim: the
+    first one the summary does not cover (0 without a summary). It defaults
+    to the start of the recent window, for callers whose older messages are
+    represented otherwise (retrieval).
+    """
+    budget = settings.HISTORY_TOKEN_BUDGET - reserved_tokens
+    recent_turns = settings.HISTORY_RECENT_TURNS if recent_turns is None else recent_turns
+    if first_verbatim is None:
+        first_verbatim = max(0, len(messages) - 2 * recent_turns)
+    first_verbatim = min(first_verbatim, len(messages))
+
+    head: List[BaseMessage] = []
+    if summary and first_verbatim > 0:
+        summary_message = SystemMessage(content=SUMMARY_PREFIX + summary)
+        summary_tokens = count_tokens(summary_message.content)
+        if summary_tokens <= budget:
+            head.append(summary_message)
+            budget -= summary_tokens
+
+    # Walk backwards so that the newest messages win when the budget runs out.
+    selected: List[BaseMessage] = []
+    for index in range(len(messages) - 1, first_verbatim - 1, -1):
+        if token_counts[index] > budget:
+            break
+        budget -= token_counts[index]
+        selected.append(messages[index])
+    selected.reverse()
+
+    # Recalled messages only get what the recent window left over.
+    lines: List[str] = []
+    budget -= count_tokens(RECALL_PREFIX)
+    for hit in recalled:
+        line = f"{hit['role']}: {hit['content']}\n"
+        line_tokens = count_tokens(line)
+        if line_tokens > budget:
+            break
+        budget -= line_tokens
+        lines.append(line)
+    if lines:
+        head.append(SystemMessage(content=RECALL_PREFIX + "".join(lines)))
+    return head + selected
+
+
+def fold_target(message_count: int, summary_message_count: int) -> Optional[int]:
+    """
+    Returns how many leading messages the summary should cover after the next
+    refresh, or None if too few messages are waiting to be folded in.
+    """
+    target = message_count - 2 * settings.HISTORY_RECENT_TURNS
+    if target - summary_message_count < settings.HISTORY_SUMMARY_MIN_MESSAGES:
+        return None
+    return target
+
+
+async def summarize(summarizer: BaseChatModel, previous: Optional[str], messages: Sequence[BaseMessage]) -> str:
+    """Folds `messages` into the `previous` summary."""
+    chain = _summary_prompt | summarizer
+    result = await chain.ainvoke({
+        "summary": previous or "(empty)",
+        "transcript": get_buffer_string(messages),
+        "max_words": settings.HISTORY_SUMMARY_MAX_WORDS,
+    })
+    return result.content
+
+
+def schedule_summary_refresh(history, summarizer: BaseChatModel) -> None:
+    """
+    Extends the stored summary of `history` in the background if enough
+    messages have left the recent window. The current turn keeps using the
+    previous summary; the next one picks up the new one. The summary call
+    queues with the scheduler as one of the user's turns, and is skipped
+    (to be retried by a later turn) when the queue is full.
+    """
+    target = fold_target(len(history.prompt_state.messages), history.prompt_state.summary_message_count)
+    if target is None or history.conversation_id in _refreshing:
+        return
+
+    async def _refresh() -> None:
+        admission = Admission(scheduler, history.user_id)
+        set_admission_context(admission)
+        try:
+            state = history.prompt_state
+            start = state.summary_message_count
+            summary = await summarize(summarizer, state.summary, state.messages[start:target])
+            # Skipped if the conversation changed meanwhile (see asave_summary).
+            await history.asave_summary(summary, target)
+        except HTTPException:
+            logger.info("Queue full, postponing the summary of conversation %s", history.conversation_id)
+        except Exception:
+            logger.exception("Failed to refresh summary for conversation %s", history.conversation_id)
+        finally:
+            admission.close()
+            _refreshing.discard(history.conversation_id)
+
+    _refreshing.add(history.conversation_id)
+    # Run detached from the chat turn's context so the summary call is not
+    # traced or streamed as part of the user's response.
+    task = asyncio.get_running_loop().create_task(_refresh(), context=contextvars.Context())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
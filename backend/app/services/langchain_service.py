@@ -1,27 +1,145 @@
 # backend/app/services/langchain_service.py
 # CORRECTED AND SIMPLIFIED VERSION
 
-from langchain_google_genai import ChatGoogleGenerativeAI
+import contextlib
+import threading
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from .memory_service import FirestoreChatMessageHistory
+from .conversation_loader import current_conversation_loader
+from .fake_llm import FakeStreamingChatModel
+from .model_pool import create_model_pool
+from . import history_policy, response_cache, retrieval_memory
+from .llm_scheduler import scheduler
 from ..config.settings import settings
-from ..core.context import get_user_context
+from ..core.context import get_admission_context, get_user_context
+from ..core.tokens import count_tokens
+from ..core.tracing import span
+
+# 1. Initialize the LLM
+def create_llm():
+    if settings.LLM_PROVIDER == "fake":
+        return FakeStreamingChatModel(
+            time_to_first_token=settings.FAKE_LLM_TTFT_SECONDS,
+            tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            answer_tokens=settings.FAKE_LLM_ANSWER_TOKENS,
+        )
+    if settings.MODEL_POOL_BACKENDS:
+        # Several backends with health scoring, hedging and failover (see model_pool.py).
+        return create_model_pool(settings.MODEL_POOL_BACKENDS)
+    # Imported here: the Gemini SDK is slow to import, and the fake model does not need it.
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=settings.LLM_MODEL, google_api_key=settings.GOOGLE_API_KEY, temperature=0.7, stream=True)
+
+_llm: Optional[BaseChatModel] = None
+_llm_lock = threading.Lock()
+
+def get_llm() -> BaseChatModel:
+    """
+    The chat model, built on first use. Blocking the first time; the startup
+    warm-up (see core/container.py) calls it in a worker thread.
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = create_llm()
+    return _llm
+
+class LazyChatModel(BaseChatModel):
+    """Stands in for `get_llm()` in the chains below, so importing this module builds no model."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "lazy"
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with model_slot():
+            with span("llm.stream", activate=False, messages=len(messages)) as current:
+                async for chunk in get_llm().astream(messages, stop=stop, **kwargs):
+                    if current is not None and "first_token_ms" not in current.attributes:
+                        current.set(first_token_ms=round((time.perf_counter() - current.start) * 1000, 3))
+                    # Of the model's metadata only which pool backend answered is passed on (see response_cache.py).
+                    answered_by = chunk.response_metadata.get("answered_by")
+                    generation = ChatGenerationChunk(message=AIMessageChunk(
+                        content=chunk.content, response_metadata={"answered_by": answered_by} if answered_by else {}
+                    ))
+                    if run_manager is not None:
+                        await run_manager.on_llm_new_token(generation.text, chunk=generation)
+                    yield generation
 
-# 1. Initialize the LLM (No changes needed here)
-llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=settings.GOOGLE_API_KEY, temperature=0.7, stream=True)
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        async with model_slot():
+            with span("llm.generate", messages=len(messages)):
+                message = await get_llm().ainvoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=message.content))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = get_llm().invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=message.content))])
+
+llm = LazyChatModel()
 
 # 2. Create the Prompt Template (No changes needed here)
+SYSTEM_PROMPT = "You are a helpful and friendly assistant. Answer the user's questions clearly and concisely."
+
 prompt = ChatPromptTemplate.from_messages(
     [
-        ("system", "You are a helpful and friendly assistant. Answer the user's questions clearly and concisely."),
+        ("system", SYSTEM_PROMPT),
         MessagesPlaceholder(variable_name="history"),
         ("human", "{question}"),
     ]
 )
 
-# 3. Create the primary Conversation Chain (No changes needed here)
-conversation_chain = prompt | llm
+# 3. Apply the history policy: recent turns verbatim, a rolling summary (or
+#    retrieved past messages) for the rest, and a hard token budget
+#    (see history_policy.py).
+async def apply_history_policy(inputs: dict, config: RunnableConfig) -> dict:
+    history = config["configurable"].get("message_history")
+    state = getattr(history, "prompt_state", None)
+    reserved = count_tokens(SYSTEM_PROMPT) + count_tokens(inputs["question"])
+    if state is None:
+        # Not one of our history stores; count on the fly and skip the summary.
+        messages = inputs["history"]
+        token_counts = [count_tokens(message.content) for message in messages]
+        selected = history_policy.select_history(messages, token_counts, None, reserved, first_verbatim=0)
+    elif retrieval_memory.enabled():
+        recent_turns = settings.RETRIEVAL_RECENT_TURNS
+        # What is already in the recent window need not be recalled again.
+        window_ids = set(state.message_ids[max(0, len(state.message_ids) - 2 * recent_turns):])
+        recalled = await retrieval_memory.recall(history.user_id, inputs["question"], window_ids)
+        selected = history_policy.select_history(
+            state.messages, state.token_counts, None, reserved, recent_turns=recent_turns, recalled=recalled
+        )
+    else:
+        history_policy.schedule_summary_refresh(history, llm)
+        # Until the summary covers them, older messages go in verbatim.
+        first_verbatim = state.summary_message_count if state.summary else 0
+        selected = history_policy.select_history(
+            state.messages, state.token_counts, state.summary, reserved, first_verbatim=first_verbatim
+        )
+
+    return {**inputs, "history": selected}
+
+def primary_model() -> str:
+    """The model whose answers the response cache stores: a pool's first backend spec, else LLM_MODEL."""
+    specs = [spec.strip() for spec in settings.MODEL_POOL_BACKENDS.split(",") if spec.strip()]
+    if settings.LLM_PROVIDER != "fake" and specs:
+        return specs[0]
+    return settings.LLM_MODEL
+
+# 4. Create the primary Conversation Chain. Identical prompts (after the
+#    history policy) are answered from the response cache.
+conversation_chain = RunnableLambda(apply_history_policy) | response_cache.cached(
+    prompt | llm, model=primary_model(), system_prompt=SYSTEM_PROMPT
+)
 
 # --- THIS IS THE KEY FIX ---
 # We are changing how we pass the history factory to the runnable.
@@ -36,10 +154,13 @@ def get_session_history(session_id: str) -> FirestoreChatMessageHistory:
         raise ValueError("User context is not set or is invalid.")
     
     user_id = user_info["uid"]
-    return FirestoreChatMessageHistory(conversation_id=session_id, user_id=user_id)
+    # Reuse the conversation document the route already loaded and verified.
+    loader = current_conversation_loader()
+    conversation = loader.peek(session_id) if loader is not None else None
+    return FirestoreChatMessageHistory(conversation_id=session_id, user_id=user_id, conversation=conversation)
 
 
-# 4. Wrap the chain with message history management.
+# 5. Wrap the chain with message history management.
 #    The fix is to use a lambda function here. This lambda will receive the
 #    session_id from the wrapper and the full 'config' dictionary.
 #    We can then extract the user_id from the config and call our factory.
@@ -49,4 +170,24 @@ chain_with_history = RunnableWithMessageHistory(
     get_session_history, # Pass the new, simpler function
     input_messages_key="question",
     history_messages_key="history",
-)
\ No newline at end of file
+)
+
+# 6. Admission control: a chat turn takes its ticket from `scheduler` only
+#    when it reaches the model, so bursts queue fairly while turns answered
+#    from the response cache never wait for a slot (see llm_scheduler.py).
+@contextlib.asynccontextmanager
+async def model_slot() -> AsyncIterator[None]:
+    """Holds the current chat turn's scheduler slot around a model call."""
+    admission = get_admission_context()
+    if admission is None:
+        # Not a chat turn (e.g. a script): nothing to schedule.
+        yield
+        return
+    ticket = admission.submit()
+    try:
+        # Entered from inside the model's async generator, hence not activated.
+        with span("chat.queue", activate=False):
+            await ticket.acquire()
+        yield
+    finally:
+        ticket.release()
@@ -0,0 +1,290 @@
+# backend/app/services/llm_scheduler.py
+"""
+Admission control and fair scheduling of chat turns.
+
+- At most LLM_MAX_CONCURRENT turns run at once on a worker, and at most
+  LLM_MAX_CONCURRENT_PER_USER of them for the same user.
+- Turns beyond that wait in a per-user FIFO. Freed slots go round-robin
+  across the users that are waiting, so one user's burst only delays that
+  user's own turns.
+- The waiting room is bounded: beyond LLM_QUEUE_MAX_WAITING turns in total
+  (or LLM_QUEUE_MAX_WAITING_PER_USER for one user) a turn is rejected with
+  429 and a Retry-After estimate, instead of piling up.
+- A chat turn only takes its ticket when it actually calls the model (see
+  `Admission`), so turns answered from the response cache never queue.
+- Queue waits are recorded (count, total, max and a recent window for
+  percentiles) and exposed through `stats()`.
+
+Everything runs on the event loop, so no locks are needed.
+"""
+import asyncio
+import collections
+import math
+import time
+from typing import Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from ..config.settings import settings
+
+# Number of recent queue waits kept for the percentiles in `stats()`.
+_RECENT_WAITS = 1000
+
+
+class QueueTimeout(Exception):
+    """A turn waited longer than LLM_QUEUE_TIMEOUT_SECONDS for a slot."""
+
+
+class Ticket:
+    """One turn's place in the scheduler, from `submit` until `release`."""
+
+    def __init__(self, scheduler: "LLMScheduler", user_id: str):
+        self._scheduler = scheduler
+        self.user_id = user_id
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._granted = asyncio.Event()
+        self._released = False
+
+    @property
+    def granted(self) -> bool:
+        return self._granted.is_set()
+
+    @property
+    def waiting(self) -> bool:
+        return not self._granted.is_set() and not self._released
+
+    def position(self) -> int:
+        """Estimated number of turns that will start before this one (0 once granted)."""
+        return self._scheduler._position(self)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the turn may start; returns False if `timeout` passed first."""
+        try:
+            await asyncio.wait_for(self._granted.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def acquire(self) -> None:
+        """Waits for the slot; gives up with QueueTimeout after LLM_QUEUE_TIMEOUT_SECONDS."""
+        if not await self.wait(settings.LLM_QUEUE_TIMEOUT_SECONDS):
+            self.expire()
+            raise QueueTimeout("The assistant is busy, please retry shortly.")
+
+    def expire(self) -> None:
+        """Gives up waiting; counted separately from rejections."""
+        if self.waiting:
+            self._scheduler.timed_out += 1
+        self.release()
+
+    def release(self) -> None:
+        """Frees the slot, or leaves the queue if it was still waiting. Idempotent."""
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self)
+
+
+class Admission:
+    """
+    A chat turn on its way to the scheduler. The turn's ticket is taken at
+    the model call (see langchain_service.model_slot), not when the turn
+    starts, so a turn answered without the model never holds a slot. Until
+    then the route waits in `decided()`, which answers the question it has
+    to settle before streaming: did the turn queue (and get which ticket),
+    or was it rejected with 429?
+    """
+
+    def __init__(self, scheduler: "LLMScheduler", user_id: str):
+        self._scheduler = scheduler
+        self.user_id = user_id
+        self.started_at = time.monotonic()
+        self.ticket: Optional[Ticket] = None
+        self._decided = asyncio.get_running_loop().create_future()
+
+    def submit(self) -> Ticket:
+        """Takes the turn's ticket (once); raises 429 when the waiting room is full."""
+        if self.ticket is None:
+            try:
+                self.ticket = self._scheduler.submit(self.user_id)
+            except HTTPException as e:
+                self.settle(e)
+                raise
+            self.settle()
+        return self.ticket
+
+    def settle(self, error: Optional[BaseException] = None) -> None:
+        """Decides the turn: it has its ticket or produced output without one, or failed with `error`."""
+        # A result rather than the future's exception: nobody waits for the
+        # decision of a background turn, and an unread exception gets logged.
+        if not self._decided.done():
+            self._decided.set_result(error)
+
+    async def decided(self) -> Optional[Ticket]:
+        """Waits until the turn is decided; returns its ticket, or None if it needs none."""
+        error = await asyncio.shield(self._decided)
+        if error is not None:
+            raise error
+        return self.ticket
+
+    def close(self) -> None:
+        """Ends the turn: releases its ticket, if any. Idempotent."""
+        self.settle()
+        if self.ticket is not None:
+            self.ticket.release()
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_user: int,
+        max_waiting: int,
+        max_waiting_per_user: int,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_waiting = max_waiting
+        self.max_waiting_per_user = max_waiting_per_user
+        self._running: Dict[str, int] = {}
+        self._active = 0
+        # user -> waiting tickets; the dict order is the round-robin order.
+        self._queues: "collections.OrderedDict[str, Deque[Ticket]]" = collections.OrderedDict()
+        self._waiting = 0
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: Deque[float] = collections.deque(maxlen=_RECENT_WAITS)
+        self._service_seconds = 0.0 # EWMA of how long a turn holds its slot
+
+    def submit(self, user_id: str) -> Ticket:
+        """
+        Registers a turn. The returned ticket is either granted right away or
+        queued; raises 429 when the waiting room is full.
+        """
+        ticket = Ticket(self, user_id)
+        if (
+            self._active < self.max_concurrent
+            and self._running.get(user_id, 0) < self.max_per_user
+            and user_id not in self._queues
+            and self._next_user() is None
+        ):
+            # Nobody who could use the slot is waiting.
+            self._grant(ticket)
+            return ticket
+        queue = self._queues.get(user_id)
+        if self._waiting >= self.max_waiting or (queue is not None and len(queue) >= self.max_waiting_per_user):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="The assistant is busy, please retry shortly.",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        if queue is None:
+            queue = self._queues[user_id] = collections.deque()
+        queue.append(ticket)
+        self._waiting += 1
+        return ticket
+
+    def retry_after(self) -> int:
+        """Seconds until the waiting room has likely drained, for Retry-After."""
+        per_slot = self._service_seconds or 1.0
+        return max(1, math.ceil(per_slot * (self._waiting + 1) / max(1, self.max_concurrent)))
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "waiting_users": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait_seconds_total": self._wait_total,
+            "queue_wait_seconds_max": self._wait_max,
+            "queue_wait_seconds_p50": percentile(0.5),
+            "queue_wait_seconds_p95": percentile(0.95),
+        }
+
+    # --- internals ---
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.started_at = time.monotonic()
+        waited = ticket.started_at - ticket.enqueued_at
+        self._active += 1
+        self._running[ticket.user_id] = self._running.get(ticket.user_id, 0) + 1
+        self.admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._recent_waits.append(waited)
+        ticket._granted.set()
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting users, round-robin, skipping users at their limit."""
+        while self._active < self.max_concurrent:
+            user_id = self._next_user()
+            if user_id is None:
+                return
+            queue = self._queues.pop(user_id)
+            ticket = queue.popleft()
+            self._waiting -= 1
+            if queue:
+                # Back of the round-robin order.
+                self._queues[user_id] = queue
+            self._grant(ticket)
+
+    def _next_user(self) -> Optional[str]:
+        """The first waiting user in round-robin order who is below their own limit."""
+        for user_id in self._queues:
+            if self._running.get(user_id, 0) < self.max_per_user:
+                return user_id
+        return None
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.granted:
+            self._active -= 1
+            self._running[ticket.user_id] -= 1
+            if not self._running[ticket.user_id]:
+                del self._running[ticket.user_id]
+            held = time.monotonic() - ticket.started_at
+            self._service_seconds = held if not self._service_seconds else 0.8 * self._service_seconds + 0.2 * held
+        else:
+            queue = self._queues.get(ticket.user_id)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self._waiting -= 1
+                if not queue:
+                    del self._queues[ticket.user_id]
+        self._dispatch()
+
+    def _position(self, ticket: Ticket) -> int:
+        if ticket.granted:
+            return 0
+        queue = self._queues.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        # Round-robin: users ahead in the rotation get up to index + 1 turns in
+        # first, users behind it up to index.
+        ahead, before = index, True
+        for user_id, other in self._queues.items():
+            if user_id == ticket.user_id:
+                before = False
+            else:
+                ahead += min(len(other), index + 1 if before else index)
+        return ahead
+
+
+scheduler = LLMScheduler(
+    max_concurrent=settings.LLM_MAX_CONCURRENT,
+    max_per_user=settings.LLM_MAX_CONCURRENT_PER_USER,
+    max_waiting=settings.LLM_QUEUE_MAX_WAITING,
+    max_waiting_per_user=settings.LLM_QUEUE_MAX_WAITING_PER_USER,
+)
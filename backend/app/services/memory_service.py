@@ -1,77 +1,311 @@
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
-from typing import List
-from .firebase_service import db
+from langchain_core.messages import BaseMessage, messages_from_dict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .deletion_service import bulk_delete_messages
+from . import retrieval_memory
+from ..config.settings import settings
+from ..core.cache import TTLCache
+from ..core.executor import run_sync
+from ..core.metrics import count_datastore_reads, count_datastore_writes
+from ..core.tokens import count_tokens
+from ..core.tracing import traced
+from ..repositories import Repository, get_repository, get_sync_repository, is_owned_by
 import datetime
-from google.cloud import firestore
 
-class FirestoreChatMessageHistory(BaseChatMessageHistory):
+
+def _to_messages(docs: List[Dict[str, Any]]) -> List[BaseMessage]:
+    """Converts stored message documents into LangChain messages."""
+    # The 'role' from Firestore needs to be mapped to 'type' for LangChain messages
+    return messages_from_dict([
+        {"type": doc.get("role", "human"), "data": {"content": doc.get("content", "")}} # Default to human if role is missing
+        for doc in docs
+    ])
+
+
+def _role(message: BaseMessage) -> str:
+    """The role to store for a message; streamed answers arrive as chunks."""
+    # LangChain message dict has 'type', we store it as 'role' in Firestore
+    return _CHUNK_ROLES.get(message.type, message.type)
+
+_CHUNK_ROLES = {"AIMessageChunk": "ai", "HumanMessageChunk": "human"}
+
+
+class _CachedHistory:
     """
-    Custom Chat Message History store that uses Google Firestore.
-    It stores messages in a 'messages' subcollection within a specific conversation document.
+    The part of a conversation's history this worker has already read, plus
+    what the history policy needs to build a prompt from it.
     """
+
+    __slots__ = (
+        "user_id", "cleared_at", "messages", "token_counts", "message_ids", "ids", "last_timestamp", "last_seq",
+        "summary", "summary_message_count",
+    )
+
+    def __init__(self, user_id: str, conversation: Optional[Dict[str, Any]] = None):
+        conversation = conversation or {}
+        self.user_id = user_id
+        # The conversation's `cleared_at` when this copy was read; a newer one means it is stale.
+        self.cleared_at: Optional[datetime.datetime] = conversation.get("cleared_at")
+        self.messages: List[BaseMessage] = []
+        # Parallel to `messages`; counted once when the message was written.
+        self.token_counts: List[int] = []
+        self.message_ids: List[str] = []
+        self.ids = set()
+        self.last_timestamp: Optional[datetime.datetime] = None
+        # Highest sequence number read, for layouts that number messages (see Repository.stream_messages).
+        self.last_seq: Optional[int] = None
+        # Rolling summary of the first `summary_message_count` messages.
+        self.summary: Optional[str] = conversation.get("summary")
+        self.summary_message_count: int = conversation.get("summary_message_count") or 0
+
+    def extend(self, docs: List[Dict[str, Any]]) -> None:
+        # Tail fetches are inclusive of `last_timestamp`, so skip what we already hold.
+        docs = [doc for doc in docs if doc["id"] not in self.ids]
+        self.messages.extend(_to_messages(docs))
+        for doc in docs:
+            self.ids.add(doc["id"])
+            self.message_ids.append(doc["id"])
+            # Messages written before token counts were stored are counted once, here.
+            self.token_counts.append(doc.get("token_count") or count_tokens(doc.get("content", "")))
+            if self.last_timestamp is None or doc["timestamp"] > self.last_timestamp:
+                self.last_timestamp = doc["timestamp"]
+            if doc.get("seq") is not None and (self.last_seq is None or doc["seq"] > self.last_seq):
+                self.last_seq = doc["seq"]
+
+    def is_current_for(self, user_id: str, conversation: Dict[str, Any]) -> bool:
+        """False if the conversation was cleared (on any worker) since this copy was read."""
+        message_count = conversation.get("message_count")
+        return (
+            self.user_id == user_id
+            and self.cleared_at == conversation.get("cleared_at")
+            # Fewer messages than we hold: cleared before `cleared_at` was kept.
+            and (message_count is None or len(self.messages) <= message_count)
+        )
+
+    def adopt_summary(self, conversation: Dict[str, Any]) -> None:
+        """Takes over a newer rolling summary, e.g. one another worker saved."""
+        if (conversation.get("summary_message_count") or 0) > self.summary_message_count:
+            self.summary = conversation.get("summary")
+            self.summary_message_count = conversation["summary_message_count"]
+
+
+# Bounded LRU of per-conversation histories. The first turn of a conversation
+# on this worker reads its full history; every later turn checks the copy
+# against the conversation document the request has loaded anyway
+# (`cleared_at`, `message_count`) and only fetches the messages past it
+# (normally none, because `aadd_messages` writes through), so the per-turn
+# read cost stays constant.
+_history_cache: TTLCache[_CachedHistory] = TTLCache(maxsize=settings.HISTORY_CACHE_MAX_CONVERSATIONS)
+
+
+def invalidate_history(conversation_id: str) -> None:
+    """Drops the cached history of a conversation (e.g. after it was cleared or deleted)."""
+    _history_cache.pop(conversation_id)
+
+
+class TurnWriteBuffer:
+    """
+    Collects the messages of one chat turn and persists them with a single
+    batched write: every message plus one merged update of the conversation's
+    metadata, instead of an `add` and an `update` per message.
+    """
+
     def __init__(self, conversation_id: str, user_id: str):
         self.conversation_id = conversation_id
         self.user_id = user_id
-        self.collection = db.collection("messages")
-        
-        # Ensure the conversation exists and belongs to the user
-        conv_ref = db.collection("conversations").document(self.conversation_id)
-        conv_doc = conv_ref.get()
-        if not conv_doc.exists:
+        self._pending: List[BaseMessage] = []
+
+    def add(self, message: BaseMessage) -> None:
+        self._pending.append(message)
+
+    @traced("history.flush")
+    async def flush(self) -> List[Dict[str, Any]]:
+        """Commits the buffered messages and returns them as stored."""
+        pending, self._pending = self._pending, []
+        stored = await get_repository().add_messages(
+            self.conversation_id, [(_role(message), message.content) for message in pending]
+        )
+        # The messages plus the conversation's preview update.
+        count_datastore_writes(len(stored) + 1)
+        cached = _history_cache.get(self.conversation_id)
+        if cached is not None:
+            cached.extend(stored)
+        retrieval_memory.index_messages(self.user_id, self.conversation_id, stored)
+        return stored
+
+
+class FirestoreChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history backed by the configured storage repository
+    (Firestore by default, see repositories/).
+
+    The async methods are the ones `chain_with_history.astream` uses; the
+    sync methods remain for callers that are not running on the event loop.
+    """
+    def __init__(self, conversation_id: str, user_id: str, conversation: Optional[Dict[str, Any]] = None):
+        """
+        `conversation` is an already loaded snapshot of the conversation
+        document (e.g. from the request's ConversationLoader). Without it,
+        ownership is checked lazily on first access, so constructing the
+        history (which LangChain does synchronously) never does any I/O.
+        """
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self._verified = False
+        self._conversation: Optional[Dict[str, Any]] = None
+        # Set by aget_messages(); read by the history policy stage of the chain.
+        self.prompt_state: Optional[_CachedHistory] = None
+        if conversation is not None:
+            self._check_owner(conversation)
+
+    def _check_owner(self, conv: Optional[Dict[str, Any]]) -> None:
+        if conv is None or conv.get("deleted"):
             raise ValueError(f"Conversation with ID {self.conversation_id} not found.")
-        
-        if conv_doc.to_dict().get("user_id") != self.user_id:
+        if not is_owned_by(conv, self.user_id):
             raise PermissionError("User does not have access to this conversation.")
+        self._conversation = conv
+        self._verified = True
+
+    @traced("history.ownership_check")
+    async def _aensure_access(self) -> None:
+        """Ensure the conversation exists and belongs to the user."""
+        if not self._verified:
+            self._check_owner(await get_repository().get_conversation(self.conversation_id))
+            count_datastore_reads()
+
+    # --- Async API ---
+
+    @traced("history.get_messages")
+    async def aget_messages(self) -> List[BaseMessage]:
+        """Retrieve messages from the store, ordered by timestamp."""
+        # Normally already loaded with the request, so this costs no read.
+        await self._aensure_access()
+        conversation = self._conversation
+        cached = _history_cache.get(self.conversation_id)
+        if cached is not None and cached.is_current_for(self.user_id, conversation):
+            cached.adopt_summary(conversation)
+            # `message_count` is only a hint (e.g. for data written before it
+            # was kept): fetch the tail unless it says we are up to date.
+            if len(cached.messages) != conversation.get("message_count"):
+                docs = await get_repository().list_messages(
+                    self.conversation_id, since=cached.last_timestamp, after_seq=cached.last_seq
+                )
+                count_datastore_reads(get_repository().message_documents(len(docs)))
+                cached.extend(docs)
+        else:
+            cached = _CachedHistory(self.user_id, conversation)
+            docs = await get_repository().list_messages(self.conversation_id)
+            count_datastore_reads(get_repository().message_documents(len(docs)))
+            cached.extend(docs)
+            _history_cache.set(self.conversation_id, cached)
+        self.prompt_state = cached
+        return list(cached.messages)
+
+    @traced("history.get_message_page")
+    async def aget_message_page(
+        self, limit: int, before: Optional[Tuple[datetime.datetime, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime.datetime, str]]]:
+        """
+        A page of stored messages, newest first, and the position of the next
+        (older) one; see Repository.list_message_page.
+        """
+        await self._aensure_access()
+        repo = get_repository()
+        docs, next_before = await repo.list_message_page(self.conversation_id, limit, before)
+        count_datastore_reads(repo.message_documents(len(docs) + (next_before is not None)))
+        return docs, next_before
+
+    @traced("history.add_messages")
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Append messages to the store.
+
+        `chain_with_history` calls this once, after the response stream has
+        finished, with both the question and the answer, so a whole turn is
+        a single batched write.
+        """
+        await self._aensure_access()
+        buffer = TurnWriteBuffer(self.conversation_id, self.user_id)
+        for message in messages:
+            buffer.add(message)
+        await buffer.flush()
+
+    @traced("history.save_summary")
+    async def asave_summary(self, summary: str, message_count: int) -> bool:
+        """
+        Stores the rolling summary covering the first `message_count` messages.
+
+        The summary was made from `prompt_state`, which may be stale by now:
+        it is only stored if the conversation has not been cleared since
+        (`cleared_at`), still holds at least the messages it had then
+        (`message_count`) and has no summary covering as much already (e.g.
+        from another worker). Returns whether it was stored.
+        """
+        state = self.prompt_state
+
+        def still_applies(conv: Dict[str, Any]) -> bool:
+            return (
+                conv.get("cleared_at") == state.cleared_at
+                and (conv.get("message_count") or 0) >= len(state.messages)
+                and (conv.get("summary_message_count") or 0) < message_count
+            )
+
+        stored = await get_repository().update_conversation_if(self.conversation_id, {
+            "summary": summary,
+            "summary_message_count": message_count,
+        }, still_applies)
+        count_datastore_reads()
+        if not stored:
+            return False
+        count_datastore_writes()
+        state.summary = summary
+        state.summary_message_count = message_count
+        return True
+
+    @traced("history.clear")
+    async def aclear(self) -> None:
+        """Clear all messages from the history."""
+        await self._aensure_access()
+        invalidate_history(self.conversation_id)
+        await self._clear_stored(get_repository())
+
+    # --- Sync API ---
+    # For callers that are not running on the event loop. They go through a
+    # repository of their own on a background loop (see core/executor.run_sync)
+    # and leave this worker's history cache alone, which notices their writes
+    # by the conversation's `message_count` and `cleared_at`.
+
+    @traced("history.ownership_check")
+    def _ensure_access(self) -> None:
+        if not self._verified:
+            self._check_owner(run_sync(get_sync_repository().get_conversation(self.conversation_id)))
+            count_datastore_reads()
 
     @property
+    @traced("history.get_messages")
     def messages(self) -> List[BaseMessage]:
-        """Retrieve messages from Firestore, ordered by timestamp."""
-        message_docs = self.collection.where("conversation_id", "==", self.conversation_id).order_by("timestamp", direction="ASCENDING").stream()
-        
-        items = []
-        for doc in message_docs:
-            message_data = doc.to_dict()
-            # The 'role' from Firestore needs to be mapped to 'type' for LangChain messages
-            message_data['type'] = message_data.pop('role', 'human') # Default to human if role is missing
-            message_data.pop('timestamp', None) # Remove timestamp as it's not a direct part of message dict
-            items.append(message_data)
-            
-        return messages_from_dict(items)
+        """Retrieve messages from the store, ordered by timestamp."""
+        self._ensure_access()
+        repo = get_sync_repository()
+        docs = run_sync(repo.list_messages(self.conversation_id))
+        count_datastore_reads(repo.message_documents(len(docs)))
+        return _to_messages(docs)
 
+    @traced("history.add_messages")
     def add_message(self, message: BaseMessage) -> None:
-        """Append a message to Firestore."""
-        # LangChain message dict has 'type', we store it as 'role' in Firestore
-        role = message.type
-        content = message.content
-        
-        self.collection.add({
-            "conversation_id": self.conversation_id,
-            "role": role,
-            "content": content,
-            "timestamp": datetime.datetime.utcnow()
-        })
-        
-        # Also update the conversation's last message and timestamp
-        conv_ref = db.collection("conversations").document(self.conversation_id)
-        conv_ref.update({
-            "last_message": content[:100], # Preview
-            "last_message_timestamp": datetime.datetime.utcnow(),
-            "updated_at": datetime.datetime.utcnow(),
-            "message_count": firestore.Increment(1)
-        })
-
+        """Append a message to the store."""
+        self._ensure_access()
+        run_sync(get_sync_repository().add_messages(self.conversation_id, [(_role(message), message.content)]))
+        count_datastore_writes(2)
 
+    @traced("history.clear")
     def clear(self) -> None:
-        """Clear all messages from the history in Firestore."""
-        docs = self.collection.where("conversation_id", "==", self.conversation_id).stream()
-        for doc in docs:
-            doc.reference.delete()
-        
-        # Reset conversation metadata
-        conv_ref = db.collection("conversations").document(self.conversation_id)
-        conv_ref.update({
-            "last_message": None,
-            "last_message_timestamp": None,
-            "message_count": 0
-        })
\ No newline at end of file
+        """Clear all messages from the history."""
+        self._ensure_access()
+        run_sync(self._clear_stored(get_sync_repository()))
+
+    async def _clear_stored(self, repo: Repository) -> None:
+        await retrieval_memory.forget_conversation(self.user_id, self.conversation_id)
+        await bulk_delete_messages(self.conversation_id, repo=repo)
+        await repo.reset_conversation_preview(self.conversation_id)
+        count_datastore_writes()
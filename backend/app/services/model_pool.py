@@ -0,0 +1,350 @@
+# backend/app/services/model_pool.py
+"""
+A pool of interchangeable chat model backends behind one chat model.
+
+Configured with MODEL_POOL_BACKENDS, a comma-separated list of specs:
+
+    google:gemini-1.5-flash              a Gemini model
+    fake?ttft=0.5&ttft_jitter=2          the fake model (see fake_llm.py) with its fields overridden
+
+Listing the same spec twice gives two replicas of one model.
+
+- Health: every backend keeps an EWMA of its time to first token and of its
+  error rate. Calls go to the healthiest backend first.
+- Hedging: if the first token has not arrived by the MODEL_POOL_HEDGE_PERCENTILE
+  of recently observed first-token times, the same prompt is sent to the next
+  backend too. Whichever streams first wins; the other call is cancelled.
+- Failover: a backend failing before its first token is replaced by the next
+  one. A failure after streaming has started is passed on, since the text
+  already sent cannot be taken back.
+- Circuit breaking: after MODEL_POOL_FAILURE_THRESHOLD consecutive failures a
+  backend is skipped for MODEL_POOL_COOLDOWN_SECONDS. Then a single trial
+  call decides whether it is closed again or stays open.
+
+Every chunk names the spec of the backend that produced it in
+`response_metadata["answered_by"]`, so the response cache can tell a
+fallback's answer from the primary model's.
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, AsyncIterator, Deque, Iterator, List, Optional
+from urllib.parse import parse_qsl
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from ..config.settings import settings
+from .fake_llm import FakeStreamingChatModel
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the latency and error EWMAs.
+_EWMA_ALPHA = 0.2
+# An error rate of 1.0 makes a backend rank like one this many times slower.
+_ERROR_PENALTY = 4.0
+# Number of recent first-token times the hedge deadline is computed from.
+_TTFT_SAMPLES = 200
+
+
+class ModelPoolUnavailable(RuntimeError):
+    """Every backend's circuit is open."""
+
+
+class Backend:
+    """One model in the pool with its health state."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, model: BaseChatModel, spec: Optional[str] = None):
+        self.name = name
+        self.model = model
+        # The model behind the backend; replicas share it.
+        self.spec = spec or name
+        self.ttft_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self.trial_running = False
+        self.calls = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    def score(self) -> float:
+        """Lower is healthier. Backends without samples rank first so they get measured."""
+        return (self.ttft_ewma or 0.0) * (1 + _ERROR_PENALTY * self.error_ewma)
+
+    def available(self, now: float) -> bool:
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            return not self.trial_running
+        return self.state == self.CLOSED
+
+    def started(self) -> None:
+        self.calls += 1
+        if self.state == self.HALF_OPEN:
+            self.trial_running = True
+
+    def record_latency(self, seconds: float) -> None:
+        self.ttft_ewma = seconds if self.ttft_ewma is None else (1 - _EWMA_ALPHA) * self.ttft_ewma + _EWMA_ALPHA * seconds
+
+    def record_latency_at_least(self, seconds: float) -> None:
+        """
+        For a call given up on before its first token: its time to first token
+        would have been longer, so the sample may only raise the estimate.
+        """
+        if self.ttft_ewma is None or seconds > self.ttft_ewma:
+            self.record_latency(seconds)
+
+    def record_success(self, ttft: float) -> None:
+        self.record_latency(ttft)
+        self.error_ewma *= 1 - _EWMA_ALPHA
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.trial_running = False
+
+    def record_abandoned(self) -> None:
+        """A hedged call that lost the race proves nothing either way."""
+        self.trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.error_ewma = (1 - _EWMA_ALPHA) * self.error_ewma + _EWMA_ALPHA
+        self.consecutive_failures += 1
+        self.trial_running = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= settings.MODEL_POOL_FAILURE_THRESHOLD:
+            self.state = self.OPEN
+            self.open_until = time.monotonic() + settings.MODEL_POOL_COOLDOWN_SECONDS
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "ttft_ewma_seconds": self.ttft_ewma,
+            "error_ewma": self.error_ewma,
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedges_won": self.hedges_won,
+        }
+
+
+class _Attempt:
+    """One backend call, raced on its first chunk."""
+
+    def __init__(self, backend: Backend, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any):
+        backend.started()
+        self.backend = backend
+        self.started_at = time.monotonic()
+        self.stream = backend.model.astream(messages, stop=stop, **kwargs).__aiter__()
+        self.first = asyncio.ensure_future(self.stream.__anext__())
+
+    async def abandon(self) -> None:
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+
+class ModelPool(BaseChatModel):
+    backends: List[Any]
+    hedging: bool = True
+    hedge_percentile: float = 0.95
+    hedge_min_delay: float = 0.5
+    hedge_max_delay: float = 10.0
+    hedge_min_samples: int = 20
+
+    _ttfts: Deque[float] = PrivateAttr(default_factory=lambda: collections.deque(maxlen=_TTFT_SAMPLES))
+    _hedges: int = PrivateAttr(default=0)
+    _background: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "model-pool"
+
+    def hedge_delay(self) -> float:
+        """How long the first backend gets before a hedged request is sent."""
+        if len(self._ttfts) < self.hedge_min_samples:
+            return self.hedge_max_delay
+        ttfts = sorted(self._ttfts)
+        delay = ttfts[min(len(ttfts) - 1, int(self.hedge_percentile * len(ttfts)))]
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, delay))
+
+    def ranked(self) -> List[Backend]:
+        """Available backends, healthiest first."""
+        now = time.monotonic()
+        return sorted((backend for backend in self.backends if backend.available(now)), key=Backend.score)
+
+    def stats(self) -> dict:
+        return {
+            "hedge_delay_seconds": self.hedge_delay(),
+            "hedged_calls": self._hedges,
+            "backends": [backend.stats() for backend in self.backends],
+        }
+
+    def _abandon(self, attempt: _Attempt) -> None:
+        # A backend that always loses the race would otherwise keep ranking first.
+        attempt.backend.record_latency_at_least(time.monotonic() - attempt.started_at)
+        attempt.backend.record_abandoned()
+        # In the background, so the winner's stream is not held up.
+        task = asyncio.ensure_future(attempt.abandon())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        candidates = self.ranked()
+        if not candidates:
+            raise ModelPoolUnavailable("No chat model backend is available.")
+        attempts = [_Attempt(candidates.pop(0), messages, stop, **kwargs)]
+        hedge = None
+        hedge_at = time.monotonic() + self.hedge_delay()
+        hedged = not self.hedging
+        winner, first_chunk, last_error = None, None, None
+        try:
+            while winner is None:
+                if not attempts:
+                    # Every running call failed before streaming: fail over.
+                    if not candidates:
+                        raise last_error
+                    attempts.append(_Attempt(candidates.pop(0), messages, stop, **kwargs))
+                timeout = None if hedged or not candidates else max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait([attempt.first for attempt in attempts], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self._hedges += 1
+                    hedge = _Attempt(candidates.pop(0), messages, stop, **kwargs)
+                    attempts.append(hedge)
+                    continue
+                for attempt in [attempt for attempt in attempts if attempt.first.done()]:
+                    error = attempt.first.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = attempt
+                        first_chunk = None if error is not None else attempt.first.result()
+                        break
+                    logger.warning("Chat model backend %s failed: %r", attempt.backend.name, error)
+                    attempt.backend.record_failure()
+                    attempts.remove(attempt)
+                    last_error = error
+        finally:
+            for attempt in attempts:
+                if attempt is not winner:
+                    self._abandon(attempt)
+
+        backend = winner.backend
+        ttft = time.monotonic() - winner.started_at
+        self._ttfts.append(ttft)
+        if winner is hedge:
+            backend.hedges_won += 1
+        try:
+            if first_chunk is not None:
+                yield await self._emit(first_chunk, backend, run_manager)
+                async for chunk in winner.stream:
+                    yield await self._emit(chunk, backend, run_manager)
+        except (asyncio.CancelledError, GeneratorExit):
+            backend.record_abandoned()
+            await winner.stream.aclose()
+            raise
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success(ttft)
+
+    @staticmethod
+    async def _emit(chunk: AIMessageChunk, backend: Backend, run_manager) -> ChatGenerationChunk:
+        generation = ChatGenerationChunk(
+            message=AIMessageChunk(content=chunk.content, response_metadata={"answered_by": backend.spec})
+        )
+        if run_manager is not None:
+            await run_manager.on_llm_new_token(generation.text, chunk=generation)
+        return generation
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        parts = [chunk.text async for chunk in self._astream(messages, stop=stop, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(parts)))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Blocking callers get plain failover, without hedging.
+        last_error: Optional[BaseException] = None
+        for backend in self.ranked():
+            backend.started()
+            started_at = time.monotonic()
+            try:
+                message = backend.model.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                backend.record_failure()
+                last_error = e
+                continue
+            backend.record_success(time.monotonic() - started_at)
+            return ChatResult(generations=[ChatGeneration(
+                message=AIMessage(content=message.content, response_metadata={"answered_by": backend.spec})
+            )])
+        raise last_error or ModelPoolUnavailable("No chat model backend is available.")
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages, stop=stop, **kwargs)
+        yield ChatGenerationChunk(message=AIMessageChunk(content=result.generations[0].message.content))
+
+
+def create_backend_model(spec: str) -> BaseChatModel:
+    """Builds the model for one MODEL_POOL_BACKENDS entry."""
+    provider, _, options = spec.partition("?")
+    provider, _, model_name = provider.partition(":")
+    overrides = dict(parse_qsl(options))
+    if provider == "fake":
+        fields = {
+            "time_to_first_token": settings.FAKE_LLM_TTFT_SECONDS,
+            "tokens_per_second": settings.FAKE_LLM_TOKENS_PER_SECOND,
+            "answer_tokens": settings.FAKE_LLM_ANSWER_TOKENS,
+        }
+        aliases = {"ttft": "time_to_first_token"}
+        fields.update({aliases.get(key, key): value for key, value in overrides.items()})
+        return FakeStreamingChatModel(**fields)
+    if provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model_name or settings.LLM_MODEL,
+            google_api_key=settings.GOOGLE_API_KEY,
+            temperature=float(overrides.get("temperature", 0.7)),
+        )
+    raise ValueError(f"Unknown chat model backend: {spec!r}")
+
+
+def create_model_pool(backends_setting: str) -> ModelPool:
+    """Builds the pool from a MODEL_POOL_BACKENDS value."""
+    specs = [spec.strip() for spec in backends_setting.split(",") if spec.strip()]
+    backends = [Backend(f"{index}:{spec}", create_backend_model(spec), spec) for index, spec in enumerate(specs)]
+    return ModelPool(
+        backends=backends,
+        hedging=settings.MODEL_POOL_HEDGING,
+        hedge_percentile=settings.MODEL_POOL_HEDGE_PERCENTILE,
+        hedge_min_delay=settings.MODEL_POOL_HEDGE_MIN_DELAY_SECONDS,
+        hedge_max_delay=settings.MODEL_POOL_HEDGE_MAX_DELAY_SECONDS,
+    )
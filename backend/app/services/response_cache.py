@@ -0,0 +1,92 @@
+# backend/app/services/response_cache.py
+"""
+Exact-match cache of complete LLM responses.
+
+The key is a hash of the model, the system prompt, the (already trimmed)
+history and the question, after whitespace normalisation. A hit replays the
+stored chunks as a normal model stream, so the SSE framing and the history
+write-back work exactly as for a live answer. Entries expire after
+RESPONSE_CACHE_TTL_SECONDS and are evicted least-recently-used first once
+RESPONSE_CACHE_MAX_ENTRIES or RESPONSE_CACHE_MAX_BYTES is exceeded.
+
+A request can opt out by setting `use_response_cache: False` in the
+runnable config's `configurable`.
+"""
+import hashlib
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableGenerator
+
+from ..config.settings import settings
+from ..core.cache import TTLCache
+
+# A cached answer is the sequence of chunk texts the model produced.
+CachedResponse = Tuple[str, ...]
+
+
+def _sizeof(response: CachedResponse) -> int:
+    return sum(len(part.encode("utf-8")) for part in response)
+
+
+_cache: TTLCache[CachedResponse] = TTLCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    sizeof=_sizeof,
+)
+
+
+def _normalize(text: Any) -> str:
+    return " ".join(str(text).split())
+
+
+def make_key(model: str, system_prompt: str, history: Sequence[BaseMessage], question: str) -> str:
+    payload = json.dumps(
+        [model, _normalize(system_prompt), [[m.type, _normalize(m.content)] for m in history], _normalize(question)],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters plus current size in entries and bytes."""
+    return _cache.stats()
+
+
+def cached(model_chain: Runnable, model: str, system_prompt: str) -> Runnable:
+    """
+    Wraps `model_chain` (prompt | llm, taking {"history", "question"}) with the
+    response cache. Answers are keyed by `model`; one whose chunks say it was
+    `answered_by` another model (a model pool's fallback) is not stored, so
+    the primary model's key never serves it.
+    """
+
+    async def _stream(inputs: AsyncIterator[Dict[str, Any]], config: RunnableConfig) -> AsyncIterator[AIMessageChunk]:
+        payload: Dict[str, Any] = {}
+        async for part in inputs:
+            payload.update(part)
+
+        key: Optional[str] = None
+        if settings.RESPONSE_CACHE_ENABLED and config.get("configurable", {}).get("use_response_cache", True):
+            key = make_key(model, system_prompt, payload["history"], payload["question"])
+            hit = _cache.get(key)
+            if hit is not None:
+                for text in hit:
+                    yield AIMessageChunk(content=text)
+                return
+
+        parts: List[str] = []
+        answered_by = model
+        async for chunk in model_chain.astream(payload, config):
+            if isinstance(chunk.content, str):
+                parts.append(chunk.content)
+            if chunk.response_metadata.get("answered_by", model) != model:
+                answered_by = chunk.response_metadata["answered_by"]
+            yield chunk
+        # Only complete answers are stored; a stream the client abandoned never gets here.
+        if key is not None and parts and answered_by == model:
+            _cache.set(key, tuple(parts))
+
+    return RunnableGenerator(_stream, name="ResponseCache")
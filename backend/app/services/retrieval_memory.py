@@ -0,0 +1,285 @@
+# backend/app/services/retrieval_memory.py
+"""
+Retrieval-based long-term memory (MEMORY_MODE=retrieval).
+
+Every stored message is embedded in the background and appended to a
+per-user vector index. At question time the prompt gets a short window of
+recent turns plus the top-k most similar past messages from any of the
+user's conversations, instead of a rolling summary.
+
+Each index is a float32 matrix in a memory-mapped file
+(`<VECTOR_INDEX_DIR>/<user>.vec`, rows L2-normalised so a dot product is
+the cosine similarity) next to an append-only JSONL log of row metadata
+(`<user>.meta.jsonl`). The file grows by doubling, so appends are amortised
+O(1) and a search is a single matrix-vector product. An index whose vector
+file does not match its metadata (e.g. after EMBEDDING_DIM changed) is
+refused rather than read as garbage.
+"""
+import abc
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+import numpy as np
+
+from ..config.settings import settings
+from ..core.cache import TTLCache
+from ..core.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+# --- Embedders ---
+
+class Embedder(abc.ABC):
+    """Turns texts into L2-normalised float32 vectors of size `dim`."""
+
+    dim: int
+
+    @abc.abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """One row per text."""
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic, dependency-free embedder based on the hashing trick.
+
+    Similar texts share tokens and therefore vector components, which is
+    enough for tests and local runs; it needs no network and no model.
+    """
+
+    _token_re = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._token_re.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return _normalize(vectors)
+
+
+class GoogleEmbedder(Embedder):
+    """Embeddings from the Gemini embedding API."""
+
+    def __init__(self, model: str, dim: int):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self.dim = dim
+        self._client = GoogleGenerativeAIEmbeddings(model=model, google_api_key=settings.GOOGLE_API_KEY)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return _normalize(np.asarray(self._client.embed_documents(list(texts)), dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def create_embedder() -> Embedder:
+    if settings.EMBEDDER == "google":
+        return GoogleEmbedder(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIM)
+    return HashingEmbedder(settings.EMBEDDING_DIM)
+
+
+# --- Per-user vector index ---
+
+class VectorIndex:
+    """Append-only, memory-mapped vector index of one user's messages."""
+
+    _INITIAL_CAPACITY = 256
+
+    def __init__(self, directory: str, user_id: str, dim: int):
+        name = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+        self.dim = dim
+        self._vec_path = os.path.join(directory, f"{name}.vec")
+        self._meta_path = os.path.join(directory, f"{name}.meta.jsonl")
+        self._lock = threading.Lock()
+        # Callers currently holding the index (see `_using_index`).
+        self.users = 0
+        self._rows: List[Dict[str, Any]] = []
+        # conversation_id -> number of leading rows of it that are forgotten.
+        self._forgotten: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_meta()
+        self._open(max(self._INITIAL_CAPACITY, len(self._rows)))
+
+    def _load_meta(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break # A torn last line from a crash; everything before it is intact.
+                if record.get("forget"):
+                    self._forgotten[record["forget"]] = record["before"]
+                else:
+                    self._rows.append(record)
+
+    def _open(self, capacity: int) -> None:
+        row_bytes = self.dim * 4
+        existing = os.path.getsize(self._vec_path) if os.path.exists(self._vec_path) else 0
+        if existing % row_bytes or existing // row_bytes < len(self._rows):
+            raise ValueError(
+                f"Vector index {self._vec_path} ({existing} bytes) does not hold "
+                f"{len(self._rows)} rows of dimension {self.dim}"
+            )
+        size = capacity * row_bytes
+        with open(self._vec_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._capacity = os.path.getsize(self._vec_path) // row_bytes
+        self._vectors = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+
+    def add(self, vectors: np.ndarray, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            count = len(self._rows)
+            if count + len(rows) > self._capacity:
+                self._vectors.flush()
+                self._open(max(self._capacity * 2, count + len(rows)))
+            self._vectors[count:count + len(rows)] = vectors
+            self._vectors.flush()
+            # Vectors first, then metadata: a row only exists once its line is written.
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+            self._rows.extend(rows)
+
+    def forget_conversation(self, conversation_id: str) -> None:
+        """Stops returning the rows indexed so far for a cleared or deleted conversation."""
+        with self._lock:
+            before = len(self._rows)
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"forget": conversation_id, "before": before}) + "\n")
+            self._forgotten[conversation_id] = before
+
+    def search(self, query: np.ndarray, k: int, exclude_ids: Set[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = len(self._rows)
+            if count == 0:
+                return []
+            scores = np.asarray(self._vectors[:count] @ query)
+            rows = self._rows
+        # Over-fetch so that excluded and forgotten rows do not leave the
+        # result short; widen the window while they still do.
+        candidates = min(count, k + len(exclude_ids) + 8)
+        while True:
+            top = np.argpartition(-scores, candidates - 1)[:candidates]
+            hits = []
+            for index in top[np.argsort(-scores[top])]:
+                if scores[index] <= 0:
+                    return hits # Nothing in common with the query.
+                row = rows[index]
+                if row["message_id"] in exclude_ids or index < self._forgotten.get(row["conversation_id"], 0):
+                    continue
+                hits.append({**row, "score": float(scores[index])})
+                if len(hits) == k:
+                    return hits
+            if candidates == count:
+                return hits
+            candidates = min(count, candidates * 2)
+
+
+_embedder: Optional[Embedder] = None
+# Open indexes, least recently used closed first.
+_indexes: TTLCache[VectorIndex] = TTLCache(maxsize=settings.VECTOR_INDEX_MAX_OPEN)
+# Indexes that are in use, which the LRU may have evicted meanwhile: there
+# must never be two instances appending to the same files.
+_in_use: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+_tasks: Set[asyncio.Task] = set()
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = create_embedder()
+    return _embedder
+
+
+@contextlib.contextmanager
+def _using_index(user_id: str) -> Iterator[VectorIndex]:
+    # Called from executor threads, hence the lock around the (loop-only) cache.
+    with _indexes_lock:
+        index = _in_use.get(user_id) or _indexes.get(user_id)
+        if index is None:
+            index = VectorIndex(settings.VECTOR_INDEX_DIR, user_id, get_embedder().dim)
+        _indexes.set(user_id, index)
+        index.users += 1
+        _in_use[user_id] = index
+    try:
+        yield index
+    finally:
+        with _indexes_lock:
+            index.users -= 1
+            if not index.users:
+                del _in_use[user_id]
+
+
+def _index_sync(user_id: str, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+    vectors = get_embedder().embed([message["content"] for message in messages])
+    with _using_index(user_id) as index:
+        index.add(vectors, [
+            {
+                "conversation_id": conversation_id,
+                "message_id": message["id"],
+                "role": message["role"],
+                "content": message["content"],
+            }
+            for message in messages
+        ])
+
+
+def _recall_sync(user_id: str, question: str, k: int, exclude_ids: Set[str]) -> List[Dict[str, Any]]:
+    query = get_embedder().embed([question])[0]
+    with _using_index(user_id) as index:
+        return index.search(query, k, exclude_ids)
+
+
+def enabled() -> bool:
+    return settings.MEMORY_MODE == "retrieval"
+
+
+def index_messages(user_id: str, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+    """Embeds and indexes freshly stored messages in the background."""
+    if not enabled() or not messages:
+        return
+
+    async def _index() -> None:
+        try:
+            await run_blocking(_index_sync, user_id, conversation_id, messages)
+        except Exception:
+            logger.exception("Failed to index messages of conversation %s", conversation_id)
+
+    task = asyncio.get_running_loop().create_task(_index())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def recall(user_id: str, question: str, exclude_ids: Set[str]) -> List[Dict[str, Any]]:
+    """The RETRIEVAL_TOP_K past messages most similar to `question`, best first."""
+    return await run_blocking(_recall_sync, user_id, question, settings.RETRIEVAL_TOP_K, exclude_ids)
+
+
+def _forget_sync(user_id: str, conversation_id: str) -> None:
+    with _using_index(user_id) as index:
+        index.forget_conversation(conversation_id)
+
+
+async def forget_conversation(user_id: str, conversation_id: str) -> None:
+    if enabled():
+        await run_blocking(_forget_sync, user_id, conversation_id)
@@ -0,0 +1,174 @@
+# backend/app/services/single_flight.py
+"""
+Single-flight deduplication of identical, concurrent chat turns.
+
+Client retries and double-submits often send the same question to the same
+conversation several times at once. Turns are keyed by user, conversation,
+history state (message count and last message time of the conversation
+snapshot the route verified) and the normalised question. While a
+generation for a key is running, further turns with that key attach to it
+instead of starting their own: they replay the pieces produced so far and
+then follow the live stream. The generation, and therefore the history
+write-back, happens exactly once.
+
+The generation runs in its own task, so it survives the client that
+started it disconnecting as long as another subscriber is still reading.
+It is cancelled once the last subscriber has gone. It pauses while its
+slowest subscriber is more than SINGLE_FLIGHT_MAX_LAG pieces behind, so a
+stalled client holds back the model stream (as in core/sse.py) instead of
+the flight buffering ahead of it without bound. The pieces already read
+are kept for late joiners to replay; they are one answer's worth.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from ..config.settings import settings
+
+
+class _Flight:
+    def __init__(self, key: Optional[str], source: AsyncIterator[str], on_done: Optional[Callable[[], None]]):
+        self.key = key
+        self.pieces: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: List["Subscription"] = []
+        self._changed = asyncio.Event()
+        # Set when a subscriber read a piece or left; the paused generation rechecks the lag.
+        self._progress = asyncio.Event()
+        # The task copies the current context, i.e. the starting request's user and loader.
+        self.task = asyncio.get_running_loop().create_task(self._run(source))
+        # Also runs if the task is cancelled before it ever started.
+        self.task.add_done_callback(lambda task: self._finish(on_done))
+
+    async def _run(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for piece in source:
+                self.pieces.append(piece)
+                self._notify()
+                while self._lag() > settings.SINGLE_FLIGHT_MAX_LAG:
+                    await self._progress.wait()
+        except asyncio.CancelledError:
+            self.error = RuntimeError("The generation was cancelled.")
+            raise
+        except Exception as e:
+            self.error = e
+
+    def _finish(self, on_done: Optional[Callable[[], None]]) -> None:
+        self.done = True
+        self._notify()
+        if self.key is not None and _flights.get(self.key) is self:
+            del _flights[self.key]
+        if on_done is not None:
+            on_done()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _lag(self) -> int:
+        """How many pieces the slowest subscriber has yet to read."""
+        return len(self.pieces) - min((subscription._index for subscription in self.subscribers), default=len(self.pieces))
+
+    def _advanced(self) -> None:
+        progress, self._progress = self._progress, asyncio.Event()
+        progress.set()
+
+    def subscribe(self) -> "Subscription":
+        return Subscription(self)
+
+    def _unsubscribe(self, subscription: "Subscription") -> None:
+        self.subscribers.remove(subscription)
+        self._advanced()
+        if not self.subscribers and not self.done:
+            if self.key is not None and _flights.get(self.key) is self:
+                # Later turns must not attach to a generation that is being cancelled.
+                del _flights[self.key]
+            self.task.cancel()
+
+
+class Subscription:
+    """
+    One reader of a flight: an async iterator over all of its pieces, from
+    the first one. Counts as a subscriber from creation until `close()`,
+    which every caller must call when it stops reading.
+    """
+
+    def __init__(self, flight: _Flight):
+        self._flight = flight
+        self._index = 0
+        self._closed = False
+        flight.subscribers.append(self)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        flight = self._flight
+        while True:
+            if self._index < len(flight.pieces):
+                self._index += 1
+                flight._advanced()
+                return flight.pieces[self._index - 1]
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                raise StopAsyncIteration
+            await flight._changed.wait()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._flight._unsubscribe(self)
+
+
+# key -> running flight. Entries remove themselves when their generation ends.
+_flights: Dict[str, _Flight] = {}
+
+# Number of turns that attached to an already running generation.
+joined = 0
+
+
+def turn_key(user_id: str, conversation: Dict[str, Any], question: str, use_cache: bool) -> Optional[str]:
+    """The single-flight key of a chat turn, or None when deduplication is disabled."""
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return None
+    last = conversation.get("last_message_timestamp")
+    payload = json.dumps(
+        [
+            user_id,
+            conversation["id"],
+            conversation.get("message_count", 0),
+            last.isoformat() if last is not None else None,
+            " ".join(question.split()),
+            use_cache,
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def join(key: Optional[str]) -> Optional[Subscription]:
+    """Subscribes to the running generation for `key`, if there is one."""
+    global joined
+    flight = _flights.get(key) if key is not None else None
+    if flight is None or flight.done:
+        return None
+    joined += 1
+    return flight.subscribe()
+
+
+def start(key: Optional[str], source: AsyncIterator[str], on_done: Optional[Callable[[], None]] = None) -> Subscription:
+    """
+    Starts a generation from `source` under `key` and subscribes to it.
+    `on_done` is called once the generation has ended, however it ended.
+    """
+    flight = _Flight(key, source, on_done)
+    if key is not None:
+        _flights[key] = flight
+    return flight.subscribe()
+
+
+def stats() -> Dict[str, int]:
+    return {"in_flight": len(_flights), "joined": joined}
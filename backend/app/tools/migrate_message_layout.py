@@ -0,0 +1,97 @@
+# backend/app/tools/migrate_message_layout.py
+"""
+Copies Firestore messages from the flat layout (one document per message in
+`messages`) into the paged layout (MESSAGE_LAYOUT=paged, see
+repositories/firestore_paged_repository.py).
+
+    python -m app.tools.migrate_message_layout [--conversation ID ...] [--dry-run] [--delete-flat]
+
+Re-runs are safe: each conversation records in `paged_until` the timestamp
+of the newest message copied, and later runs only copy what is newer.
+Suggested rollout:
+
+1. Run it while the workers still use the flat layout.
+2. Switch the workers to MESSAGE_LAYOUT=paged and run it again, to copy the
+   turns written in between. They are appended after any turn already
+   written paged, so keep that window short.
+3. Once every worker is on the paged layout, run it with --delete-flat to
+   remove the flat copies. Deleting a conversation purges leftovers too.
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+from ..config.settings import settings
+from ..repositories.firestore_paged_repository import PagedFirestoreRepository
+from ..repositories.firestore_repository import CONVERSATIONS, FIRESTORE_MAX_BATCH_WRITES, FirestoreRepository
+
+
+async def _conversation_ids(db) -> List[str]:
+    # Tombstoned conversations are skipped: their purge deletes the flat messages.
+    query = db.collection(CONVERSATIONS).select(["deleted"])
+    return [doc.id async for doc in query.stream() if not doc.to_dict().get("deleted")]
+
+
+async def migrate_conversation(
+    flat: FirestoreRepository,
+    paged: PagedFirestoreRepository,
+    conversation: Dict,
+    delete_flat: bool,
+    dry_run: bool,
+) -> Dict[str, int]:
+    until = conversation.get("paged_until")
+    messages = await flat.list_messages(conversation["id"], since=until)
+    # `since` is inclusive and the message at `paged_until` was copied already.
+    messages = [message for message in messages if until is None or message["timestamp"] > until]
+    if messages and not dry_run:
+        await paged.import_messages(conversation["id"], messages)
+    deleted = 0
+    if delete_flat and not dry_run:
+        async for ids in flat.iter_message_id_pages(conversation["id"], FIRESTORE_MAX_BATCH_WRITES):
+            await flat.delete_messages(ids)
+            deleted += len(ids)
+    return {"copied": len(messages), "deleted": deleted}
+
+
+async def migrate(
+    db,
+    conversation_ids: Optional[List[str]],
+    page_size: int,
+    delete_flat: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Migrates the given conversations (all of them for None) and returns totals."""
+    flat = FirestoreRepository(db)
+    paged = PagedFirestoreRepository(db, page_size)
+    if conversation_ids is None:
+        conversation_ids = await _conversation_ids(db)
+    totals = {"conversations": 0, "copied": 0, "deleted": 0, "missing": 0}
+    for conversation_id in conversation_ids:
+        conversation = await flat.get_conversation(conversation_id)
+        if conversation is None:
+            totals["missing"] += 1
+            continue
+        result = await migrate_conversation(flat, paged, conversation, delete_flat, dry_run)
+        totals["conversations"] += 1
+        totals["copied"] += result["copied"]
+        totals["deleted"] += result["deleted"]
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversation", action="append", help="migrate only this conversation (repeatable)")
+    parser.add_argument("--page-size", type=int, default=settings.MESSAGE_PAGE_SIZE, help="messages per page document")
+    parser.add_argument("--delete-flat", action="store_true", help="delete the flat copies afterwards")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be copied")
+    args = parser.parse_args()
+
+    # Imported here so --help works without Firebase credentials.
+    from ..services.firebase_service import get_async_db
+    totals = asyncio.run(migrate(get_async_db(), args.conversation, args.page_size, args.delete_flat, args.dry_run))
+    print(json.dumps(totals, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# backend/benchmarks/run.py
+"""
+End-to-end load and latency benchmark.
+
+Starts benchmarks/server.py in a subprocess with the fake chat model and a
+throwaway SQLite store (unless --url points at a running server), drives
+--users concurrent virtual users through
+
+    register -> create conversation -> --turns streaming chat turns -> list -> delete
+
+and reports, per endpoint, p50/p95/p99 of the time to the response headers
+(TTFB), the time to the first streamed token (chat only) and the full
+latency, plus throughput. The report is JSON so runs can be compared across
+commits.
+
+    cd backend
+    python -m benchmarks.run --users 50 --turns 5 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[Dict[str, float]]] = defaultdict(list)
+        self.errors: Counter = Counter()
+
+    def add(self, endpoint: str, **timings: Optional[float]) -> None:
+        self.samples[endpoint].append(timings)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000, 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99), "max": round(ordered[-1] * 1000, 2)}
+
+
+async def timed(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, method: str, path: str, **kwargs: Any) -> bytes:
+    """Sends one request, records its timings and returns the body."""
+    start = time.perf_counter()
+    first_token = None
+    frames = 0
+    body = bytearray()
+    try:
+        async with client.stream(method, path, **kwargs) as response:
+            ttfb = time.perf_counter() - start
+            async for chunk in response.aiter_bytes():
+                if chunk.count(b"data:"):
+                    frames += chunk.count(b"data:")
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                body += chunk
+    except httpx.HTTPError as e:
+        recorder.errors[endpoint] += 1
+        raise BenchmarkError(f"{endpoint}: {e!r}") from e
+    latency = time.perf_counter() - start
+    if response.status_code >= 400:
+        recorder.errors[endpoint] += 1
+        raise BenchmarkError(f"{endpoint}: HTTP {response.status_code} {bytes(body[:200])!r}")
+    recorder.add(endpoint, ttfb=ttfb, latency=latency, first_token=first_token, frames=frames)
+    return bytes(body)
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, run_id: str, index: int, turns: int) -> None:
+    uid = f"bench-{run_id}-{index}"
+    await timed(client, recorder, "register", "POST", "/api/auth/register", json={
+        "email": f"{uid}@example.com", "password": "benchmark", "display_name": uid,
+    })
+    headers = {"Authorization": f"Bearer {uid}"}
+    body = await timed(client, recorder, "create_conversation", "POST", "/api/conversations/",
+                       json={"title": f"Benchmark {index}"}, headers=headers)
+    conversation_id = json.loads(body)["id"]
+    for turn in range(turns):
+        await timed(client, recorder, "chat_message", "POST", "/api/chat/message", headers=headers, json={
+            "conversation_id": conversation_id,
+            "message": f"Question {turn} from {uid}: how do I keep a long-running service fast?",
+        })
+    await timed(client, recorder, "list_conversations", "GET", "/api/conversations/", headers=headers)
+    await timed(client, recorder, "delete_conversation", "DELETE", f"/api/conversations/{conversation_id}", headers=headers)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, data_dir: str) -> "tuple[subprocess.Popen, str]":
+    port = _free_port()
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_TTFT_SECONDS": str(args.ttft),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_ANSWER_TOKENS": str(args.answer_tokens),
+        "STORAGE_BACKEND": args.storage,
+        "SQLITE_PATH": os.path.join(data_dir, "bench.db"),
+        "VECTOR_INDEX_DIR": os.path.join(data_dir, "vector_index"),
+        # Every virtual user asks the same questions; caching them would measure the cache.
+        "RESPONSE_CACHE_ENABLED": "true" if args.response_cache else "false",
+        # Tokens are fake (see benchmarks/server.py), so Google's signing certs are never needed.
+        "WARMUP_TOKEN_CERTS": "false",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        # Keep stdout for the report.
+        stdout=sys.stderr,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_until_up(url: str, process: Optional[subprocess.Popen], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise BenchmarkError(f"Server exited with code {process.returncode}")
+            try:
+                # /ready turns 200 once the warm-ups are done (see app/core/container.py).
+                if (await client.get("/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise BenchmarkError(f"Server at {url} did not become ready within {timeout}s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(args: argparse.Namespace, recorder: Recorder, wall: float, failed_users: int) -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = recorder.samples.get(endpoint, [])
+        stats: Dict[str, Any] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(endpoint, 0),
+            "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+            "ttfb_ms": percentiles([s["ttfb"] for s in samples]),
+            "latency_ms": percentiles([s["latency"] for s in samples]),
+        }
+        first_tokens = [s["first_token"] for s in samples if s["first_token"] is not None]
+        if first_tokens:
+            stats["first_token_ms"] = percentiles(first_tokens)
+            stream_seconds = sum(s["latency"] - s["first_token"] for s in samples if s["first_token"] is not None)
+            frames = sum(s["frames"] for s in samples)
+            stats["frames_per_second_per_stream"] = round(frames / stream_seconds, 2) if stream_seconds else None
+        endpoints[endpoint] = stats
+    return {
+        "commit": _git_commit(),
+        "config": {
+            "users": args.users,
+            "turns": args.turns,
+            "storage": args.storage,
+            "ttft_seconds": args.ttft,
+            "tokens_per_second": args.tokens_per_second,
+            "answer_tokens": args.answer_tokens,
+            "response_cache": args.response_cache,
+            "url": args.url,
+        },
+        "wall_seconds": round(wall, 3),
+        "failed_users": failed_users,
+        "endpoints": endpoints,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    process = None
+    with tempfile.TemporaryDirectory(prefix="chat-bench-") as data_dir:
+        url = args.url
+        if url is None:
+            process, url = start_server(args, data_dir)
+        try:
+            await wait_until_up(url, process)
+            recorder = Recorder()
+            run_id = uuid.uuid4().hex[:8]
+            limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+            async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+                start = time.perf_counter()
+                results = await asyncio.gather(
+                    *(virtual_user(client, recorder, run_id, index, args.turns) for index in range(args.users)),
+                    return_exceptions=True,
+                )
+                wall = time.perf_counter() - start
+            failures = [result for result in results if isinstance(result, Exception)]
+            for failure in failures[:5]:
+                print(f"virtual user failed: {failure}", file=sys.stderr)
+            return build_report(args, recorder, wall, len(failures))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per user")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="fake model streaming rate")
+    parser.add_argument("--answer-tokens", type=int, default=64, help="tokens per fake answer")
+    parser.add_argument("--storage", choices=["sqlite", "firestore"], default="sqlite")
+    parser.add_argument("--response-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--url", help="benchmark an already running benchmarks.server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout (s)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/server.py
+"""
+Serves app.main.app for benchmarks.
+
+Firebase Auth is the only dependency that cannot be swapped by settings, so
+it is replaced here: registration stores the profile in the configured
+repository without calling Firebase, and the bearer token *is* the uid.
+Everything else (storage backend, fake model, caches) comes from the
+environment, which benchmarks/run.py sets before starting this process.
+
+    python -m benchmarks.server --port 8010
+"""
+import argparse
+import types
+
+import uvicorn
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials
+
+
+def create_app():
+    from app.main import app
+    from app.api import auth as auth_api
+    from app.api import chat as chat_api
+    from app.repositories import get_repository
+    from app.services.auth_service import bearer_scheme, get_current_user
+
+    async def create_user(email, password, display_name):
+        uid = email.split("@", 1)[0]
+        await get_repository().create_user(uid, {"email": email, "display_name": display_name, "is_active": True})
+        return types.SimpleNamespace(uid=uid, email=email, display_name=display_name)
+
+    async def current_user(creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+        return {"uid": creds.credentials}
+
+    async def verify_token(token: str) -> dict:
+        return {"uid": token, "exp": float("inf")}
+
+    auth_api.create_firebase_user = create_user
+    chat_api.verify_token = verify_token # WebSocket channel auth
+    app.dependency_overrides[get_current_user] = current_user
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
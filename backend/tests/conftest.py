@@ -0,0 +1,8 @@
+# backend/tests/conftest.py
+import os
+
+# Settings are read at import, so pick the self-contained backends before any app module loads.
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("EMBEDDER", "hashing")
+os.environ.setdefault("WARMUP_TOKEN_CERTS", "false")
@@ -0,0 +1,180 @@
+# backend/tests/fake_firestore.py
+"""
+In-memory stand-in for the parts of the async Firestore client the
+repositories use: documents and subcollections, batches, single-field
+filters with ordering and cursors, and the Increment / ArrayUnion
+transforms. Transactions are batches; `transactional` replaces
+`firestore.async_transactional` in tests (no contention to retry on).
+"""
+import copy
+import operator
+import uuid
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import transforms
+
+_OPERATORS = {"==": operator.eq, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+class Snapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class DocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return Query(self._db, f"{self.path}/{name}")
+
+    async def get(self, transaction=None):
+        self._db.reads += 1
+        return Snapshot(self, copy.deepcopy(self._db.docs.get(self.path)))
+
+    def _apply(self, data, merge):
+        current = copy.deepcopy(self._db.docs.get(self.path, {})) if merge else {}
+        for key, value in data.items():
+            if isinstance(value, transforms.ArrayUnion):
+                existing = current.get(key, [])
+                current[key] = existing + [copy.deepcopy(item) for item in value.values if item not in existing]
+            elif isinstance(value, transforms.Increment):
+                current[key] = current.get(key, 0) + value.value
+            else:
+                current[key] = copy.deepcopy(value)
+        self._db.docs[self.path] = current
+
+    async def set(self, data, merge=False):
+        self._apply(data, merge)
+
+    async def update(self, data):
+        if self.path not in self._db.docs:
+            raise KeyError(f"No document to update: {self.path}")
+        self._apply(data, True)
+
+
+class Query:
+    def __init__(self, db, path, filters=(), orders=(), limit=None, after=None):
+        self._db = db
+        self._path = path
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit
+        self._after = after
+
+    def _copy(self, **changes):
+        query = Query(self._db, self._path, self._filters, self._orders, self._limit, self._after)
+        for key, value in changes.items():
+            setattr(query, key, value)
+        return query
+
+    def where(self, field, op, value):
+        return self._copy(_filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return self._copy(_orders=self._orders + [(field, direction)])
+
+    def select(self, fields):
+        return self
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def start_after(self, values):
+        return self._copy(_after=values)
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._db, f"{self._path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+    async def add(self, data):
+        reference = self.document()
+        await reference.set(data)
+        return None, reference
+
+    async def stream(self):
+        def value(path, data, field):
+            return path.rsplit("/", 1)[-1] if field == "__name__" else data.get(field)
+
+        rows = [(path, data) for path, data in self._db.docs.items() if path.rsplit("/", 1)[0] == self._path]
+        def matches(path, data, field, op, expected):
+            if expected is None:
+                # Only equality matches null, and only a field that is set to it.
+                return op == "==" and field in data and data[field] is None
+            return value(path, data, field) is not None and _OPERATORS[op](value(path, data, field), expected)
+
+        rows = [row for row in rows if all(matches(*row, *condition) for condition in self._filters)]
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: value(*row, field), reverse=direction == firestore.Query.DESCENDING)
+        if self._after is not None:
+            # Queries order in one direction throughout.
+            past = operator.lt if self._orders and self._orders[0][1] == firestore.Query.DESCENDING else operator.gt
+            cursor = tuple(self._after[field] for field, _ in self._orders)
+            rows = [row for row in rows if past(tuple(value(*row, field) for field, _ in self._orders), cursor)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for path, data in rows:
+            self._db.reads += 1
+            yield Snapshot(DocumentReference(self._db, path), copy.deepcopy(data))
+
+
+class WriteBatch:
+    """All or nothing, like the real one: an update of a missing document fails the whole batch."""
+
+    def __init__(self):
+        self._writes = []
+        self._updated = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(lambda: reference._apply(data, merge))
+
+    def update(self, reference, data):
+        self._updated.append(reference)
+        self._writes.append(lambda: reference._apply(data, True))
+
+    def delete(self, reference):
+        self._writes.append(lambda: reference._db.docs.pop(reference.path, None))
+
+    async def commit(self):
+        for reference in self._updated:
+            if reference.path not in reference._db.docs:
+                raise KeyError(f"No document to update: {reference.path}")
+        for write in self._writes:
+            write()
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    def collection(self, name):
+        return Query(self, name)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def batch(self):
+        return WriteBatch()
+
+    def transaction(self):
+        return WriteBatch()
+
+    async def get_all(self, references):
+        for reference in references:
+            yield await reference.get()
+
+
+def transactional(fn):
+    async def run(transaction):
+        result = await fn(transaction)
+        await transaction.commit()
+        return result
+    return run
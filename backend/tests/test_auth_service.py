@@ -0,0 +1,118 @@
+# backend/tests/test_auth_service.py
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import auth as auth_api
+from app.config.settings import settings
+from app.core.cache import TTLCache
+from app.services import auth_service
+from app.services.auth_service import get_current_user
+
+
+def _direct(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    """token -> claims that the (fake) Firebase verifier accepts; `tokens.verified` counts its calls."""
+    valid = {}
+    verified = []
+
+    def verify_id_token(token):
+        verified.append(token)
+        if token not in valid:
+            raise auth_service.auth.InvalidIdTokenError("bad token")
+        return dict(valid[token])
+
+    monkeypatch.setattr(auth_service, "call_firebase_auth", _direct)
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", verify_id_token)
+    monkeypatch.setattr(auth_service, "_token_cache", TTLCache(maxsize=100, ttl=settings.AUTH_CACHE_TTL_SECONDS))
+    monkeypatch.setattr(auth_service, "_valid_after_ms", TTLCache(maxsize=100, ttl=3600))
+    monkeypatch.setattr(auth_service, "_ensure_revocation_refresher", lambda: None)
+
+    def issue(token, uid="u", lifetime=3600, age=10):
+        now = time.time()
+        valid[token] = {"uid": uid, "iat": int(now - age), "exp": now + lifetime}
+
+    issue.verified = verified
+    return issue
+
+
+def _verify(token):
+    return asyncio.run(auth_service.verify_token(token))
+
+
+def test_verified_claims_are_cached_by_token_hash(tokens):
+    tokens("secret-token")
+    assert _verify("secret-token")["uid"] == "u"
+    assert _verify("secret-token")["uid"] == "u"
+    assert tokens.verified == ["secret-token"]
+    assert list(auth_service._token_cache._data) == [hashlib.sha256(b"secret-token").hexdigest()]
+
+
+def test_cache_entry_never_outlives_the_token(tokens, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_CACHE_TTL_SECONDS", 300)
+    tokens("short", lifetime=5)
+    _verify("short")
+    (_, expires_at, _), = auth_service._token_cache._data.values()
+    assert expires_at - time.monotonic() <= 5
+
+    # An already expired token (accepted by a lenient verifier) is not cached at all.
+    tokens("expired", lifetime=-1)
+    _verify("expired")
+    assert len(auth_service._token_cache) == 1
+
+
+def test_revocation_watermark_rejects_a_cached_token(tokens):
+    tokens("token")
+    _verify("token")
+    auth_service.mark_tokens_revoked("u")
+    with pytest.raises(HTTPException) as rejected:
+        _verify("token")
+    assert rejected.value.status_code == 401
+    assert len(auth_service._token_cache) == 0
+
+    # A token issued after the revocation is fine.
+    tokens("new token", age=-1)
+    assert _verify("new token")["uid"] == "u"
+
+
+def test_disabled_and_deleted_users_revoke_every_token(monkeypatch):
+    def get_users(identifiers):
+        assert [identifier.uid for identifier in identifiers] == ["active", "disabled", "deleted"]
+        return SimpleNamespace(
+            users=[
+                SimpleNamespace(uid="active", disabled=False, tokens_valid_after_timestamp=1234),
+                SimpleNamespace(uid="disabled", disabled=True, tokens_valid_after_timestamp=1234),
+            ],
+            not_found=[SimpleNamespace(uid="deleted")],
+        )
+
+    monkeypatch.setattr(auth_service, "call_firebase_auth", _direct)
+    monkeypatch.setattr(auth_service.auth, "get_users", get_users)
+    assert auth_service._fetch_valid_after(["active", "disabled", "deleted"]) == {
+        "active": 1234, "disabled": float("inf"), "deleted": float("inf"),
+    }
+
+
+def test_logout_revokes_the_users_cached_tokens(tokens, monkeypatch):
+    revoked = []
+    monkeypatch.setattr(auth_api, "call_firebase_auth", _direct)
+    monkeypatch.setattr(auth_api.auth, "revoke_refresh_tokens", revoked.append)
+    tokens("token")
+    _verify("token")
+
+    app = FastAPI()
+    app.include_router(auth_api.router, prefix="/api/auth")
+    app.dependency_overrides[get_current_user] = lambda: {"uid": "u"}
+    assert TestClient(app).post("/api/auth/logout").status_code == 200
+    assert revoked == ["u"]
+    with pytest.raises(HTTPException):
+        _verify("token")
@@ -0,0 +1,223 @@
+# backend/tests/test_chat.py
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app import repositories
+from app.api import chat
+from app.config.settings import settings
+from app.core.context import set_user_context
+from app.models.message import ChatMessage
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services import langchain_service, memory_service, response_cache
+from app.services.fake_llm import FakeStreamingChatModel
+from app.services.llm_scheduler import LLMScheduler
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    memory_service._history_cache.clear()
+    response_cache._cache.clear()
+    monkeypatch.setattr(langchain_service, "_llm", FakeStreamingChatModel(time_to_first_token=0, tokens_per_second=1000, answer_tokens=3))
+    return repo
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """One slot and no waiting room, so a turn that needs the model while it is taken gets 429."""
+    scheduler = LLMScheduler(max_concurrent=1, max_per_user=1, max_waiting=0, max_waiting_per_user=0)
+    monkeypatch.setattr(chat, "scheduler", scheduler)
+    return scheduler
+
+
+async def _ask(repo, conversation_id, question):
+    set_user_context({"uid": "u"})
+    conversation = await repo.get_conversation(conversation_id)
+    ticket, pieces = await chat.start_turn("u", conversation, ChatMessage(conversation_id=conversation_id, message=question))
+    try:
+        return ticket, "".join([piece async for piece in pieces])
+    finally:
+        pieces.close()
+
+
+def test_cached_answer_needs_no_slot(repo, scheduler):
+    async def run():
+        first = await repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0})
+        second = await repo.create_conversation({"user_id": "u", "title": "b", "message_count": 0})
+        ticket, answer = await _ask(repo, first, "hi")
+        assert ticket is not None and answer
+        assert scheduler.stats()["active"] == 0
+
+        # Someone else holds the only slot: the same prompt still gets its cached answer...
+        scheduler.submit("someone else")
+        ticket, cached = await _ask(repo, second, "hi")
+        assert ticket is None and cached == answer
+        # ...while a prompt that needs the model is turned away.
+        with pytest.raises(HTTPException) as rejected:
+            await _ask(repo, second, "something new")
+        assert rejected.value.status_code == 429
+        assert scheduler.stats()["admitted"] == 2
+
+    asyncio.run(run())
+
+
+def test_slot_is_released_when_the_model_is_done(repo, scheduler):
+    async def run():
+        conversation_id = await repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0})
+        for question in ("one", "two"):
+            ticket, _ = await _ask(repo, conversation_id, question)
+            assert ticket.granted and not ticket.waiting
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(run())
+
+
+# --- WebSocket channel ---
+
+@pytest.fixture
+def ws(repo, monkeypatch):
+    """Opens /api/chat/ws with token "good" accepted for user "u" and "stale" accepted but expired."""
+    async def verify_token(token):
+        if token not in ("good", "stale"):
+            raise HTTPException(status_code=401, detail="Invalid token.")
+        return {"uid": "u", "exp": time.time() + (3600 if token == "good" else -1)}
+
+    monkeypatch.setattr(chat, "verify_token", verify_token)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    with TestClient(app) as client:
+        yield lambda: client.websocket_connect("/api/chat/ws")
+
+
+def _authenticated(socket, token="good"):
+    socket.send_json({"type": "auth", "token": token})
+    assert socket.receive_json() == {"type": "ready", "uid": "u"}
+    return socket
+
+
+def _until(socket, kind):
+    """The frames received up to and including the first one of type `kind`."""
+    frames = [socket.receive_json()]
+    while frames[-1]["type"] != kind:
+        frames.append(socket.receive_json())
+    return frames
+
+
+@pytest.mark.parametrize("first", [{"type": "ping"}, {"type": "auth", "token": "bad"}])
+def test_connection_must_start_with_a_valid_auth_frame(ws, first):
+    with ws() as socket:
+        socket.send_json(first)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_turn_streams_chunks_then_done(repo, ws):
+    conversation_id = asyncio.run(repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0}))
+    with ws() as socket:
+        _authenticated(socket).send_json({"type": "message", "id": "t1", "conversation_id": conversation_id, "message": "hi"})
+        frames = _until(socket, "done")
+    assert frames[-1] == {"type": "done", "id": "t1"}
+    chunks = frames[:-1]
+    assert chunks and all(frame["type"] == "chunk" and frame["id"] == "t1" for frame in chunks)
+    assert all(frame["conversation_id"] == conversation_id for frame in chunks)
+    stored = asyncio.run(repo.list_messages(conversation_id))
+    assert stored[-1]["content"] == "".join(frame["content"] for frame in chunks)
+
+
+def test_cancel_stops_a_running_turn(repo, ws, monkeypatch):
+    monkeypatch.setattr(langchain_service, "_llm", FakeStreamingChatModel(time_to_first_token=0, tokens_per_second=20, answer_tokens=100))
+    conversation_id = asyncio.run(repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0}))
+    with ws() as socket:
+        _authenticated(socket).send_json({"type": "message", "id": "t1", "conversation_id": conversation_id, "message": "hi"})
+        assert socket.receive_json()["type"] == "chunk"
+        socket.send_json({"type": "cancel", "id": "t1"})
+        frames = _until(socket, "cancelled")
+    assert frames[-1] == {"type": "cancelled", "id": "t1"}
+    assert all(frame["type"] == "chunk" for frame in frames[:-1])
+
+
+def test_ping_is_answered(ws):
+    with ws() as socket:
+        _authenticated(socket).send_json({"type": "ping"})
+        assert socket.receive_json() == {"type": "pong"}
+
+
+def test_bad_frames_get_error_frames(repo, ws):
+    foreign = asyncio.run(repo.create_conversation({"user_id": "someone else", "title": "a", "message_count": 0}))
+    with ws() as socket:
+        _authenticated(socket)
+        socket.send_text("not json")
+        assert socket.receive_json() == {"type": "error", "id": None, "detail": "Frames must be JSON objects."}
+        socket.send_json({"type": "shout", "id": "x"})
+        assert socket.receive_json() == {"type": "error", "id": "x", "detail": "Unknown frame type: 'shout'"}
+        socket.send_json({"type": "message", "conversation_id": foreign, "message": "hi"})
+        assert socket.receive_json() == {"type": "error", "id": None, "detail": "A message needs a string id."}
+        socket.send_json({"type": "message", "id": "t1", "conversation_id": foreign, "message": "hi"})
+        frame = socket.receive_json()
+        assert frame["type"] == "error" and frame["id"] == "t1"
+        # The connection is still usable.
+        socket.send_json({"type": "ping"})
+        assert socket.receive_json() == {"type": "pong"}
+
+
+def test_full_queue_error_carries_retry_after(repo, ws, scheduler):
+    conversation_id = asyncio.run(repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0}))
+    scheduler.submit("someone else")
+    with ws() as socket:
+        _authenticated(socket).send_json({"type": "message", "id": "t1", "conversation_id": conversation_id, "message": "hi"})
+        frame = socket.receive_json()
+    assert frame["type"] == "error" and frame["id"] == "t1" and frame["retry_after"] >= 1
+
+
+def test_expired_token_needs_a_new_auth_frame(repo, ws):
+    conversation_id = asyncio.run(repo.create_conversation({"user_id": "u", "title": "a", "message_count": 0}))
+    message = {"type": "message", "id": "t1", "conversation_id": conversation_id, "message": "hi"}
+    with ws() as socket:
+        _authenticated(socket, "stale").send_json(message)
+        assert socket.receive_json() == {"type": "error", "id": "t1", "detail": "Token expired, send a new auth frame."}
+        _authenticated(socket).send_json(message)
+        assert _until(socket, "done")[-1] == {"type": "done", "id": "t1"}
+        # A failed re-auth ends the session.
+        socket.send_json({"type": "auth", "token": "bad"})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_outbox_makes_turns_wait_for_a_slow_client(monkeypatch):
+    class SlowSocket:
+        def __init__(self):
+            self.sent = []
+            self.reading = asyncio.Event()
+
+        async def send_text(self, text):
+            await self.reading.wait()
+            self.sent.append(text)
+
+    async def run():
+        monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 2)
+        socket = SlowSocket()
+        channel = chat._Channel(socket)
+        writer = asyncio.get_running_loop().create_task(channel.writer())
+        # One frame is held by the writer, two fill the outbox...
+        for number in range(3):
+            await channel.send({"type": "chunk", "n": number})
+        # ...and the next sender waits instead of buffering.
+        blocked = asyncio.ensure_future(channel.send({"type": "chunk", "n": 3}))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        socket.reading.set()
+        await blocked
+        while len(socket.sent) < 4:
+            await asyncio.sleep(0)
+        writer.cancel()
+        return [json.loads(text)["n"] for text in socket.sent]
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
@@ -0,0 +1,147 @@
+# backend/tests/test_conversation_api.py
+import asyncio
+import datetime
+import json
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+
+from app import repositories
+from app.api import conversation
+from app.config.settings import settings
+from app.core.cursors import encode_cursor
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services.auth_service import get_current_user
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    return repo
+
+
+@pytest.fixture
+def client(repo):
+    def current_user(x_user: str = Header("u")):
+        return {"uid": x_user}
+
+    app = FastAPI()
+    app.include_router(conversation.router, prefix="/api/conversations")
+    app.dependency_overrides[get_current_user] = current_user
+    with TestClient(app) as client:
+        yield client
+
+
+def _conversation(repo, messages=0, user_id="u"):
+    async def run():
+        now = datetime.datetime.now(datetime.timezone.utc)
+        conversation_id = await repo.create_conversation({"user_id": user_id, "title": "t", "message_count": 0, "updated_at": now})
+        if messages:
+            await repo.add_messages(conversation_id, [("human", f"m{number}") for number in range(messages)])
+        return conversation_id
+    return asyncio.run(run())
+
+
+def _lines(response):
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+# --- Messages (NDJSON) ---
+
+def test_messages_are_paged_newest_first(repo, client):
+    conversation_id = _conversation(repo, messages=5)
+    url = f"/api/conversations/{conversation_id}/messages"
+
+    first = _lines(client.get(url, params={"limit": 2}))
+    assert [line["content"] for line in first[:-1]] == ["m4", "m3"]
+    assert first[-1]["type"] == "end" and first[-1]["next_cursor"]
+
+    second = _lines(client.get(url, params={"limit": 2, "cursor": first[-1]["next_cursor"]}))
+    assert [line["content"] for line in second[:-1]] == ["m2", "m1"]
+
+    last = _lines(client.get(url, params={"limit": 2, "cursor": second[-1]["next_cursor"]}))
+    assert [line["content"] for line in last[:-1]] == ["m0"]
+    assert last[-1] == {"type": "end", "next_cursor": None}
+
+
+def test_page_that_ends_exactly_at_the_start_has_no_cursor(repo, client):
+    conversation_id = _conversation(repo, messages=2)
+    lines = _lines(client.get(f"/api/conversations/{conversation_id}/messages", params={"limit": 2}))
+    assert [line["type"] for line in lines] == ["message", "message", "end"]
+    assert lines[-1]["next_cursor"] is None
+
+
+def test_messages_of_a_foreign_conversation_are_not_found(repo, client):
+    conversation_id = _conversation(repo, messages=1, user_id="someone else")
+    assert client.get(f"/api/conversations/{conversation_id}/messages").status_code == 404
+    assert client.get("/api/conversations/unknown/messages").status_code == 404
+
+
+def test_malformed_message_cursor_is_rejected(repo, client):
+    conversation_id = _conversation(repo, messages=1)
+    response = client.get(f"/api/conversations/{conversation_id}/messages", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+# --- Changes ---
+
+def _changes(client, since, **params):
+    response = client.get("/api/conversations/changes", params={"since": since, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _since(updated_at, conversation_id=None):
+    return encode_cursor({"updated_at": updated_at, "id": conversation_id})
+
+
+def test_changes_after_the_list_sync_cursor(repo, client):
+    _conversation(repo)
+    sync_cursor = client.get("/api/conversations/").json()["sync_cursor"]
+    new = _conversation(repo)
+
+    changes = _changes(client, sync_cursor)
+    # The cursor lags by the sync skew, so recent changes may be sent again.
+    assert new in [item["id"] for item in changes["items"]]
+    assert not changes["has_more"] and not changes["reset"]
+    # The returned cursor is usable (and also lags).
+    assert new in [item["id"] for item in _changes(client, changes["sync_cursor"])["items"]]
+
+
+def test_deletions_come_back_as_tombstones(repo, client):
+    conversation_id = _conversation(repo)
+    since = _since(datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1))
+    asyncio.run(repo.tombstone_conversation(conversation_id))
+
+    items = _changes(client, since)["items"]
+    assert [(item["id"], item["deleted"], item["title"]) for item in items] == [(conversation_id, True, None)]
+
+
+def test_cursor_older_than_the_retention_resets(repo, client, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_TOMBSTONE_RETENTION_DAYS", 7)
+    _conversation(repo)
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    stale = _changes(client, _since(now - datetime.timedelta(days=8)))
+    assert stale["reset"] and stale["items"] == []
+    # The fresh cursor is served incrementally.
+    assert not _changes(client, stale["sync_cursor"])["reset"]
+    assert len(_changes(client, _since(now - datetime.timedelta(days=6)))["items"]) == 1
+
+
+def test_changes_are_paged_with_has_more(repo, client):
+    ids = [_conversation(repo) for _ in range(3)]
+    since = _since(datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1))
+
+    first = _changes(client, since, limit=2)
+    assert first["has_more"] and len(first["items"]) == 2
+    second = _changes(client, first["sync_cursor"], limit=2)
+    assert not second["has_more"]
+    assert sorted(item["id"] for item in first["items"] + second["items"]) == sorted(ids)
+
+
+def test_malformed_changes_cursor_is_rejected(repo, client):
+    assert client.get("/api/conversations/changes", params={"since": encode_cursor({"id": None})}).status_code == 400
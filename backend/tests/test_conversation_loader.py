@@ -0,0 +1,72 @@
+# backend/tests/test_conversation_loader.py
+import asyncio
+
+import pytest
+
+from app import repositories
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services.conversation_loader import ConversationLoader
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    return repo
+
+
+@pytest.fixture
+def fetches(repo, monkeypatch):
+    """The id lists passed to `get_conversations`, each of which takes a moment to answer."""
+    calls = []
+    get_conversations = repo.get_conversations
+
+    async def slow_get_conversations(conversation_ids):
+        calls.append(sorted(conversation_ids))
+        await asyncio.sleep(0.01)
+        return await get_conversations(conversation_ids)
+
+    monkeypatch.setattr(repo, "get_conversations", slow_get_conversations)
+    return calls
+
+
+def test_lookups_of_one_tick_share_a_fetch(repo, fetches):
+    async def run():
+        first = await repo.create_conversation({"user_id": "u", "title": "a"})
+        second = await repo.create_conversation({"user_id": "u", "title": "b"})
+        loader = ConversationLoader()
+        docs = await asyncio.gather(loader.load(first), loader.load(second), loader.load(first))
+        return first, second, docs
+
+    first, second, docs = asyncio.run(run())
+    assert fetches == [sorted([first, second])]
+    assert [doc["title"] for doc in docs] == ["a", "b", "a"]
+
+
+def test_lookup_during_a_fetch_awaits_it(repo, fetches):
+    async def run():
+        conversation_id = await repo.create_conversation({"user_id": "u", "title": "a"})
+        loader = ConversationLoader()
+        first = asyncio.ensure_future(loader.load(conversation_id))
+        # Past the dispatch, into the datastore round trip.
+        await asyncio.sleep(0.005)
+        assert not first.done()
+        second = await loader.load(conversation_id)
+        return conversation_id, await first, second
+
+    conversation_id, first, second = asyncio.run(run())
+    assert fetches == [[conversation_id]]
+    assert first == second
+
+
+def test_cancelled_caller_does_not_fail_the_others(repo, fetches):
+    async def run():
+        conversation_id = await repo.create_conversation({"user_id": "u", "title": "a"})
+        loader = ConversationLoader()
+        cancelled = asyncio.ensure_future(loader.load(conversation_id))
+        other = asyncio.ensure_future(loader.load(conversation_id))
+        await asyncio.sleep(0.005)
+        cancelled.cancel()
+        return await other
+
+    assert asyncio.run(run())["title"] == "a"
@@ -0,0 +1,28 @@
+# backend/tests/test_cursors.py
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.cursors import decode_cursor, encode_cursor
+
+
+def test_positions_round_trip_with_their_timezone():
+    position = {"updated_at": datetime.datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone(datetime.timedelta(hours=2))), "id": "abc"}
+    cursor = encode_cursor(position)
+    assert decode_cursor(cursor) == position
+    # Opaque and URL-safe.
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+# Not base64, not JSON, and JSON that is not an object ([1,2]).
+@pytest.mark.parametrize("cursor", ["!!!", "Z2FyYmFnZQ", "WzEsMl0"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as rejected:
+        decode_cursor(cursor)
+    assert rejected.value.status_code == 400
+
+
+def test_only_json_and_datetimes_can_be_encoded():
+    with pytest.raises(TypeError):
+        encode_cursor({"id": object()})
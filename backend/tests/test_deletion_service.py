@@ -0,0 +1,227 @@
+# backend/tests/test_deletion_service.py
+import asyncio
+import datetime
+import time
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+
+from app import repositories
+from app.api import conversation
+from app.config.settings import settings
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services import deletion_service, memory_service
+from app.services.auth_service import get_current_user
+from app.services.memory_service import FirestoreChatMessageHistory
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    monkeypatch.setattr(deletion_service, "_jobs", deletion_service.TTLCache(maxsize=1000))
+    memory_service._history_cache.clear()
+    return repo
+
+
+@pytest.fixture
+def deleted_batches(repo, monkeypatch):
+    """The sizes of the `delete_messages` batches, and the most that ran at once."""
+    monkeypatch.setattr(settings, "DELETE_BATCH_SIZE", 10)
+    monkeypatch.setattr(settings, "DELETE_CONCURRENCY", 2)
+    record = {"sizes": [], "running": 0, "most_running": 0}
+    delete_messages = repo.delete_messages
+
+    async def slow_delete_messages(message_ids):
+        record["running"] += 1
+        record["most_running"] = max(record["most_running"], record["running"])
+        await asyncio.sleep(0.01)
+        await delete_messages(message_ids)
+        record["sizes"].append(len(message_ids))
+        record["running"] -= 1
+
+    monkeypatch.setattr(repo, "delete_messages", slow_delete_messages)
+    return record
+
+
+@pytest.fixture
+def client(repo):
+    def current_user(x_user: str = Header("u")):
+        return {"uid": x_user}
+
+    app = FastAPI()
+    app.include_router(conversation.router, prefix="/api/conversations")
+    app.dependency_overrides[get_current_user] = current_user
+    with TestClient(app) as client:
+        yield client
+
+
+def _conversation(repo, messages=0, user_id="u"):
+    async def run():
+        conversation_id = await repo.create_conversation({"user_id": user_id, "title": "t", "message_count": 0})
+        if messages:
+            await repo.add_messages(conversation_id, [("human", f"m{number}") for number in range(messages)])
+        return conversation_id
+    return asyncio.run(run())
+
+
+def _message_count(repo, conversation_id):
+    return len(asyncio.run(repo.list_messages(conversation_id)))
+
+
+def _wait_for_deletion(client, conversation_id):
+    for _ in range(200):
+        body = client.get(f"/api/conversations/{conversation_id}/deletion").json()
+        if body["status"] != "running":
+            return body
+        time.sleep(0.01)
+    raise AssertionError("purge did not finish")
+
+
+def test_bulk_delete_runs_bounded_batches(repo, deleted_batches):
+    conversation_id = _conversation(repo, messages=45)
+    deleted = asyncio.run(deletion_service.bulk_delete_messages(conversation_id))
+    assert deleted == 45
+    assert sorted(deleted_batches["sizes"]) == [5, 10, 10, 10, 10]
+    assert deleted_batches["most_running"] == 2
+    assert _message_count(repo, conversation_id) == 0
+
+
+def test_sync_clear_uses_the_bulk_delete(repo, deleted_batches):
+    conversation_id = _conversation(repo, messages=25)
+    FirestoreChatMessageHistory(conversation_id, "u").clear()
+    assert sorted(deleted_batches["sizes"]) == [5, 10, 10]
+    assert _message_count(repo, conversation_id) == 0
+
+
+def test_delete_tombstones_at_once_and_purges_in_the_background(repo, client, deleted_batches):
+    conversation_id = _conversation(repo, messages=25)
+    kept_id = _conversation(repo, messages=1)
+
+    response = client.delete(f"/api/conversations/{conversation_id}")
+    assert response.status_code == 202
+    assert response.json()["status"] == "running"
+    # Gone for the user before its messages are.
+    assert [item["id"] for item in client.get("/api/conversations/").json()["items"]] == [kept_id]
+    assert client.get(f"/api/conversations/{conversation_id}/messages").status_code == 404
+
+    status = _wait_for_deletion(client, conversation_id)
+    assert (status["status"], status["deleted_messages"]) == ("done", 25)
+    assert _message_count(repo, conversation_id) == 0
+    assert _message_count(repo, kept_id) == 1
+    assert asyncio.run(repo.get_conversation(conversation_id))["purged_at"] is not None
+
+
+def test_deletion_status_without_a_job_on_this_worker(repo, client):
+    tombstoned = _conversation(repo)
+    purged = _conversation(repo)
+    asyncio.run(repo.tombstone_conversation(tombstoned))
+    asyncio.run(repo.tombstone_conversation(purged))
+    asyncio.run(repo.mark_conversation_purged(purged))
+
+    assert client.get(f"/api/conversations/{tombstoned}/deletion").json()["status"] == "running"
+    assert client.get(f"/api/conversations/{purged}/deletion").json()["status"] == "done"
+    assert client.get("/api/conversations/unknown/deletion").json()["status"] == "done"
+
+
+def test_deletion_status_is_private_and_only_for_deletions(repo, client):
+    conversation_id = _conversation(repo)
+    assert client.get(f"/api/conversations/{conversation_id}/deletion").status_code == 404
+    asyncio.run(repo.tombstone_conversation(conversation_id))
+    other = client.get(f"/api/conversations/{conversation_id}/deletion", headers={"x-user": "someone else"})
+    assert other.status_code == 404
+
+
+def test_resume_finishes_tombstoned_conversations_and_drops_expired_ones(repo, monkeypatch):
+    unfinished = _conversation(repo, messages=3)
+    expired = _conversation(repo)
+    live = _conversation(repo, messages=2)
+    retention = datetime.timedelta(days=settings.CONVERSATION_TOMBSTONE_RETENTION_DAYS)
+
+    async def run():
+        await repo.tombstone_conversation(unfinished)
+        await repo.tombstone_conversation(expired)
+        await repo.update_conversation(expired, {
+            "purged_at": datetime.datetime.now(datetime.timezone.utc) - retention - datetime.timedelta(hours=1),
+        })
+        await deletion_service.resume_pending_purges()
+        await asyncio.gather(*deletion_service._tasks)
+    asyncio.run(run())
+
+    assert deletion_service.get_job(unfinished).status == "done"
+    assert _message_count(repo, unfinished) == 0
+    assert asyncio.run(repo.get_conversation(unfinished))["purged_at"] is not None
+    assert asyncio.run(repo.get_conversation(expired)) is None
+    assert _message_count(repo, live) == 2
+
+
+def test_purge_lease_keeps_other_workers_out_until_it_expires(repo, monkeypatch):
+    conversation_id = _conversation(repo)
+    live = _conversation(repo)
+
+    async def run():
+        await repo.tombstone_conversation(conversation_id)
+        assert await deletion_service.claim_purge(conversation_id)
+        # The holder may renew its lease.
+        assert await deletion_service.claim_purge(conversation_id)
+        assert not await deletion_service.claim_purge(live)
+
+        monkeypatch.setattr(deletion_service, "_WORKER_ID", "another worker")
+        assert not await deletion_service.claim_purge(conversation_id)
+        await repo.update_conversation(conversation_id, {
+            "purge_lease_until": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1),
+        })
+        assert await deletion_service.claim_purge(conversation_id)
+        assert (await repo.get_conversation(conversation_id))["purge_lease_owner"] == "another worker"
+
+        await repo.mark_conversation_purged(conversation_id)
+        assert not await deletion_service.claim_purge(conversation_id)
+    asyncio.run(run())
+
+
+def test_resume_leaves_purges_leased_by_another_worker(repo, monkeypatch):
+    leased = _conversation(repo, messages=2)
+    abandoned = _conversation(repo, messages=2)
+
+    async def run():
+        await repo.tombstone_conversation(leased)
+        await repo.tombstone_conversation(abandoned)
+        with monkeypatch.context() as other_worker:
+            other_worker.setattr(deletion_service, "_WORKER_ID", "another worker")
+            await deletion_service.claim_purge(leased)
+            await deletion_service.claim_purge(abandoned)
+        await repo.update_conversation(abandoned, {
+            "purge_lease_until": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1),
+        })
+        await deletion_service.resume_pending_purges()
+        await asyncio.gather(*deletion_service._tasks)
+    asyncio.run(run())
+
+    assert deletion_service.get_job(leased) is None
+    assert _message_count(repo, leased) == 2
+    assert deletion_service.get_job(abandoned).status == "done"
+    assert _message_count(repo, abandoned) == 0
+
+
+def test_running_purge_renews_its_lease(repo, deleted_batches, monkeypatch):
+    monkeypatch.setattr(settings, "PURGE_LEASE_SECONDS", 0.03)
+    conversation_id = _conversation(repo, messages=60)
+    renewals = []
+    claim_purge = deletion_service.claim_purge
+
+    async def counting_claim_purge(conversation_id, repo=None):
+        renewals.append(conversation_id)
+        return await claim_purge(conversation_id, repo)
+
+    async def run():
+        await repo.tombstone_conversation(conversation_id)
+        monkeypatch.setattr(deletion_service, "claim_purge", counting_claim_purge)
+        job = await deletion_service.start_purge(conversation_id)
+        await asyncio.gather(*deletion_service._tasks)
+        return job
+    job = asyncio.run(run())
+
+    assert job.status == "done"
+    # The initial claim, then renewals while the slow batches ran.
+    assert len(renewals) >= 2
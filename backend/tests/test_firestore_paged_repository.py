@@ -0,0 +1,40 @@
+# backend/tests/test_firestore_paged_repository.py
+"""What only the paged layout does; the shared behaviour is in test_repository_contract.py."""
+import asyncio
+import datetime
+
+import pytest
+from google.cloud import firestore
+
+from app.repositories.firestore_paged_repository import PagedFirestoreRepository
+from tests.fake_firestore import FakeFirestore, transactional
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    monkeypatch.setattr(firestore, "async_transactional", transactional)
+    return PagedFirestoreRepository(FakeFirestore(), page_size=5)
+
+
+def _conversation(repo):
+    return asyncio.run(repo.create_conversation({"user_id": "u", "title": "t", "message_count": 0}))
+
+
+def test_history_is_read_a_page_at_a_time(repo):
+    conversation_id = _conversation(repo)
+    for turn in range(6):
+        asyncio.run(repo.add_messages(conversation_id, [("human", f"q{turn}"), ("ai", f"a{turn}")]))
+    repo._db.reads = 0
+    messages = asyncio.run(repo.list_messages(conversation_id))
+    assert [message["seq"] for message in messages] == list(range(12))
+    assert repo._db.reads == 3
+
+
+def test_importing_older_messages_never_moves_a_page_back_in_time(repo):
+    conversation_id = _conversation(repo)
+    stored = asyncio.run(repo.add_messages(conversation_id, [("human", "new")]))
+    older = stored[0]["timestamp"] - datetime.timedelta(days=1)
+    asyncio.run(repo.import_messages(conversation_id, [{"role": "human", "content": "old", "timestamp": older}]))
+
+    tail = asyncio.run(repo.list_messages(conversation_id, since=stored[0]["timestamp"]))
+    assert [message["content"] for message in tail] == ["new"]
@@ -0,0 +1,91 @@
+# backend/tests/test_history_policy.py
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app import repositories
+from app.config.settings import settings
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services import history_policy, langchain_service, memory_service
+from app.services.fake_llm import FakeStreamingChatModel
+from app.services.llm_scheduler import LLMScheduler
+from app.services.memory_service import FirestoreChatMessageHistory
+
+
+def _conversation(count):
+    messages = [(HumanMessage if i % 2 == 0 else AIMessage)(content=f"message {i}") for i in range(count)]
+    return messages, [3] * count
+
+
+def test_unsummarized_messages_older_than_the_window_are_kept():
+    count = 2 * settings.HISTORY_RECENT_TURNS + 5
+    messages, token_counts = _conversation(count)
+    selected = history_policy.select_history(messages, token_counts, None, 0, first_verbatim=0)
+    assert selected == messages
+
+
+def test_summary_replaces_only_the_messages_it_covers():
+    count = 2 * settings.HISTORY_RECENT_TURNS + 5
+    messages, token_counts = _conversation(count)
+    # Covers fewer messages than have left the recent window.
+    selected = history_policy.select_history(messages, token_counts, "earlier", 0, first_verbatim=3)
+    assert isinstance(selected[0], SystemMessage)
+    assert selected[1:] == messages[3:]
+
+
+def test_budget_drops_the_oldest_messages_first(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_TOKEN_BUDGET", 9)
+    messages, token_counts = _conversation(10)
+    selected = history_policy.select_history(messages, token_counts, None, 0, first_verbatim=0)
+    assert selected == messages[-3:]
+
+
+def test_default_keeps_only_the_recent_window():
+    messages, token_counts = _conversation(20)
+    selected = history_policy.select_history(messages, token_counts, None, 0, recent_turns=2)
+    assert selected == messages[-4:]
+
+
+@pytest.fixture
+def refresh(tmp_path, monkeypatch):
+    """Refreshes the summary of a conversation with 6 messages, 4 of them old enough to fold in."""
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    memory_service._history_cache.clear()
+    monkeypatch.setattr(settings, "HISTORY_RECENT_TURNS", 1)
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_MIN_MESSAGES", 2)
+    monkeypatch.setattr(langchain_service, "_llm", FakeStreamingChatModel(time_to_first_token=0, tokens_per_second=1000, answer_tokens=3))
+
+    def run(scheduler):
+        monkeypatch.setattr(history_policy, "scheduler", scheduler)
+
+        async def refresh():
+            conversation_id = await repo.create_conversation({"user_id": "u", "title": "t", "message_count": 0})
+            await repo.add_messages(conversation_id, [("human", f"m{number}") for number in range(6)])
+            history = FirestoreChatMessageHistory(conversation_id, "u", await repo.get_conversation(conversation_id))
+            await history.aget_messages()
+            history_policy.schedule_summary_refresh(history, langchain_service.llm)
+            await asyncio.gather(*history_policy._tasks)
+            return await repo.get_conversation(conversation_id)
+        return asyncio.run(refresh())
+    return run
+
+
+def _scheduler(**limits):
+    return LLMScheduler(**{"max_concurrent": 1, "max_per_user": 1, "max_waiting": 10, "max_waiting_per_user": 10, **limits})
+
+
+def test_summary_refresh_takes_a_scheduler_slot(refresh):
+    scheduler = _scheduler()
+    conversation = refresh(scheduler)
+    assert conversation["summary"] and conversation["summary_message_count"] == 4
+    assert scheduler.stats()["admitted"] == 1 and scheduler.stats()["active"] == 0
+
+
+def test_summary_refresh_is_postponed_when_the_queue_is_full(refresh):
+    scheduler = _scheduler(max_waiting=0, max_waiting_per_user=0)
+    scheduler.submit("someone else")
+    conversation = refresh(scheduler)
+    assert conversation["summary"] is None
+    assert scheduler.stats()["rejected"] == 1
@@ -0,0 +1,90 @@
+# backend/tests/test_llm_scheduler.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.services.llm_scheduler import LLMScheduler, QueueTimeout
+
+
+def _scheduler(**limits) -> LLMScheduler:
+    return LLMScheduler(**{"max_concurrent": 1, "max_per_user": 1, "max_waiting": 10, "max_waiting_per_user": 10, **limits})
+
+
+def test_freed_slots_go_round_robin_across_users():
+    scheduler = _scheduler()
+    running = scheduler.submit("a")
+    # A burst from one user, then single turns from two others.
+    queued = [scheduler.submit(user) for user in ("a", "a", "a", "b", "c")]
+    assert running.granted and not any(ticket.granted for ticket in queued)
+
+    order = []
+    current = running
+    for _ in queued:
+        current.release()
+        current = next(ticket for ticket in queued if ticket.granted and ticket not in order)
+        order.append(current)
+    assert [ticket.user_id for ticket in order] == ["a", "b", "c", "a", "a"]
+
+
+def test_position_counts_the_turns_granted_before_it():
+    scheduler = _scheduler()
+    scheduler.submit("a")
+    a2, a3 = scheduler.submit("a"), scheduler.submit("a")
+    b1 = scheduler.submit("b")
+    assert [a2.position(), a3.position(), b1.position()] == [0, 2, 1]
+
+
+def test_full_waiting_room_is_rejected_with_retry_after():
+    scheduler = _scheduler(max_waiting=2, max_waiting_per_user=1)
+    scheduler.submit("a")
+    scheduler.submit("b")
+    # A user's own bound applies before the global one.
+    with pytest.raises(HTTPException) as per_user:
+        scheduler.submit("b")
+    scheduler.submit("c")
+    with pytest.raises(HTTPException) as total:
+        scheduler.submit("d")
+    for rejection in (per_user.value, total.value):
+        assert rejection.status_code == 429
+        assert int(rejection.headers["Retry-After"]) >= 1
+    assert scheduler.stats()["rejected"] == 2
+
+
+def test_retry_after_grows_with_the_queue():
+    scheduler = _scheduler(max_concurrent=2)
+    scheduler._service_seconds = 10.0
+    assert scheduler.retry_after() == 5
+    scheduler._waiting = 3
+    assert scheduler.retry_after() == 20
+
+
+def test_timed_out_turn_leaves_the_queue_and_frees_nothing_else(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_QUEUE_TIMEOUT_SECONDS", 0.01)
+    scheduler = _scheduler()
+
+    async def run():
+        running = scheduler.submit("a")
+        waiting = scheduler.submit("b")
+        with pytest.raises(QueueTimeout):
+            await waiting.acquire()
+        assert not waiting.waiting
+        later = scheduler.submit("c")
+        running.release()
+        return later
+
+    later = asyncio.run(run())
+    # The slot went to the next turn in line, not to the expired one.
+    assert later.granted
+    stats = scheduler.stats()
+    assert (stats["timed_out"], stats["waiting"], stats["active"]) == (1, 0, 1)
+
+
+def test_release_is_idempotent():
+    scheduler = _scheduler()
+    ticket = scheduler.submit("a")
+    ticket.release()
+    ticket.release()
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.submit("a").granted
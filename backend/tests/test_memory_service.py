@@ -0,0 +1,121 @@
+# backend/tests/test_memory_service.py
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app import repositories
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.services import memory_service
+from app.services.deletion_service import bulk_delete_messages
+from app.services.memory_service import FirestoreChatMessageHistory
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(repositories, "_repository", repo)
+    memory_service._history_cache.clear()
+    return repo
+
+
+def _turn(repo, conversation_id, *contents):
+    """A chat turn on this worker: the request loads the conversation, then reads and writes the history."""
+    async def run():
+        history = FirestoreChatMessageHistory(conversation_id, "u", await repo.get_conversation(conversation_id))
+        messages = await history.aget_messages()
+        if contents:
+            await history.aadd_messages([HumanMessage(content=contents[0]), AIMessage(content=contents[1])])
+        return [message.content for message in messages], history
+    return asyncio.run(run())
+
+
+def _conversation(repo):
+    return asyncio.run(repo.create_conversation({"user_id": "u", "title": "t", "message_count": 0}))
+
+
+def test_picks_up_messages_written_by_another_worker(repo):
+    conversation_id = _conversation(repo)
+    _turn(repo, conversation_id, "q1", "a1")
+    # Another worker answers a turn; this worker's cache never saw it.
+    asyncio.run(repo.add_messages(conversation_id, [("human", "q2"), ("ai", "a2")]))
+    messages, _ = _turn(repo, conversation_id)
+    assert messages == ["q1", "a1", "q2", "a2"]
+
+
+def test_rereads_a_history_cleared_by_another_worker(repo):
+    conversation_id = _conversation(repo)
+    _turn(repo, conversation_id, "q1", "a1")
+    _turn(repo, conversation_id)
+
+    # Another worker clears the conversation and the user writes again there.
+    async def clear_elsewhere():
+        await bulk_delete_messages(conversation_id)
+        await repo.reset_conversation_preview(conversation_id)
+        await repo.add_messages(conversation_id, [("human", "q2"), ("ai", "a2")])
+    asyncio.run(clear_elsewhere())
+
+    messages, _ = _turn(repo, conversation_id)
+    assert messages == ["q2", "a2"]
+
+
+def test_adopts_a_summary_saved_by_another_worker(repo):
+    conversation_id = _conversation(repo)
+    _turn(repo, conversation_id, "q1", "a1")
+    asyncio.run(repo.update_conversation(conversation_id, {"summary": "earlier", "summary_message_count": 2}))
+    _, history = _turn(repo, conversation_id)
+    assert history.prompt_state.summary == "earlier"
+    assert history.prompt_state.summary_message_count == 2
+
+
+def test_skips_the_tail_fetch_when_the_cache_is_current(repo, monkeypatch):
+    conversation_id = _conversation(repo)
+    _turn(repo, conversation_id, "q1", "a1")
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("tail fetched")
+    monkeypatch.setattr(repo, "list_messages", fail)
+    messages, _ = _turn(repo, conversation_id)
+    assert messages == ["q1", "a1"]
+
+
+def test_sync_api_reads_writes_and_clears(repo):
+    conversation_id = _conversation(repo)
+    history = FirestoreChatMessageHistory(conversation_id, "u")
+    history.add_message(HumanMessage(content="q1"))
+    history.add_message(AIMessage(content="a1"))
+    assert [message.content for message in history.messages] == ["q1", "a1"]
+
+    history.clear()
+    assert history.messages == []
+    conversation = asyncio.run(repo.get_conversation(conversation_id))
+    assert conversation["message_count"] == 0 and conversation["cleared_at"] is not None
+
+
+def test_sync_api_checks_ownership(repo):
+    conversation_id = _conversation(repo)
+    with pytest.raises(PermissionError):
+        FirestoreChatMessageHistory(conversation_id, "someone else").messages
+
+
+def test_summary_is_not_saved_over_a_cleared_history(repo):
+    conversation_id = _conversation(repo)
+    _, history = _turn(repo, conversation_id, "q1", "a1")
+    _turn(repo, conversation_id)
+    # Cleared (on another worker) while the summary was being written.
+    asyncio.run(bulk_delete_messages(conversation_id))
+    asyncio.run(repo.reset_conversation_preview(conversation_id))
+
+    assert not asyncio.run(history.asave_summary("stale", 2))
+    assert asyncio.run(repo.get_conversation(conversation_id))["summary"] is None
+
+
+def test_summary_never_replaces_one_that_covers_more(repo):
+    conversation_id = _conversation(repo)
+    _turn(repo, conversation_id, "q1", "a1")
+    _, history = _turn(repo, conversation_id, "q2", "a2")
+    assert asyncio.run(history.asave_summary("first two", 2))
+    asyncio.run(repo.update_conversation(conversation_id, {"summary": "all four", "summary_message_count": 4}))
+
+    assert not asyncio.run(history.asave_summary("first two again", 2))
+    assert asyncio.run(repo.get_conversation(conversation_id))["summary"] == "all four"
@@ -0,0 +1,35 @@
+# backend/tests/test_metrics.py
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import route_label
+
+
+def test_route_label_is_the_full_template_of_nested_includes():
+    labels = []
+
+    class RecordLabel:
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            await self.app(scope, receive, send)
+            if scope["type"] == "http":
+                labels.append(route_label(scope))
+
+    inner = APIRouter()
+
+    @inner.get("/{item_id}/details")
+    async def details(item_id: str):
+        return {}
+
+    outer = APIRouter()
+    outer.include_router(inner, prefix="/items")
+    app = FastAPI()
+    app.include_router(outer, prefix="/api")
+    app.add_middleware(RecordLabel)
+
+    client = TestClient(app)
+    client.get("/api/items/42/details")
+    client.get("/nowhere")
+    assert labels == ["/api/items/{item_id}/details", "unmatched"]
@@ -0,0 +1,123 @@
+# backend/tests/test_model_pool.py
+import asyncio
+from typing import Any, List
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.config.settings import settings
+from app.services import model_pool
+from app.services.fake_llm import FakeStreamingChatModel
+from app.services.model_pool import Backend, ModelPool
+
+# Backends that were cancelled while waiting for their first token.
+cancelled: List[str] = []
+
+
+class _CancellationRecordingModel(FakeStreamingChatModel):
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        try:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+        except asyncio.CancelledError:
+            cancelled.append(self.time_to_first_token)
+            raise
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_pool.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(settings, "MODEL_POOL_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "MODEL_POOL_COOLDOWN_SECONDS", 30.0)
+    return now
+
+
+def _backend() -> Backend:
+    return Backend("b", FakeStreamingChatModel())
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    backend = _backend()
+    backend.record_failure()
+    assert backend.available(clock[0])
+    backend.record_failure()
+    assert backend.state == Backend.OPEN
+    assert not backend.available(clock[0] + 29)
+
+
+def test_breaker_lets_one_trial_through_after_the_cooldown(clock):
+    backend = _backend()
+    backend.record_failure()
+    backend.record_failure()
+    clock[0] += 30
+    assert backend.available(clock[0])
+    assert backend.state == Backend.HALF_OPEN
+    backend.started()
+    # Only the one trial call while half-open.
+    assert not backend.available(clock[0])
+    backend.record_success(0.1)
+    assert backend.state == Backend.CLOSED
+    assert backend.available(clock[0])
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    backend = _backend()
+    backend.record_failure()
+    backend.record_failure()
+    clock[0] += 30
+    assert backend.available(clock[0])
+    backend.started()
+    backend.record_failure()
+    assert backend.state == Backend.OPEN
+    assert not backend.available(clock[0] + 29)
+
+
+def test_abandoned_call_only_raises_the_latency_estimate():
+    backend = _backend()
+    # Unmeasured: the lower bound is better than ranking first.
+    backend.record_latency_at_least(0.5)
+    assert backend.ttft_ewma == 0.5
+    # Given up on sooner than usual: says nothing about its real latency.
+    backend.record_latency_at_least(0.1)
+    assert backend.ttft_ewma == 0.5
+    backend.record_latency_at_least(1.5)
+    assert backend.ttft_ewma == pytest.approx(0.7)
+
+
+def test_failing_backend_is_failed_over_and_then_skipped(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_POOL_FAILURE_THRESHOLD", 2)
+    broken = Backend("broken", FakeStreamingChatModel(time_to_first_token=0, failure_rate=1.0, answer_tokens=2))
+    healthy = Backend("healthy", FakeStreamingChatModel(time_to_first_token=0, answer_tokens=2))
+    pool = ModelPool(backends=[broken, healthy], hedging=False)
+
+    async def ask():
+        return "".join([chunk.content async for chunk in pool.astream([HumanMessage(content="hi")])])
+
+    for _ in range(2):
+        assert asyncio.run(ask())
+    assert broken.state == Backend.OPEN
+    assert pool.ranked() == [healthy]
+    healthy.state, healthy.open_until = Backend.OPEN, float("inf")
+    with pytest.raises(model_pool.ModelPoolUnavailable):
+        asyncio.run(ask())
+
+
+def test_hedge_winner_streams_and_the_slow_call_is_cancelled():
+    cancelled.clear()
+    slow = Backend("slow", _CancellationRecordingModel(time_to_first_token=10.0, answer_tokens=2))
+    fast = Backend("fast", _CancellationRecordingModel(time_to_first_token=0.01, answer_tokens=2, tokens_per_second=1000))
+    pool = ModelPool(backends=[slow, fast], hedge_max_delay=0.05)
+
+    async def ask():
+        text = "".join([chunk.content async for chunk in pool.astream([HumanMessage(content="hi")])])
+        # Let the background abandon of the slow call finish.
+        await asyncio.gather(*pool._background)
+        return text
+
+    assert asyncio.run(ask())
+    assert cancelled == [10.0]
+    assert fast.hedges_won == 1
+    assert pool.stats()["hedged_calls"] == 1
+    # The loser's half-finished call neither counts as a failure nor leaves a trial running.
+    assert slow.failures == 0 and slow.state == Backend.CLOSED
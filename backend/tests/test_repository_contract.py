@@ -0,0 +1,156 @@
+# backend/tests/test_repository_contract.py
+"""The behaviour every storage backend must share, run against each of them."""
+import asyncio
+import datetime
+
+import pytest
+from google.cloud import firestore
+
+from app.repositories import firestore_paged_repository, firestore_repository, sqlite_repository
+from app.repositories.firestore_paged_repository import PagedFirestoreRepository
+from app.repositories.firestore_repository import FirestoreRepository
+from app.repositories.sqlite_repository import SQLiteRepository
+from tests.fake_firestore import FakeFirestore, transactional
+
+T0 = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _create(backend, tmp_path, monkeypatch):
+    if backend == "sqlite":
+        return SQLiteRepository(str(tmp_path / "chat.db"))
+    monkeypatch.setattr(firestore, "async_transactional", transactional)
+    if backend == "firestore":
+        return FirestoreRepository(FakeFirestore())
+    return PagedFirestoreRepository(FakeFirestore(), page_size=3)
+
+
+@pytest.fixture(params=["sqlite", "firestore", "firestore-paged"])
+def repo(request, tmp_path, monkeypatch):
+    return _create(request.param, tmp_path, monkeypatch)
+
+
+@pytest.fixture(params=["sqlite", "firestore-paged"])
+def numbered_repo(request, tmp_path, monkeypatch):
+    """The backends that number messages (see Repository.stream_messages)."""
+    return _create(request.param, tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Sets the timestamp every backend gives the next messages written:
+    `clock(when)`, with one microsecond between the messages of a write
+    unless `tied`.
+    """
+    def set_clock(when, tied=False):
+        def timestamps(count):
+            return [when + datetime.timedelta(microseconds=0 if tied else offset) for offset in range(count)]
+        for module in (sqlite_repository, firestore_repository, firestore_paged_repository):
+            monkeypatch.setattr(module, "message_timestamps", timestamps)
+    return set_clock
+
+
+def _conversation(repo, user_id="u", **fields):
+    return asyncio.run(repo.create_conversation({"user_id": user_id, "title": "t", "message_count": 0, **fields}))
+
+
+# --- Messages ---
+
+def test_message_pages_break_timestamp_ties(repo, clock):
+    conversation_id = _conversation(repo)
+    clock(T0, tied=True)
+    asyncio.run(repo.add_messages(conversation_id, [("human", f"m{number}") for number in range(5)]))
+    asyncio.run(repo.add_messages(conversation_id, [("ai", "m5"), ("human", "m6")]))
+    everything = asyncio.run(repo.list_messages(conversation_id))
+
+    paged, before = [], None
+    while True:
+        page, before = asyncio.run(repo.list_message_page(conversation_id, 2, before))
+        paged += page
+        if before is None:
+            break
+    assert [message["id"] for message in paged] == [message["id"] for message in reversed(everything)]
+    assert len(set(message["id"] for message in paged)) == 7
+
+
+def test_tail_by_sequence_includes_writes_from_a_slower_clock(numbered_repo, clock):
+    conversation_id = _conversation(numbered_repo)
+    clock(T0)
+    stored = asyncio.run(numbered_repo.add_messages(conversation_id, [("human", "q"), ("ai", "a")]))
+    # Another worker whose clock is a second behind.
+    clock(T0 - datetime.timedelta(seconds=1))
+    asyncio.run(numbered_repo.add_messages(conversation_id, [("human", "late")]))
+
+    by_time = asyncio.run(numbered_repo.list_messages(conversation_id, since=stored[-1]["timestamp"]))
+    by_seq = asyncio.run(numbered_repo.list_messages(conversation_id, after_seq=stored[-1]["seq"]))
+    assert [message["content"] for message in by_time] == ["a"]
+    assert [message["content"] for message in by_seq] == ["late"]
+
+
+def test_messages_for_a_missing_conversation_are_rejected(repo):
+    with pytest.raises(Exception):
+        asyncio.run(repo.add_messages("missing", [("human", "q")]))
+    assert asyncio.run(repo.list_messages("missing")) == []
+
+
+# --- Conversations ---
+
+def test_conversation_pages_break_update_ties(repo):
+    ids = [_conversation(repo, updated_at=T0) for _ in range(5)]
+    _conversation(repo, user_id="someone else", updated_at=T0)
+
+    paged, after = [], None
+    while True:
+        page = asyncio.run(repo.list_conversations("u", 2, after))
+        paged += [conv["id"] for conv in page]
+        if len(page) < 2:
+            break
+        after = (page[-1]["updated_at"], page[-1]["id"])
+    assert paged == sorted(ids, reverse=True)
+
+
+def test_changes_resume_after_the_cursor(repo):
+    ids = sorted(_conversation(repo, updated_at=T0) for _ in range(3))
+    later = _conversation(repo, updated_at=T0 + datetime.timedelta(seconds=5))
+    _conversation(repo, user_id="someone else", updated_at=T0 + datetime.timedelta(seconds=5))
+
+    def changes(after, limit=10):
+        return [conv["id"] for conv in asyncio.run(repo.list_conversation_changes("u", limit, after))]
+
+    # Oldest first, ties by id, only the user's own.
+    assert changes(None) == [*ids, later]
+    assert changes((T0, ids[0])) == [*ids[1:], later]
+    # A cursor without an id (taken from the clock) skips everything at its time.
+    assert changes((T0, None)) == [later]
+    assert changes(None, limit=2) == ids[:2]
+
+
+def test_tombstone_lifecycle(repo):
+    conversation_id = _conversation(repo, updated_at=T0)
+    _conversation(repo, updated_at=T0)
+    asyncio.run(repo.tombstone_conversation(conversation_id))
+
+    assert asyncio.run(repo.list_tombstoned_conversation_ids()) == [conversation_id]
+    change = asyncio.run(repo.list_conversation_changes("u", 10, (T0, None)))
+    assert [(conv["id"], conv["deleted"]) for conv in change] == [(conversation_id, True)]
+
+    asyncio.run(repo.mark_conversation_purged(conversation_id))
+    assert asyncio.run(repo.list_tombstoned_conversation_ids()) == []
+    purged = asyncio.run(repo.get_conversation(conversation_id))
+    assert purged["deleted"] and purged["purged_at"] is not None and purged["title"] is None
+
+    assert asyncio.run(repo.delete_purged_conversations(purged["purged_at"])) == 0
+    assert asyncio.run(repo.delete_purged_conversations(purged["purged_at"] + datetime.timedelta(seconds=1))) == 1
+    assert asyncio.run(repo.get_conversation(conversation_id)) is None
+
+
+def test_conditional_update(repo):
+    conversation_id = _conversation(repo, summary_message_count=2)
+
+    def covers_less_than(count):
+        return lambda conv: conv["summary_message_count"] < count
+
+    assert not asyncio.run(repo.update_conversation_if(conversation_id, {"summary": "old"}, covers_less_than(2)))
+    assert asyncio.run(repo.update_conversation_if(conversation_id, {"summary": "new"}, covers_less_than(4)))
+    assert asyncio.run(repo.get_conversation(conversation_id))["summary"] == "new"
+    assert not asyncio.run(repo.update_conversation_if("missing", {"summary": "x"}, lambda conv: True))
@@ -0,0 +1,47 @@
+# backend/tests/test_response_cache.py
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from app.services import response_cache
+from app.services.fake_llm import FakeStreamingChatModel
+from app.services.model_pool import Backend, ModelPool
+
+prompt = ChatPromptTemplate.from_messages([MessagesPlaceholder(variable_name="history"), ("human", "{question}")])
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    response_cache._cache.clear()
+
+
+def _pool(primary_fails: bool) -> ModelPool:
+    model = dict(time_to_first_token=0, answer_tokens=2)
+    return ModelPool(
+        backends=[
+            Backend("0:primary", FakeStreamingChatModel(**model, failure_rate=1.0 if primary_fails else 0.0), "primary"),
+            Backend("1:fallback", FakeStreamingChatModel(**model), "fallback"),
+        ],
+        hedging=False,
+    )
+
+
+def _ask(chain):
+    async def run():
+        inputs = {"history": [HumanMessage(content="earlier")], "question": "hi"}
+        return "".join([chunk.content async for chunk in chain.astream(inputs, {})])
+    return asyncio.run(run())
+
+
+def test_answer_of_the_primary_model_is_cached():
+    chain = response_cache.cached(prompt | _pool(primary_fails=False), model="primary", system_prompt="s")
+    assert _ask(chain)
+    assert response_cache.stats()["size"] == 1
+
+
+def test_answer_of_a_fallback_model_is_not_cached():
+    chain = response_cache.cached(prompt | _pool(primary_fails=True), model="primary", system_prompt="s")
+    assert _ask(chain)
+    assert response_cache.stats()["size"] == 0
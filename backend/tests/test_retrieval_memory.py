@@ -0,0 +1,100 @@
+# backend/tests/test_retrieval_memory.py
+import numpy as np
+import pytest
+
+from app.config.settings import settings
+from app.core.cache import TTLCache
+from app.services import retrieval_memory
+from app.services.retrieval_memory import HashingEmbedder, VectorIndex
+
+embedder = HashingEmbedder(64)
+
+
+def _rows(conversation_id, contents):
+    return [
+        {"conversation_id": conversation_id, "message_id": f"{conversation_id}-{number}", "role": "human", "content": content}
+        for number, content in enumerate(contents)
+    ]
+
+
+def _add(index, conversation_id, contents):
+    index.add(embedder.embed(contents), _rows(conversation_id, contents))
+
+
+def _search(index, question, k=2, exclude_ids=()):
+    return [hit["content"] for hit in index.search(embedder.embed([question])[0], k, set(exclude_ids))]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return VectorIndex(str(tmp_path), "user", embedder.dim)
+
+
+def test_search_ranks_by_similarity(index):
+    _add(index, "c", ["my dog is called rex", "i work as a carpenter in oslo", "the weather is nice"])
+    assert _search(index, "what is my dog called", k=1) == ["my dog is called rex"]
+    assert _search(index, "carpenter oslo", exclude_ids=["c-1"]) == []
+
+
+def test_index_grows_past_its_capacity_and_reopens(index, tmp_path):
+    contents = [f"note number {number} about topic{number}" for number in range(VectorIndex._INITIAL_CAPACITY + 10)]
+    _add(index, "c", contents[:100])
+    _add(index, "c", contents[100:])
+    assert index._capacity >= len(contents)
+    assert _search(index, "topic260", k=1) == ["note number 260 about topic260"]
+
+    reopened = VectorIndex(str(tmp_path), "user", embedder.dim)
+    assert _search(reopened, "topic260", k=1) == ["note number 260 about topic260"]
+    np.testing.assert_array_equal(reopened._vectors[:len(contents)], index._vectors[:len(contents)])
+
+
+def test_index_that_does_not_match_its_files_is_refused(index, tmp_path):
+    _add(index, "c", ["my dog is called rex"])
+    index._vectors.flush()
+    # Another embedding size.
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), "user", 48)
+    # Fewer vectors than metadata rows.
+    with open(index._vec_path, "r+b") as f:
+        f.truncate(0)
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), "user", embedder.dim)
+
+
+def test_embedders_must_implement_embed():
+    class Incomplete(retrieval_memory.Embedder):
+        dim = 8
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_forgotten_conversation_stays_forgotten_after_reopening(index, tmp_path):
+    _add(index, "a", ["my dog is called rex"])
+    index.forget_conversation("a")
+    # Rows written after the clear are the conversation's new history.
+    _add(index, "a", ["my dog is called fido"])
+    assert _search(index, "dog called") == ["my dog is called fido"]
+    reopened = VectorIndex(str(tmp_path), "user", embedder.dim)
+    assert _search(reopened, "dog called") == ["my dog is called fido"]
+
+
+def test_search_looks_past_forgotten_rows(index):
+    # Many close matches in a cleared conversation, then one in another.
+    _add(index, "cleared", [f"my dog is called rex {number}" for number in range(40)])
+    index.forget_conversation("cleared")
+    _add(index, "kept", ["my dog is called fido", "the weather is nice"])
+    assert _search(index, "my dog is called rex", k=1) == ["my dog is called fido"]
+
+
+def test_index_in_use_is_not_reopened_after_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(retrieval_memory, "_indexes", TTLCache(maxsize=1))
+    monkeypatch.setattr(retrieval_memory, "_embedder", embedder)
+    with retrieval_memory._using_index("a") as held:
+        # Another user's index pushes it out of the LRU while it is in use.
+        with retrieval_memory._using_index("b"):
+            pass
+        with retrieval_memory._using_index("a") as again:
+            assert again is held
+    assert retrieval_memory._in_use == {}
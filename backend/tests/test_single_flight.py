@@ -0,0 +1,34 @@
+# backend/tests/test_single_flight.py
+import asyncio
+
+from app.config.settings import settings
+from app.services import single_flight
+
+
+def test_generation_waits_for_the_slowest_subscriber(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_MAX_LAG", 3)
+    produced = []
+
+    async def source():
+        for number in range(20):
+            produced.append(number)
+            yield str(number)
+
+    async def read_all(subscription):
+        try:
+            return [piece async for piece in subscription]
+        finally:
+            subscription.close()
+
+    async def run():
+        fast = asyncio.create_task(read_all(single_flight.start("key", source())))
+        slow = single_flight.join("key")
+        for _ in range(50):
+            await asyncio.sleep(0)
+        # The slow subscriber has read nothing, so the generation stopped just past the bound.
+        assert len(produced) == 4
+        assert not fast.done()
+        return await read_all(slow), await fast
+
+    slow, fast = asyncio.run(run())
+    assert slow == fast == [str(number) for number in range(20)]
@@ -0,0 +1,88 @@
+# backend/tests/test_sse.py
+import asyncio
+
+import pytest
+
+from app.core import sse
+
+
+async def _pieces(texts, delay=0.0, produced=None, closed=None):
+    try:
+        for text in texts:
+            if delay:
+                await asyncio.sleep(delay)
+            if produced is not None:
+                produced.append(text)
+            yield text
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def test_first_piece_goes_out_at_once_and_the_rest_is_coalesced():
+    texts = [f"p{number} " for number in range(20)]
+    frames = asyncio.run(_collect(sse.batches(_pieces(texts, delay=0.005), window=0.05, heartbeat=10)))
+    assert frames[0] == "p0 "
+    assert "".join(frames) == "".join(texts)
+    # One frame per window instead of one per piece.
+    assert len(frames) <= 5
+
+
+def test_a_full_buffer_is_sent_before_the_window_ends():
+    texts = ["abcd"] * 6
+    frames = asyncio.run(_collect(sse.batches(_pieces(texts), window=10, max_bytes=8, heartbeat=10)))
+    assert "".join(frames) == "".join(texts)
+    assert all(len(frame) <= 8 for frame in frames)
+
+
+def test_heartbeats_fill_idle_time():
+    async def run():
+        return await _collect(sse.coalesce(_pieces(["late"], delay=0.05), window=0, heartbeat=0.01))
+
+    frames = asyncio.run(run())
+    assert frames[0] == sse.HEARTBEAT
+    assert frames[-1] == sse.event({"content": "late"})
+
+
+def test_slow_reader_holds_back_the_source():
+    produced = []
+
+    async def run():
+        frames = sse.batches(_pieces([str(number) for number in range(1000)], produced=produced), buffer_size=4, heartbeat=10)
+        await frames.__anext__()
+        # The client stops reading; the pump may only fill the queue.
+        await asyncio.sleep(0.05)
+        stalled = len(produced)
+        await frames.aclose()
+        return stalled
+
+    stalled = asyncio.run(run())
+    assert stalled < 20
+
+
+def test_client_going_away_cancels_the_source():
+    closed = []
+
+    async def run():
+        frames = sse.batches(_pieces(["a", "b", "c"], delay=0.01, closed=closed), window=0, heartbeat=10)
+        assert await frames.__anext__() == "a"
+        await frames.aclose()
+        # Let the cancelled pump task unwind.
+        for _ in range(5):
+            await asyncio.sleep(0)
+        return closed
+
+    assert asyncio.run(run()) == [True]
+
+
+def test_source_errors_reach_the_reader():
+    async def failing():
+        yield "a"
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        asyncio.run(_collect(sse.batches(failing(), window=0, heartbeat=10)))
@@ -1,6 +1,7 @@
 import streamlit as st
-from components.sidebar_components import show_sidebar
+from components.sidebar_components import show_sidebar, refresh_conversations, sync_conversations, load_latest_messages, load_older_messages
 from services import api_client
+from utils.stream_renderer import StreamRenderer
 
 def show_chat_page():
     """
@@ -8,10 +9,11 @@ def show_chat_page():
     """
     # Fetch conversations on first load after login
     if not st.session_state.get('conversations'):
-        st.session_state.conversations = api_client.fetch_conversations()
+        refresh_conversations()
         # If no active conversation, select the most recent one
         if not st.session_state.active_conversation_id and st.session_state.conversations:
             st.session_state.active_conversation_id = st.session_state.conversations[0]['id']
+            load_latest_messages(st.session_state.active_conversation_id)
 
     # Display sidebar
     show_sidebar()
@@ -23,6 +25,8 @@ def show_chat_page():
 
     # Display existing messages for the active conversation
     # The 'messages' in session_state acts as our frontend cache for the active chat
+    if st.session_state.get("messages_cursor"):
+        st.button("Load older messages", on_click=load_older_messages)
     for message in st.session_state.get("messages", []):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -36,23 +40,22 @@ def show_chat_page():
 
         # Get and display assistant's response
         with st.chat_message("assistant"):
-            message_placeholder = st.empty()
-            full_response = ""
-            
+            renderer = StreamRenderer(st.empty())
+
+
             # Stream the response from the API
             response_generator = api_client.stream_chat_responses(
                 conv_id=st.session_state.active_conversation_id,
                 message=prompt
             )
 
+            # Renders are throttled; the final one shows the complete answer
             for chunk in response_generator:
-                full_response += chunk
-                message_placeholder.markdown(full_response + "▌") # Add a blinking cursor effect
-            
-            message_placeholder.markdown(full_response)
+                renderer.add(chunk)
+            full_response = renderer.finish()
         
         # Add the complete assistant response to the session's message history
         st.session_state.messages.append({"role": "assistant", "content": full_response})
         
-        # Refresh sidebar to show updated last message timestamp
-        st.session_state.conversations = api_client.fetch_conversations()
\ No newline at end of file
+        # Update the sidebar with the new last message; only changed conversations are fetched
+        sync_conversations()
\ No newline at end of file
@@ -11,10 +11,11 @@ def show_sidebar():
         if st.button("➕ New Chat", use_container_width=True):
             new_conv = api_client.create_new_conversation(title="New Conversation")
             if new_conv:
-                # Refresh conversation list and switch to the new one
-                st.session_state.conversations = api_client.fetch_conversations()
+                # Update the conversation list and switch to the new one
+                sync_conversations()
                 st.session_state.active_conversation_id = new_conv['id']
                 st.session_state.messages = [] # Clear messages for new chat
+                st.session_state.messages_cursor = None
                 st.rerun()
 
         st.divider()
@@ -40,6 +41,10 @@ def show_sidebar():
                 with col3:
                     if st.button("🗑️", key=f"delete_{conv_id}", help="Delete"):
                         handle_delete(conv_id)
+
+            # Older conversations are only fetched when asked for
+            if st.session_state.conversations_cursor:
+                st.button("Load more", use_container_width=True, on_click=load_more_conversations)
         else:
             st.write("No conversations yet.")
 
@@ -51,11 +56,59 @@ def show_sidebar():
         if st.button("Logout", use_container_width=True):
             handle_logout()
 
+def refresh_conversations():
+    """Reloads the first page of conversations, dropping any older pages loaded so far."""
+    page = api_client.fetch_conversations()
+    st.session_state.conversations = page["items"]
+    st.session_state.conversations_cursor = page["next_cursor"]
+    st.session_state.conversations_sync_cursor = page.get("sync_cursor")
+
+def sync_conversations():
+    """Brings the sidebar up to date by fetching only the conversations that changed since the last sync."""
+    if not st.session_state.conversations_sync_cursor:
+        refresh_conversations()
+        return
+    while True:
+        changes = api_client.fetch_conversation_changes(st.session_state.conversations_sync_cursor)
+        if changes is None or changes["reset"]:
+            refresh_conversations()
+            return
+        merge_conversation_changes(changes["items"])
+        st.session_state.conversations_sync_cursor = changes["sync_cursor"]
+        if not changes["has_more"]:
+            return
+
+def merge_conversation_changes(changes):
+    """Applies changed conversations (oldest first) to the sidebar list, which is ordered newest first."""
+    changed_ids = {conv['id'] for conv in changes}
+    unchanged = [conv for conv in st.session_state.conversations if conv['id'] not in changed_ids]
+    updated = [conv for conv in reversed(changes) if not conv.get('deleted')]
+    st.session_state.conversations = updated + unchanged
+
+def load_more_conversations():
+    """Callback to append the next page of conversations to the sidebar."""
+    page = api_client.fetch_conversations(cursor=st.session_state.conversations_cursor)
+    known_ids = {conv['id'] for conv in st.session_state.conversations}
+    st.session_state.conversations += [conv for conv in page["items"] if conv['id'] not in known_ids]
+    st.session_state.conversations_cursor = page["next_cursor"]
+
+def load_latest_messages(conv_id):
+    """Replaces the displayed messages with the newest page of a conversation."""
+    page = api_client.fetch_messages(conv_id)
+    st.session_state.messages = page["items"]
+    st.session_state.messages_cursor = page["next_cursor"]
+
+def load_older_messages():
+    """Callback to prepend the next older page of the active conversation's messages."""
+    page = api_client.fetch_messages(st.session_state.active_conversation_id, cursor=st.session_state.messages_cursor)
+    st.session_state.messages = page["items"] + st.session_state.messages
+    st.session_state.messages_cursor = page["next_cursor"]
+
 def switch_conversation(conv_id):
     """Callback to switch the active conversation."""
     if st.session_state.active_conversation_id != conv_id:
         st.session_state.active_conversation_id = conv_id
-        st.session_state.messages = [] # Clear message history when switching
+        load_latest_messages(conv_id)
 
 def handle_rename(conv_id):
     """Handles the logic for renaming a conversation."""
@@ -65,7 +118,7 @@ def handle_rename(conv_id):
         if submitted and new_title:
             if api_client.rename_conversation(conv_id, new_title):
                 st.success("Renamed successfully!")
-                st.session_state.conversations = api_client.fetch_conversations()
+                sync_conversations()
                 st.rerun()
 
 def handle_delete(conv_id):
@@ -76,5 +129,6 @@ def handle_delete(conv_id):
         if st.session_state.active_conversation_id == conv_id:
             st.session_state.active_conversation_id = None
             st.session_state.messages = []
-        st.session_state.conversations = api_client.fetch_conversations()
+            st.session_state.messages_cursor = None
+        sync_conversations()
         st.rerun()
\ No newline at end of file
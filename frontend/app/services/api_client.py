@@ -1,7 +1,8 @@
 import requests
 import streamlit as st
 import json
-from utils.constants import API_BASE_URL
+from services.http_client import get_session
+from utils.constants import API_BASE_URL, CONVERSATIONS_PAGE_SIZE, MESSAGES_PAGE_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_STREAM_READ_TIMEOUT
 
 # --- THIS FUNCTION IS CRITICAL ---
 def get_auth_headers():
@@ -18,18 +19,41 @@ def get_auth_headers():
 
 # --- CONVERSATION ENDPOINTS (These seem to be working for you) ---
 
-def fetch_conversations():
-    """Fetches all conversations for the current user."""
+def fetch_conversations(cursor: str = None, limit: int = CONVERSATIONS_PAGE_SIZE):
+    """
+    Fetches one page of the current user's conversations, newest first.
+    Returns {"items": [...], "next_cursor": str or None}.
+    """
+    empty_page = {"items": [], "next_cursor": None}
     auth_headers = get_auth_headers()
     if not auth_headers:
-        return []
+        return empty_page
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
     try:
-        response = requests.get(f"{API_BASE_URL}/conversations/", headers=auth_headers)
+        response = get_session().get(f"{API_BASE_URL}/conversations/", params=params, headers=auth_headers)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching conversations: {e}")
-        return []
+        return empty_page
+
+def fetch_conversation_changes(since: str):
+    """
+    Fetches the conversations created, updated or deleted after the `since` sync cursor.
+    Returns {"items", "sync_cursor", "has_more", "reset"}, or None on error.
+    """
+    auth_headers = get_auth_headers()
+    if not auth_headers:
+        return None
+    try:
+        response = get_session().get(f"{API_BASE_URL}/conversations/changes", params={"since": since}, headers=auth_headers)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error syncing conversations: {e}")
+        return None
 
 def create_new_conversation(title: str):
     """Creates a new conversation."""
@@ -37,7 +61,7 @@ def create_new_conversation(title: str):
     if not auth_headers:
         return None
     try:
-        response = requests.post(
+        response = get_session().post(
             f"{API_BASE_URL}/conversations/",
             json={"title": title},
             headers=auth_headers
@@ -48,12 +72,43 @@ def create_new_conversation(title: str):
         st.error(f"Error creating conversation: {e}")
         return None
 
+def fetch_messages(conv_id: str, cursor: str = None, limit: int = MESSAGES_PAGE_SIZE):
+    """
+    Fetches one page of a conversation's messages, walking backwards from the newest.
+    Returns {"items": [...] in chronological order, "next_cursor": str or None}.
+    """
+    empty_page = {"items": [], "next_cursor": None}
+    auth_headers = get_auth_headers()
+    if not auth_headers:
+        return empty_page
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    try:
+        with get_session().get(f"{API_BASE_URL}/conversations/{conv_id}/messages", params=params, headers=auth_headers, stream=True) as r:
+            r.raise_for_status()
+            items, next_cursor = [], None
+            # The backend streams NDJSON: one message per line (newest first), then an "end" line.
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record.get("type") == "message":
+                    items.append({"role": record["role"], "content": record["content"]})
+                elif record.get("type") == "end":
+                    next_cursor = record.get("next_cursor")
+        items.reverse()
+        return {"items": items, "next_cursor": next_cursor}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"Error fetching messages: {e}")
+        return empty_page
+
 # ... (other conversation functions like rename/delete would follow the same pattern) ...
 def rename_conversation(conv_id: str, new_title: str):
     auth_headers = get_auth_headers()
     if not auth_headers: return False
     try:
-        response = requests.put(f"{API_BASE_URL}/conversations/{conv_id}", json={"title": new_title}, headers=auth_headers)
+        response = get_session().put(f"{API_BASE_URL}/conversations/{conv_id}", json={"title": new_title}, headers=auth_headers)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -64,7 +119,7 @@ def delete_conversation(conv_id: str):
     auth_headers = get_auth_headers()
     if not auth_headers: return False
     try:
-        response = requests.delete(f"{API_BASE_URL}/conversations/{conv_id}", headers=auth_headers)
+        response = get_session().delete(f"{API_BASE_URL}/conversations/{conv_id}", headers=auth_headers)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -88,27 +143,41 @@ def stream_chat_responses(conv_id: str, message: str):
         return
 
     try:
-        # Step 3: **CRITICAL** - Ensure the 'headers=auth_headers' argument is passed to requests.post.
+        # Step 3: **CRITICAL** - Ensure the 'headers=auth_headers' argument is passed to the post.
         # This is the line that sends the token to the backend.
-        with requests.post(
+        with get_session().post(
             f"{API_BASE_URL}/chat/message",
             json=payload,
             headers=auth_headers, 
-            stream=True
+            stream=True,
+            timeout=(HTTP_CONNECT_TIMEOUT, HTTP_STREAM_READ_TIMEOUT),
         ) as r:
             r.raise_for_status()
+            event_name = None
             for chunk in r.iter_lines():
-                if chunk:
-                    decoded_chunk = chunk.decode('utf-8')
-                    if decoded_chunk.startswith('data:'):
-                        try:
-                            data_str = decoded_chunk[len('data:'):].strip()
-                            data = json.loads(data_str)
-                            yield data.get("content", "")
-                        except json.JSONDecodeError:
-                            continue
+                if not chunk:
+                    event_name = None # A blank line ends the event
+                    continue
+                decoded_chunk = chunk.decode('utf-8')
+                if decoded_chunk.startswith('event:'):
+                    event_name = decoded_chunk[len('event:'):].strip()
+                elif decoded_chunk.startswith('data:'):
+                    try:
+                        data_str = decoded_chunk[len('data:'):].strip()
+                        data = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    if event_name == "error":
+                        st.error(data.get("detail", "The response could not be generated."))
+                    elif event_name is None:
+                        yield data.get("content", "")
                             
     except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 429:
+            retry_after = e.response.headers.get("Retry-After", "a few")
+            st.warning(f"The assistant is busy right now. Please try again in {retry_after} seconds.")
+            yield ""
+            return
         # This will now properly catch the 401 error and show it to the user.
         st.error(f"An error occurred while communicating with the chat API: {e}")
         yield ""
@@ -122,7 +191,7 @@ def stream_chat_responses(conv_id: str, message: str):
 def register_user(email: str, password: str, display_name: str):
     """Calls the backend to register a new user."""
     try:
-        response = requests.post(f"{API_BASE_URL}/auth/register", json={
+        response = get_session().post(f"{API_BASE_URL}/auth/register", json={
             "email": email,
             "password": password,
             "display_name": display_name
@@ -142,7 +211,7 @@ def logout_user():
     if not auth_headers:
         return False
     try:
-        response = requests.post(f"{API_BASE_URL}/auth/logout", headers=auth_headers)
+        response = get_session().post(f"{API_BASE_URL}/auth/logout", headers=auth_headers)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException:
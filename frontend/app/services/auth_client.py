@@ -5,6 +5,7 @@ import streamlit as st
 import requests
 from utils.constants import FIREBASE_CONFIG
 from services import api_client # We need this for the new logout flow
+from services.http_client import get_session
 
 # --- PYREBASE4 IS NO LONGER USED OR INITIALIZED ---
 
@@ -28,7 +29,7 @@ def handle_login(email, password):
     }
 
     try:
-        response = requests.post(rest_api_url, json=payload)
+        response = get_session().post(rest_api_url, json=payload)
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status()
 
@@ -81,7 +82,10 @@ def handle_logout():
     st.session_state['id_token'] = None
     st.session_state['active_conversation_id'] = None
     st.session_state['conversations'] = []
+    st.session_state['conversations_cursor'] = None
+    st.session_state['conversations_sync_cursor'] = None
     st.session_state['messages'] = []
+    st.session_state['messages_cursor'] = None
     
     st.info("You have been logged out.")
     st.rerun()
\ No newline at end of file
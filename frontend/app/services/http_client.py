@@ -0,0 +1,57 @@
+# frontend/app/services/http_client.py
+"""
+The one HTTP client every frontend call goes through.
+
+Streamlit reruns the whole script on each interaction, so bare
+`requests.get/post` calls opened (and TLS-handshook) a new connection every
+time. This session is created once per server process and keeps connections
+to the backend and to the Firebase identity endpoint alive across reruns and
+users. Auth travels in per-request headers and cookies are never stored, so
+sharing it between users leaks nothing.
+"""
+import http.cookiejar
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.constants import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+)
+
+
+class _NoCookies(http.cookiejar.DefaultCookiePolicy):
+    def set_ok(self, cookie, request):
+        return False
+
+
+class _Session(requests.Session):
+    """A Session that applies the default timeouts unless a call passes its own."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    session = _Session()
+    session.cookies.set_policy(_NoCookies())
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.3,
+        backoff_jitter=0.3,
+        status_forcelist=(502, 503, 504),
+        # Only idempotent calls are retried: a retried POST could send a chat message twice.
+        allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
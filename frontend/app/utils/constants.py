@@ -1,6 +1,22 @@
 # Backend API base URL
 API_BASE_URL = "http://localhost:8000/api" # Use service name 'backend' for Docker Compose
 
+# Number of conversations the sidebar loads at a time
+CONVERSATIONS_PAGE_SIZE = 20
+
+# Number of messages loaded at a time when opening a conversation
+MESSAGES_PAGE_SIZE = 50
+
+# Shared HTTP client (see services/http_client.py)
+HTTP_CONNECT_TIMEOUT = 3.05 # seconds
+HTTP_READ_TIMEOUT = 30 # seconds between bytes, for regular calls
+HTTP_STREAM_READ_TIMEOUT = 60 # chat streams; the backend sends a heartbeat every 15s
+HTTP_RETRIES = 3 # idempotent calls only
+HTTP_POOL_SIZE = 20 # kept-alive connections per host
+
+# Streamed answers are re-rendered at most this many times per second
+STREAM_RENDER_FPS = 15
+
 # Firebase Web App Configuration
 # IMPORTANT: Replace this with your actual Firebase Web App config
 # You can find this in your Firebase project settings.
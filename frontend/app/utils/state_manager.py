@@ -16,9 +16,15 @@ def initialize_session_state():
     # Conversation state
     if 'conversations' not in st.session_state:
         st.session_state['conversations'] = [] # List of conversation dicts from backend
+    if 'conversations_cursor' not in st.session_state:
+        st.session_state['conversations_cursor'] = None # Cursor of the next page, None when all are loaded
+    if 'conversations_sync_cursor' not in st.session_state:
+        st.session_state['conversations_sync_cursor'] = None # Position for fetching only what changed since
     if 'active_conversation_id' not in st.session_state:
         st.session_state['active_conversation_id'] = None
     
     # Message state for the active conversation
     if 'messages' not in st.session_state:
-        st.session_state['messages'] = [] # List of message dicts {'role': 'user'/'assistant', 'content': '...'}
\ No newline at end of file
+        st.session_state['messages'] = [] # List of message dicts {'role': 'user'/'assistant', 'content': '...'}
+    if 'messages_cursor' not in st.session_state:
+        st.session_state['messages_cursor'] = None # Cursor of the next older page of messages
\ No newline at end of file
@@ -0,0 +1,52 @@
+# frontend/app/utils/stream_renderer.py
+"""
+Throttled rendering of a streamed chat answer.
+
+Every `placeholder.markdown(...)` call re-parses the whole answer and pushes
+it over the Streamlit websocket, so rendering per chunk costs quadratic work
+over a long answer. The renderer keeps incoming pieces in a list and renders
+at most STREAM_RENDER_FPS times a second. When a render itself is slow (the
+answer got long), the next one is pushed back proportionally, so the share
+of CPU spent rendering stays flat however long the answer grows.
+"""
+import time
+
+from utils.constants import STREAM_RENDER_FPS
+
+CURSOR = "▌"
+
+# The gap after a render is at least this multiple of how long it took.
+_RENDER_COST_FACTOR = 4
+
+
+class StreamRenderer:
+    def __init__(self, placeholder, fps: float = STREAM_RENDER_FPS):
+        self._placeholder = placeholder
+        self._min_interval = 1.0 / fps
+        self._pieces = []
+        self._text = ""
+        self._rendered_pieces = 0
+        self._next_render = 0.0
+
+    def add(self, piece: str):
+        """Buffers a piece and renders if the next frame is due."""
+        if not piece:
+            return
+        self._pieces.append(piece)
+        if time.monotonic() >= self._next_render:
+            self._render(CURSOR)
+
+    def finish(self) -> str:
+        """Renders the complete answer without the cursor and returns it."""
+        self._render("")
+        return self._text
+
+    def _render(self, suffix: str):
+        if len(self._pieces) != self._rendered_pieces:
+            self._text = "".join(self._pieces)
+            self._pieces = [self._text]
+            self._rendered_pieces = 1
+        started = time.monotonic()
+        self._placeholder.markdown(self._text + suffix)
+        finished = time.monotonic()
+        self._next_render = finished + max(self._min_interval, (finished - started) * _RENDER_COST_FACTOR)